@@ -0,0 +1,275 @@
+"""Offline benchmarks of the task generator, packaging and the stage datasets,
+running against the local session (see `kedro_snowflake.local`).
+
+Usage:
+    python -m benchmarks.run [--output results.json] [--baseline benchmarks/baseline.json]
+
+Results are written as JSON (metric name -> value). The run fails (exit code 1) if any metric
+of the baseline regressed by more than `--threshold` (relative), ignoring durations which
+changed by less than `--min-delta-s` seconds.
+Metrics ending with `_s` are durations (lower is better), the ones ending with `_mb_s`
+are throughputs (higher is better), the ones ending with `_mb` are stored sizes (lower is better).
+The stored baseline depends on the machine it was recorded on - re-record it with
+`--update-baseline` on the machine running the comparison.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+from typing import Callable, Dict, List
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+from kedro.pipeline import Pipeline, node
+
+from kedro_snowflake.config import (
+    DependenciesConfig,
+    KedroSnowflakeConfig,
+    PackagingConfig,
+    SnowflakeConfig,
+    SnowflakeConnectionConfig,
+    SnowflakeRuntimeConfig,
+)
+from kedro_snowflake.datasets.internal import (
+    SnowflakeRunnerDataSet,
+    SnowflakeStagePickleDataSet,
+)
+from kedro_snowflake.generator import SnowflakePipelineGenerator
+from kedro_snowflake.local import LocalSession
+from kedro_snowflake.utils import (
+    get_module_path,
+    zip_dependencies,
+    zstd_folder,
+)
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+
+
+def _timed(fn: Callable[[], None], repeats: int) -> float:
+    """Median duration of the calls in seconds"""
+    durations = []
+    for _ in range(repeats):
+        start = perf_counter()
+        fn()
+        durations.append(perf_counter() - start)
+    return median(durations)
+
+
+def synthetic_pipeline(size: int, max_inputs: int = 3, seed: int = 42) -> Pipeline:
+    """Random DAG of `size` nodes, every node reads up to `max_inputs` earlier outputs"""
+    rnd = random.Random(seed)
+    nodes = []
+    for i in range(size):
+        inputs = sorted(
+            {f"ds{rnd.randrange(i)}" for _ in range(rnd.randint(1, max_inputs))}
+            if i
+            else {"input_data"}
+        )
+        nodes.append(
+            node(
+                lambda *args: args[0],
+                inputs=inputs,
+                outputs=f"ds{i}",
+                name=f"node{i}",
+            )
+        )
+    return Pipeline(nodes)
+
+
+def _generator() -> SnowflakePipelineGenerator:
+    config = KedroSnowflakeConfig(
+        snowflake=SnowflakeConfig(
+            connection=SnowflakeConnectionConfig(
+                account="benchmark",
+                user="benchmark",
+                password_from_env="SNOWFLAKE_PASSWORD",
+                database="benchmark",
+                warehouse="benchmark",
+                schema="benchmark",
+            ),
+            runtime=SnowflakeRuntimeConfig(dependencies=DependenciesConfig()),
+        )
+    )
+    generator = SnowflakePipelineGenerator(
+        "benchmark",
+        "benchmark",
+        config,
+        {
+            "account": "benchmark",
+            "user": "benchmark",
+            "password": "benchmark",
+            "warehouse": "benchmark",
+            "database": "benchmark",
+            "schema": "benchmark",
+        },
+        {},
+    )
+    generator.__dict__["snowflake_session"] = LocalSession()
+    return generator
+
+
+def bench_generator(sizes: List[int], repeats: int) -> Dict[str, float]:
+    results = {}
+    for size in sizes:
+        pipeline = synthetic_pipeline(size)
+        generator = _generator()
+        results[f"generator_tasks_sql_{size}_nodes_s"] = _timed(
+            lambda: generator._generate_snowflake_tasks_sql(pipeline), repeats
+        )
+    return results
+
+
+def bench_packaging(packages: List[str], repeats: int) -> Dict[str, float]:
+    """Packaging of the installed package trees, with the default packaging settings"""
+    packaging = PackagingConfig()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for package in packages:
+            path = get_module_path(package)
+            output_dir = Path(tempfile.mkdtemp(dir=tmp_dir))
+            results[f"zstd_folder_{package}_s"] = _timed(
+                lambda: zstd_folder(
+                    path,
+                    output_dir,
+                    file_name="archive.tar.zst",
+                    level=packaging.compression_level,
+                    threads=packaging.compression_threads,
+                    deterministic=packaging.deterministic,
+                ),
+                repeats,
+            )
+            results[f"zip_dependencies_{package}_s"] = _timed(
+                lambda: zip_dependencies(
+                    [package],
+                    output_dir,
+                    deterministic=packaging.deterministic,
+                    compile_bytecode=packaging.compile_bytecode,
+                ),
+                repeats,
+            )
+    return results
+
+
+def bench_pickle_dataset(size_mb: int, repeats: int) -> Dict[str, float]:
+    rows = size_mb * 1024 * 1024 // (8 * 4)
+    rnd = np.random.default_rng(42)
+    data = {
+        "pandas": pd.DataFrame(
+            {
+                "a": rnd.random(rows),
+                "b": rnd.integers(0, 1000, rows),
+                "c": rnd.normal(size=rows),
+                "d": np.arange(rows, dtype="float64"),
+            }
+        ),
+        "numpy": rnd.random(rows * 4),
+    }
+    results = {}
+    with LocalSession() as session:
+        for name, value in data.items():
+            datasets = {
+                "pickle_dataset": SnowflakeStagePickleDataSet(
+                    name, "@BENCHMARK_STAGE", "pickle", session
+                ),
+                "pickle_oob_dataset": SnowflakeStagePickleDataSet(
+                    name,
+                    "@BENCHMARK_STAGE",
+                    "pickle_oob",
+                    session,
+                    out_of_band_buffers=True,
+                ),
+                # stored in the format picked for the type of the data
+                "runner_dataset": SnowflakeRunnerDataSet(
+                    name, "@BENCHMARK_STAGE", "runner", session, "run_id"
+                ),
+            }
+            for prefix, dataset in datasets.items():
+                results[f"{prefix}_save_{name}_{size_mb}mb_mb_s"] = size_mb / _timed(
+                    lambda: dataset.save(value), repeats
+                )
+                results[f"{prefix}_load_{name}_{size_mb}mb_mb_s"] = size_mb / _timed(
+                    dataset.load, repeats
+                )
+        for row in session.sql("LS @BENCHMARK_STAGE").collect():
+            run_id, file_name = row[0].split("/")[-2:]
+            name = file_name.split(".")[0]
+            metric = f"{run_id}_dataset_stored_{name}_{size_mb}mb_mb"
+            results[metric] = results.get(metric, 0.0) + row[1] / 1024 / 1024
+    return results
+
+
+def compare(
+    results: Dict[str, float],
+    baseline: Dict[str, float],
+    threshold: float,
+    min_delta_s: float = 0.0,
+) -> List[str]:
+    """Descriptions of the metrics which regressed by more than `threshold` (relative).
+    Durations differing by less than `min_delta_s` are considered noise"""
+    regressions = []
+    for metric, expected in sorted(baseline.items()):
+        if metric not in results or not expected:
+            continue
+        actual = results[metric]
+        if metric.endswith("_s") and not metric.endswith("_mb_s"):
+            if actual - expected < min_delta_s:
+                continue
+        change = (
+            expected / actual - 1 if metric.endswith("_mb_s") else actual / expected - 1
+        )
+        if change > threshold:
+            regressions.append(
+                f"{metric}: {actual:.4g} vs baseline {expected:.4g} ({change:+.0%} worse)"
+            )
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--output", type=Path, default=Path("benchmark-results.json"))
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.3)
+    parser.add_argument("--min-delta-s", type=float, default=0.05)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument(
+        "--pipeline-sizes", type=int, nargs="+", default=[1000, 5000, 10000]
+    )
+    parser.add_argument("--packages", nargs="+", default=["kedro", "kedro_snowflake"])
+    parser.add_argument("--dataset-size-mb", type=int, default=64)
+    args = parser.parse_args(argv)
+
+    with patch.dict(os.environ, {"SNOWFLAKE_PASSWORD": "benchmark"}):
+        results = {
+            **bench_generator(args.pipeline_sizes, args.repeats),
+            **bench_packaging(args.packages, args.repeats),
+            **bench_pickle_dataset(args.dataset_size_mb, args.repeats),
+        }
+    args.output.write_text(json.dumps(results, indent=2, sort_keys=True))
+    print(json.dumps(results, indent=2, sort_keys=True))
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+        return 0
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}, skipping the comparison")
+        return 0
+    regressions = compare(
+        results,
+        json.loads(args.baseline.read_text()),
+        args.threshold,
+        args.min_delta_s,
+    )
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
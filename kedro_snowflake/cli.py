@@ -4,15 +4,21 @@ from pathlib import Path
 from typing import Tuple
 
 import click
+from snowflake.snowpark import Session
+from tabulate import tabulate
 
 from kedro_snowflake.cli_functions import (
     context_and_pipeline,
     parse_extra_env_params,
     parse_extra_params,
+    resolve_connection_params_from_config,
+    run_locally,
 )
 from kedro_snowflake.config import CONFIG_TEMPLATE_YAML
 from kedro_snowflake.misc import CliContext
 from kedro_snowflake.pipeline import KedroSnowflakePipeline
+from kedro_snowflake.stats import runs_breakdown, slowest_nodes
+from kedro_snowflake.utils import KedroContextManager
 
 
 @click.group("Snowflake")
@@ -124,6 +130,17 @@ def init(
     help="Timeout in seconds for the pipeline to complete (used only with --wait-for-completion)",
     default=600,
 )
+@click.option(
+    "--local",
+    is_flag=True,
+    help="Run the generated tasks locally, against a local stage, and show the timeline",
+)
+@click.option(
+    "--local-workers",
+    type=int,
+    help="Number of tasks executed in parallel (used only with --local)",
+    default=4,
+)
 @click.pass_obj
 def run(
     ctx: CliContext,
@@ -134,11 +151,23 @@ def run(
     env_var: Tuple[str],
     wait_for_completion: bool,
     timeout: int,
+    local: bool,
+    local_workers: int,
 ):
     """Runs the pipeline using Snowflake Tasks"""
     params = json.dumps(p) if (p := parse_extra_params(params)) else ""
     extra_env = parse_extra_env_params(env_var)
 
+    if local:
+        click.echo(f"Running Snowflake tasks of {pipeline} pipeline locally...")
+        statements, timeline = run_locally(
+            ctx, pipeline, extra_env, p, local_workers, click.echo
+        )
+        click.echo(timeline.render())
+        Path(output).write_text("\n\n".join(statements))
+        click.echo(f"Snowflake tasks generated into {output}")
+        exit(0 if timeline.succeeded else 1)
+
     click.echo(
         f"Converting Kedro pipeline {pipeline} into Snowflake tasks...{os.linesep}"
         "This may take a while if warehouse is stopped, please be patient..."
@@ -154,7 +183,7 @@ def run(
             success = snowflake_pipeline.run(
                 wait_for_completion,
                 timeout,
-                echo_fn=lambda s: (click.clear(), click.echo(s)),
+                echo_fn=click.echo,
                 on_start_callback=lambda: click.echo(
                     "Snowflake tasks execution started"
                 ),
@@ -173,3 +202,66 @@ def run(
             click.echo(click.style(f"Could not save tasks SQL into {output}", fg="red"))
             raise e
         exit(exit_code)
+
+
+@snowflake_group.command()
+@click.option(
+    "-p",
+    "--pipeline",
+    "pipeline",
+    type=str,
+    help="Name of pipeline to report",
+    default="__default__",
+)
+@click.option(
+    "--runs",
+    type=int,
+    help="Number of the most recent runs to include",
+    default=10,
+)
+@click.option(
+    "--top",
+    type=int,
+    help="Number of the slowest nodes to show",
+    default=10,
+)
+@click.pass_obj
+def stats(ctx: CliContext, pipeline: str, runs: int, top: int):
+    """Shows execution statistics of the recent pipeline runs (requires runtime.run_stats)"""
+    with KedroContextManager(ctx.metadata.package_name, ctx.env) as mgr:
+        run_stats = mgr.plugin_config.snowflake.runtime.run_stats
+        if not run_stats.enabled:
+            click.echo(
+                click.style(
+                    "Run statistics are disabled (runtime.run_stats.enabled), "
+                    "showing the previously collected ones",
+                    fg="yellow",
+                )
+            )
+        session = Session.builder.configs(
+            resolve_connection_params_from_config(mgr)
+        ).create()
+        try:
+            breakdown = runs_breakdown(session, run_stats.table, pipeline, runs)
+            nodes = slowest_nodes(session, run_stats.table, pipeline, runs, top)
+        finally:
+            session.close()
+
+    click.echo(f"Startup/run time breakdown of the last {runs} runs of {pipeline} (s):")
+    click.echo(
+        tabulate(
+            [r.as_dict() for r in breakdown],
+            headers="keys",
+            tablefmt="psql",
+            floatfmt=".1f",
+        )
+    )
+    click.echo("Slowest nodes (s):")
+    click.echo(
+        tabulate(
+            [r.as_dict() for r in nodes],
+            headers="keys",
+            tablefmt="psql",
+            floatfmt=".1f",
+        )
+    )
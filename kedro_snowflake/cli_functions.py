@@ -2,10 +2,19 @@ import json
 import os
 import re
 from contextlib import contextmanager
+from typing import Callable, List, Tuple
+from uuid import uuid4
 
 import click
 
 from kedro_snowflake.generator import SnowflakePipelineGenerator
+from kedro_snowflake.local import (
+    KedroNodesRunner,
+    LocalSession,
+    LocalTaskExecutor,
+    parse_task_plan,
+)
+from kedro_snowflake.local.executor import LocalRunTimeline
 from kedro_snowflake.utils import KedroContextManager
 
 
@@ -44,6 +53,56 @@ def context_and_pipeline(ctx, pipeline, extra_env, extra_params):
         yield mgr, generator.generate()
 
 
+def run_locally(
+    ctx, pipeline, extra_env, extra_params, max_workers, echo_fn: Callable
+) -> Tuple[List[str], LocalRunTimeline]:
+    """Runs the tasks generated for the pipeline locally, against the local session.
+    Returns the task statements and the timeline of the run"""
+    mgr: KedroContextManager
+    with KedroContextManager(ctx.metadata.package_name, ctx.env, extra_params) as mgr:
+        generator = SnowflakePipelineGenerator(
+            pipeline,
+            ctx.env,
+            mgr.plugin_config,
+            local_connection_params(mgr),
+            mgr.context.params,
+            json.dumps(extra_params) if extra_params else "",
+            extra_env,
+        )
+        statements = generator.generate_tasks_sql()
+        with LocalSession() as session:
+            executor = LocalTaskExecutor(
+                parse_task_plan(statements),
+                KedroNodesRunner(
+                    session,
+                    mgr.plugin_config.snowflake.runtime.temporary_stage,
+                    uuid4().hex,
+                    generator.get_kedro_pipeline(),
+                    mgr.context.catalog,
+                    **mgr.plugin_config.snowflake.runtime.intermediate_data.dict(),
+                ),
+                max_workers,
+                on_transition=lambda e: e.node_names
+                and echo_fn(
+                    f"{e.task_name}: {e.state}" + (f" ({e.error})" if e.error else "")
+                ),
+            )
+            return statements, executor.run()
+
+
+def local_connection_params(mgr):
+    """Connection parameters for the generator when nothing is deployed to Snowflake -
+    the missing ones (e.g. the password) are filled with placeholders"""
+    connection = mgr.plugin_config.snowflake.connection.dict(by_alias=True)
+    return {
+        **connection,
+        **{
+            k: connection.get(k) or "local"
+            for k in ("account", "user", "password", "warehouse", "database", "schema")
+        },
+    }
+
+
 def resolve_connection_params_from_config(mgr):
     """Uses either credentials.yml or environment variables to resolve connection parameters
     (especially password for Snowflake)"""
@@ -1,4 +1,4 @@
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
 import yaml
 from pydantic import BaseModel, Field, root_validator
@@ -72,8 +72,99 @@ class DependenciesConfig(BaseModel):
     ]
 
 
+class PackagingConfig(BaseModel):
+    compression_level: int = 5
+    # zstd worker threads per archive, 0 = single-threaded, -1 = number of CPU cores
+    # (split among the processes when the imports are packaged in parallel)
+    compression_threads: int = -1
+    # processes packaging the special imports in parallel, None = number of CPU cores
+    max_workers: Optional[int] = None
+    # byte-identical archives for identical content, so that unchanged ones are not re-uploaded
+    deterministic: bool = True
+    # ship pure-Python imports as zip archives imported without extraction (zipimport)
+    zipimport: bool = False
+    # add bytecode compiled by the local interpreter to the zip archives
+    compile_bytecode: bool = False
+    # project archive filtering, patterns in .gitignore syntax relative to the project root
+    respect_gitignore: bool = True
+    project_include: List[str] = ["conf/**"]
+    project_exclude: List[str] = [
+        "*.pyc",
+        "__pycache__/",
+        ".venv/",
+        "venv/",
+        "mlruns/",
+        "notebooks/",
+        ".ipynb_checkpoints/",
+    ]
+
+
+class GroupingConfig(BaseModel):
+    cls: str = "kedro_snowflake.grouping.IdentityNodeGrouper"
+    params: Optional[Dict[str, Any]] = {}
+
+
+class WarehouseMappingConfig(BaseModel):
+    # Kedro tag -> warehouse of the tasks running nodes with that tag
+    tags: Dict[str, str] = {}
+    # node name -> warehouse, takes precedence over the tags
+    nodes: Dict[str, str] = {}
+
+
+SERVERLESS_WAREHOUSE_SIZES = (
+    "XSMALL",
+    "SMALL",
+    "MEDIUM",
+    "LARGE",
+    "XLARGE",
+    "XXLARGE",
+)
+
+
+class ServerlessConfig(BaseModel):
+    # tasks of all pipelines run on Snowflake-managed compute instead of a warehouse
+    enabled: bool = False
+    initial_warehouse_size: str = "XSMALL"
+    # pipeline name -> initial warehouse size, listed pipelines are serverless even if not enabled
+    pipelines: Dict[str, str] = {}
+    # Kedro tag -> initial warehouse size of the tasks running nodes with that tag
+    tags: Dict[str, str] = {}
+
+    def is_enabled_for(self, pipeline_name: str) -> bool:
+        return self.enabled or pipeline_name in self.pipelines
+
+
+class TaskGraphLimitsConfig(BaseModel):
+    # Snowflake limits of a single task graph (DAG), larger pipelines are split into chained graphs
+    max_tasks_per_graph: int = 1000
+    max_predecessors: int = 100
+    max_child_tasks: int = 100
+
+
+class RunStatsConfig(BaseModel):
+    # timings of the executed nodes are appended to the table by the tasks
+    enabled: bool = False
+    table: str = "KEDRO_SNOWFLAKE_RUN_STATS"
+
+
+class IntermediateDataConfig(BaseModel):
+    # pickle protocol 5 with the large buffers (e.g. of numpy arrays and pandas DataFrames)
+    # stored as separate, uncompressed stage files and memory-mapped on load
+    out_of_band_buffers: bool = False
+    min_buffer_size: int = 1024 * 1024
+
+
 class SnowflakeRuntimeConfig(BaseModel):
     dependencies: DependenciesConfig
+    packaging: PackagingConfig = PackagingConfig()
+    grouping: GroupingConfig = GroupingConfig()
+    task_graph_limits: TaskGraphLimitsConfig = TaskGraphLimitsConfig()
+    warehouses: WarehouseMappingConfig = WarehouseMappingConfig()
+    serverless: ServerlessConfig = ServerlessConfig()
+    # re-create only the tasks and stored procedures which changed since the last deploy
+    incremental_deploy: bool = False
+    run_stats: RunStatsConfig = RunStatsConfig()
+    intermediate_data: IntermediateDataConfig = IntermediateDataConfig()
     stage: str = "@KEDRO_SNOWFLAKE_STAGE"
     temporary_stage: str = "@KEDRO_SNOWFLAKE_TEMP_DATA_STAGE"
     schedule: str = "11520 minute"
@@ -171,9 +262,92 @@ snowflake:
       - openpyxl
       - backoff
       - pydantic
+    # Packaging of the project and special dependencies (imports)
+    packaging:
+      # zstd compression level and number of compression threads per archive
+      # (0 - single-threaded, -1 - number of CPU cores; when the imports are packaged
+      # by multiple processes, -1 gives each of them cores / processes threads, at least 1,
+      # so that together they don't oversubscribe the CPU)
+      compression_level: 5
+      compression_threads: -1
+      # Number of processes packaging the imports in parallel
+      # (~ - number of CPU cores, at most one per import)
+      max_workers: ~
+      # Produce byte-identical archives for identical content (normalized timestamps,
+      # ownership and permissions), so that unchanged ones are not uploaded again
+      deterministic: true
+      # Ship pure-Python imports as zip archives, imported by Snowflake directly from the zip
+      # (zipimport) without extracting them. Imports with data files or extension modules
+      # are still extracted at runtime.
+      zipimport: false
+      # Add bytecode to the zip archives. It's compiled by the local interpreter, so it
+      # will be used only if its version matches the Python version of the stored procedure
+      compile_bytecode: false
+      # Project archive filtering - files ignored by .gitignore (if respect_gitignore is set)
+      # or matching project_exclude are skipped, unless they match project_include.
+      # Patterns use .gitignore syntax and are relative to the project root.
+      # conf/** is included by default, as the Kedro configuration (including credentials)
+      # is needed to run the project in Snowflake.
+      respect_gitignore: true
+      project_include:
+      - conf/**
+      project_exclude:
+      - "*.pyc"
+      - __pycache__/
+      - .venv/
+      - venv/
+      - mlruns/
+      - notebooks/
+      - .ipynb_checkpoints/
     # Optionally provide mapping for user-friendly pipeline names
     pipeline_name_mapping:
      __default__: default
+    # Grouping of Kedro nodes into Snowflake tasks - grouped nodes are executed by a single task
+    # Available groupers:
+    # - kedro_snowflake.grouping.IdentityNodeGrouper - every node in a separate task
+    # - kedro_snowflake.grouping.TagNodeGrouper - nodes tagged with <tag_prefix><group name>
+    #   are grouped together, <tag_prefix> is set in params and defaults to "snowflake.group."
+    # - kedro_snowflake.grouping.NamespaceNodeGrouper - nodes of the same modular pipeline
+    #   (namespace) are grouped together, optionally up to the namespace <level> set in params
+    # - kedro_snowflake.grouping.LinearChainNodeGrouper - linear chains of nodes are grouped
+    grouping:
+      cls: kedro_snowflake.grouping.IdentityNodeGrouper
+      params: ~
+    # Warehouses of the tasks running particular nodes, other tasks use the connection's warehouse
+    # Nodes executed in a single task (see grouping) must not map to different warehouses
+    # warehouses:
+    #   tags:
+    #     feature_engineering: SNOWPARK_OPT_XL_WH
+    #   nodes:
+    #     train_model_node: SNOWPARK_OPT_XL_WH
+    # Serverless tasks - Snowflake manages (and right-sizes) the compute, starting from the initial
+    # warehouse size. Nodes mapped to a warehouse above still run on that warehouse
+    # serverless:
+    #   enabled: false
+    #   initial_warehouse_size: XSMALL
+    #   pipelines:
+    #     __default__: SMALL
+    #   tags:
+    #     feature_engineering: LARGE
+    # Re-create only the tasks and stored procedures which changed since the last deploy
+    incremental_deploy: false
+    # Per-node execution timings collected into a table, see `kedro snowflake stats`
+    run_stats:
+      enabled: false
+      table: KEDRO_SNOWFLAKE_RUN_STATS
+    # Data passed between the tasks - Snowpark DataFrames go to transient tables, other objects to the
+    # stage (pandas DataFrames as Parquet, numpy arrays as .npy, the rest cloudpickled).
+    # With out_of_band_buffers, numpy arrays, pandas DataFrames and other pickled objects are pickled
+    # with protocol 5, storing buffers of at least min_buffer_size bytes as separate, uncompressed
+    # files which are memory-mapped on load
+    intermediate_data:
+      out_of_band_buffers: false
+      min_buffer_size: 1048576
+    # Snowflake task graph limits - larger pipelines are split into chained task graphs
+    task_graph_limits:
+      max_tasks_per_graph: 1000
+      max_predecessors: 100
+      max_child_tasks: 100
   # EXPERIMENTAL: Either MLflow experiment name to enable MLflow tracking
   # or leave empty
 #   mlflow:
@@ -0,0 +1,206 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from toposort import toposort_flatten
+
+from kedro_snowflake.config import TaskGraphLimitsConfig
+from kedro_snowflake.grouping import Grouping
+
+BARRIER_PREFIX = "__barrier"
+LINK_PREFIX = "__link"
+RELAY_PREFIX = "__relay"
+
+
+def transitive_reduction(dependencies: Dict[str, Set[str]]) -> Dict[str, Set[str]]:
+    """Removes dependencies implied by the other ones, e.g. a -> c when a -> b -> c"""
+    ancestors: Dict[str, Set[str]] = {}
+    for task in toposort_flatten(dependencies, sort=True):
+        ancestors[task] = set().union(
+            *(ancestors[d] | {d} for d in dependencies.get(task, ()))
+        )
+    return {
+        task: {
+            d
+            for d in predecessors
+            if not any(d in ancestors[other] for other in predecessors - {d})
+        }
+        for task, predecessors in dependencies.items()
+    }
+
+
+def critical_path(
+    dependencies: Dict[str, Set[str]],
+    durations: Dict[str, float],
+    default_duration: float = 1.0,
+) -> Tuple[List[str], float]:
+    """Longest chain of dependent tasks, weighted by their durations.
+    Returns the tasks of the chain (in execution order) and its total duration"""
+    finish: Dict[str, float] = {}
+    previous: Dict[str, Optional[str]] = {}
+    for task in toposort_flatten(dependencies, sort=True):
+        slowest = max(
+            sorted(dependencies.get(task, ())), key=finish.__getitem__, default=None
+        )
+        previous[task] = slowest
+        finish[task] = durations.get(task, default_duration) + (
+            finish[slowest] if slowest else 0.0
+        )
+    if not finish:
+        return [], 0.0
+
+    task = max(sorted(finish), key=finish.__getitem__)
+    total = finish[task]
+    path = []
+    while task:
+        path.append(task)
+        task = previous[task]
+    return path[::-1], total
+
+
+@dataclass
+class TaskGraph:
+    """Part of the pipeline deployed as a single Snowflake task graph.
+    Root task of the graph is implicit - node groups, the link task and relay tasks depend on it
+    unless they read the run id from a relay task, barrier tasks do not (they only synchronize
+    other tasks)"""
+
+    # node group names, in topological order
+    groups: List[str]
+    # task name (node group, barrier, relay or link) -> names of the preceding tasks in the graph
+    dependencies: Dict[str, Set[str]]
+    barriers: Set[str] = field(default_factory=set)
+    # task starting the next graph, after all the tasks of this graph finished
+    link: Optional[str] = None
+    # tasks forwarding the run id of the root, for graphs exceeding the root children limit
+    relays: Set[str] = field(default_factory=set)
+    # task name -> relay task it reads the run id from (instead of the root)
+    run_id_sources: Dict[str, str] = field(default_factory=dict)
+
+    def ordered_task_names(self) -> List[str]:
+        return toposort_flatten(self.dependencies, sort=True)
+
+    @property
+    def tasks_count(self) -> int:
+        """Number of tasks in the graph, including the root task"""
+        return len(self.dependencies) + 1
+
+
+class TaskGraphPartitioner:
+    """Splits grouped nodes into chained task graphs within Snowflake limits.
+    Node tasks and the link task read the run id returned by the root task. When there are
+    more of them than the root can have children (`max_child_tasks`), they read it from relay
+    tasks forwarding it, fanning out from the root. Pipelines are split into chained graphs
+    only when a graph would exceed `max_tasks_per_graph` - consecutive slices of the topological
+    order are packed into a graph (a slice may end in the middle of a topological level), so
+    that all dependencies between graphs point to the preceding graphs.
+    Tasks with too many predecessors or children are synchronized through barrier tasks."""
+
+    def __init__(
+        self,
+        limits: TaskGraphLimitsConfig,
+        extra_root_children: int = 0,
+    ):
+        # additional children of the root that every node task depends on (e.g. MLflow root)
+        self.limits = limits
+        self.extra_root_children = extra_root_children
+        if (
+            min(limits.max_predecessors, limits.max_child_tasks)
+            < 2 + extra_root_children
+            or limits.max_tasks_per_graph < 3 + extra_root_children
+        ):
+            raise ValueError(f"Task graph limits are too low: {limits}")
+
+    def partition(self, grouping: Grouping) -> List[TaskGraph]:
+        ordered = grouping.ordered_group_names()
+        graph = self._build_graph(ordered, grouping, index=0, is_last=True)
+        if graph.tasks_count + self.extra_root_children <= (
+            self.limits.max_tasks_per_graph
+        ):
+            return [graph]
+
+        graphs = []
+        # the root and the link task take up places in every graph but the last one
+        capacity = self.limits.max_tasks_per_graph - 2 - self.extra_root_children
+        start = 0
+        while start < len(ordered):
+            size = capacity
+            while True:
+                chunk = ordered[start : start + size]
+                is_last = start + size >= len(ordered)
+                graph = self._build_graph(chunk, grouping, len(graphs), is_last)
+                excess = (
+                    graph.tasks_count
+                    + self.extra_root_children
+                    - self.limits.max_tasks_per_graph
+                )
+                if excess <= 0:
+                    break
+                size = max(1, size - excess)
+            graphs.append(graph)
+            start += len(chunk)
+        return graphs
+
+    def _build_graph(
+        self, groups: List[str], grouping: Grouping, index: int, is_last: bool
+    ) -> TaskGraph:
+        link = None if is_last else f"{LINK_PREFIX}_{index}"
+        members = set(groups)
+        dependencies = {g: grouping.dependencies[g] & members for g in groups}
+        if link:
+            has_children = set().union(*dependencies.values())
+            dependencies[link] = members - has_children
+        graph = TaskGraph(list(groups), dependencies, link=link)
+        barriers_count = 0
+
+        def new_barrier() -> str:
+            nonlocal barriers_count
+            barriers_count += 1
+            name = f"{BARRIER_PREFIX}_{index}_{barriers_count}"
+            graph.barriers.add(name)
+            return name
+
+        # fan-in - root (and extra root children) occupy predecessor slots of non-barrier tasks
+        for task in list(dependencies):
+            limit = self.limits.max_predecessors - 1 - self.extra_root_children
+            while len(dependencies[task]) > limit:
+                predecessors = sorted(dependencies[task])
+                dependencies[task] = set()
+                for i in range(0, len(predecessors), self.limits.max_predecessors):
+                    barrier = new_barrier()
+                    dependencies[barrier] = set(
+                        predecessors[i : i + self.limits.max_predecessors]
+                    )
+                    dependencies[task].add(barrier)
+
+        # fan-out
+        pending = list(dependencies)
+        while pending:
+            task = pending.pop()
+            children = sorted(c for c, deps in dependencies.items() if task in deps)
+            if len(children) <= self.limits.max_child_tasks:
+                continue
+            for i in range(0, len(children), self.limits.max_child_tasks):
+                relay = new_barrier()
+                dependencies[relay] = {task}
+                for child in children[i : i + self.limits.max_child_tasks]:
+                    dependencies[child] = (dependencies[child] - {task}) | {relay}
+            pending.append(task)  # the relays might be too many as well
+
+        # run id - up to the limit, the tasks reading it are children of the root,
+        # the others read it from relay tasks (possibly through other relays)
+        readers = list(groups) + ([link] if link else [])
+        relays_count = 0
+        while len(readers) > self.limits.max_child_tasks - self.extra_root_children:
+            relays = []
+            for i in range(0, len(readers), self.limits.max_child_tasks):
+                relays_count += 1
+                relay = f"{RELAY_PREFIX}_{index}_{relays_count}"
+                graph.relays.add(relay)
+                dependencies[relay] = set()
+                for task in readers[i : i + self.limits.max_child_tasks]:
+                    dependencies[task].add(relay)
+                    graph.run_id_sources[task] = relay
+                relays.append(relay)
+            readers = relays
+
+        return graph
@@ -1,17 +1,29 @@
 import logging
+import mmap
+import os
+import shutil
+import tempfile
+from collections import defaultdict
+from contextlib import ExitStack
 from functools import cached_property
-from io import BytesIO
-from sys import version_info
-from typing import Any, Dict, Union
+from io import BytesIO, RawIOBase
+from pickle import PickleBuffer
+from typing import Any, Dict, List, Optional, Union
 
 import backoff
-import cloudpickle
 import zstandard as zstd
-from kedro.io import AbstractDataSet
+from kedro.io import AbstractDataSet, DataSetError
 from snowflake.snowpark import DataFrame as SnowParkDataFrame
 from snowflake.snowpark import Session
 from snowflake.snowpark import functions as F
 
+from kedro_snowflake.datasets.serializers import (
+    SERIALIZERS,
+    CloudpickleSerializer,
+    Serializer,
+    SerializerRegistry,
+)
+
 logger = logging.getLogger()
 
 
@@ -59,19 +71,128 @@ class SnowflakeTransientTableDataSet(AbstractDataSet):
         return {"table_name": self.table_name}
 
 
+class _StagePartsWriter(RawIOBase):
+    """Writable stream uploading the data to the stage in parts of `part_size` bytes,
+    named `<target_path>.part<index>`"""
+
+    def __init__(self, session: Session, target_path: str, part_size: int):
+        self.session = session
+        self.target_path = target_path
+        self.part_size = part_size
+        self.parts_count = 0
+        self._position = 0
+        self._buffer = BytesIO()
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def write(self, data) -> int:
+        written = self._buffer.write(data)
+        self._position += written
+        if self._buffer.tell() >= self.part_size:
+            self._upload_part()
+        return written
+
+    def _upload_part(self):
+        name = f"{self.target_path}.part{self.parts_count:05d}"
+        self._buffer.seek(0)
+        setattr(self._buffer, "name", name.rsplit("/", 1)[-1])
+        self.session.file.put_stream(
+            self._buffer, name, auto_compress=False, overwrite=True
+        )
+        self.parts_count += 1
+        self._buffer = BytesIO()
+
+    def close(self):
+        if not self.closed and (self._buffer.tell() or not self.parts_count):
+            self._upload_part()
+        super().close()
+
+
+class _StagePartsReader(RawIOBase):
+    """Readable stream concatenating the parts written by the `_StagePartsWriter`,
+    downloading one part at a time"""
+
+    def __init__(self, session: Session, stage_location: str, part_names: List[str]):
+        self.session = session
+        self.stage_location = stage_location
+        self._pending = list(part_names)
+        self._part = BytesIO()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while True:
+            read = self._part.readinto(buffer)
+            if read or not self._pending:
+                return read
+            self._part = self.session.file.get_stream(
+                f"{self.stage_location}/{self._pending.pop(0)}"
+            )
+
+
+class _BufferReader(RawIOBase):
+    """Readable stream over the memory of a pickle buffer, uploaded without copying it"""
+
+    def __init__(self, buffer: PickleBuffer, name: str):
+        self._view = buffer.raw()
+        self._position = 0
+        self.name = name
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        chunk = self._view[self._position : self._position + len(buffer)]
+        buffer[: len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+
 class SnowflakeStagePickleDataSet(AbstractDataSet):
+    """Stores the objects on the stage, serialized (cloudpickled by default) and compressed.
+    The data is streamed to and from the stage in parts of `part_size` (compressed) bytes,
+    so that the memory needed on top of the object itself doesn't depend on its size.
+    The files are named `<dataset_name>.<format>.part<index>` after the serializer's format.
+
+    With `out_of_band_buffers`, objects are pickled with protocol 5 and the buffers of at least
+    `min_buffer_size` bytes (e.g. of numpy arrays and pandas DataFrames) are stored uncompressed,
+    as separate `<dataset_name>.pkl.buffer<index>` files. On load they are downloaded to a
+    temporary directory and memory-mapped (copy-on-write), instead of being decompressed and
+    copied by the unpickler."""
+
+    DEFAULT_PART_SIZE = 64 * 1024 * 1024
+    DEFAULT_MIN_BUFFER_SIZE = 1024 * 1024
+
     def __init__(
         self,
         dataset_name: str,
         snowflake_stage: str,
         run_id: str,
         snowflake_session: Session,
+        part_size: int = DEFAULT_PART_SIZE,
+        serializer: Optional[Serializer] = None,
+        out_of_band_buffers: bool = False,
+        min_buffer_size: int = DEFAULT_MIN_BUFFER_SIZE,
     ):
         self.dataset_name = dataset_name
         self.snowflake_session: Session = snowflake_session
         self.snowflake_stage = snowflake_stage
         self.run_id = run_id
-        self.pickle_protocol = None if version_info[:2] > (3, 8) else 4
+        self.part_size = part_size
+        self.serializer = serializer or CloudpickleSerializer()
+        if out_of_band_buffers and not isinstance(
+            self.serializer, CloudpickleSerializer
+        ):
+            raise ValueError(
+                "Out-of-band buffers are supported only by the cloudpickle serializer"
+            )
+        self.out_of_band_buffers = out_of_band_buffers
+        self.min_buffer_size = min_buffer_size
 
     @cached_property
     def target_stage_location(self):
@@ -79,41 +200,127 @@ class SnowflakeStagePickleDataSet(AbstractDataSet):
 
     @cached_property
     def target_name(self):
-        return f"{self.dataset_name}.pkl"
+        return f"{self.dataset_name}.{self.serializer.format}"
 
     @cached_property
     def target_path(self):
         return f"{self.target_stage_location}/{self.target_name}"
 
+    @cached_property
+    def _parts_pattern(self) -> str:
+        # character classes instead of backslashes, which are escape characters in SQL strings
+        name = "".join(
+            c if c.isalnum() or c in "_-" else f"[{c}]" for c in self.dataset_name
+        )
+        return f".*/{name}[.][a-z0-9]+[.](part|buffer)[0-9]+"
+
+    @cached_property
+    def _quoted_files_prefix(self) -> str:
+        # the run id might be anything, e.g. the MLflow config (JSON) when MLflow is enabled
+        prefix = f"{self.target_stage_location}/{self.dataset_name}."
+        return "'" + prefix.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+    def stored_files(self) -> Dict[str, List[str]]:
+        """Names of the files (parts and buffers) saved on the stage for the dataset,
+        by their format"""
+        files = defaultdict(list)
+        for row in self.snowflake_session.sql(
+            f"LS {self._quoted_files_prefix} PATTERN = '{self._parts_pattern}'"
+        ).collect():
+            name = row[0].rsplit("/", 1)[-1]
+            files[name.rsplit(".", 2)[-2]].append(name)
+        return {format: sorted(names) for format, names in files.items()}
+
     @backoff.on_exception(backoff.expo, Exception, max_time=60)
     def _load(self):
-        with zstd.open(
-            self.snowflake_session.file.get_stream(self.target_path),
-            "rb",
-        ) as stream:
-            return cloudpickle.load(stream)
+        files = defaultdict(list)
+        for name in self.stored_files().get(self.serializer.format, []):
+            files[name.rsplit(".", 1)[-1].rstrip("0123456789")].append(name)
+        if not (part_names := files["part"]):
+            raise FileNotFoundError(f"No data saved in {self.target_path}")
+        with ExitStack() as stack:
+            stream = _StagePartsReader(
+                self.snowflake_session, self.target_stage_location, part_names
+            )
+            if self.serializer.compressed:
+                stream = stack.enter_context(zstd.open(stream, "rb"))
+            if self.serializer.seekable:
+                spooled = stack.enter_context(tempfile.TemporaryFile())
+                shutil.copyfileobj(stream, spooled, 1024 * 1024)
+                spooled.seek(0)
+                stream = spooled
+            if files["buffer"]:
+                return self.serializer.load(
+                    stream, buffers=self._map_buffers(files["buffer"])
+                )
+            return self.serializer.load(stream)
+
+    def _map_buffers(self, buffer_names: List[str]) -> List[Any]:
+        local_dir = tempfile.mkdtemp(prefix="kedro-snowflake-buffers-")
+        try:
+            self.snowflake_session.file.get(f"{self.target_path}.buffer", local_dir)
+            buffers = []
+            for name in buffer_names:
+                with open(os.path.join(local_dir, name), "rb") as f:
+                    # mapping of an empty file is not allowed
+                    buffers.append(
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+                        if os.fstat(f.fileno()).st_size
+                        else bytearray()
+                    )
+            return buffers
+        finally:
+            # the mappings outlive the files on POSIX systems
+            shutil.rmtree(local_dir, ignore_errors=True)
 
     def _save(self, data: Any) -> None:
-        with BytesIO() as buffer:
+        # parts of the previously saved object might outnumber the new ones or be in other format
+        self.snowflake_session.sql(
+            f"REMOVE {self._quoted_files_prefix} PATTERN = '{self._parts_pattern}'"
+        ).collect()
+        writer = _StagePartsWriter(
+            self.snowflake_session, self.target_path, self.part_size
+        )
+        dump_kwargs = (
+            {"buffer_callback": self._upload_buffer_callback()}
+            if self.out_of_band_buffers
+            else {}
+        )
+        if self.serializer.compressed:
             with zstd.open(
-                buffer, "wb", cctx=zstd.ZstdCompressor(level=5), closefd=False
+                writer, "wb", cctx=zstd.ZstdCompressor(level=5), closefd=False
             ) as stream:
-                cloudpickle.dump(data, stream, protocol=self.pickle_protocol)
-            buffer.flush()
-            buffer.seek(0)
-            setattr(buffer, "name", self.target_name)
+                self.serializer.dump(data, stream, **dump_kwargs)
+        else:
+            self.serializer.dump(data, writer, **dump_kwargs)
+        writer.close()
+
+    def _upload_buffer_callback(self):
+        buffers_count = 0
+
+        def upload(buffer: PickleBuffer) -> bool:
+            nonlocal buffers_count
+            if buffer.raw().nbytes < self.min_buffer_size:
+                return True  # pickled in-band
+            name = f"{self.target_path}.buffer{buffers_count:05d}"
             self.snowflake_session.file.put_stream(
-                buffer,
-                self.target_path,
+                _BufferReader(buffer, name.rsplit("/", 1)[-1]),
+                name,
                 auto_compress=False,
                 overwrite=True,
             )
+            buffers_count += 1
+            return False
+
+        return upload
 
     def _describe(self) -> Dict[str, Any]:
         return {
             "info": "for use only within Snowflake",
             "dataset_name": self.dataset_name,
             "path": self.target_stage_location,
+            "format": self.serializer.format,
+            "out_of_band_buffers": self.out_of_band_buffers,
         }
 
 
@@ -125,12 +332,18 @@ class SnowflakeRunnerDataSet(AbstractDataSet):
         run_id: str,
         snowflake_session: Session,
         run_id_column_name: str,
+        serializers: SerializerRegistry = SERIALIZERS,
+        out_of_band_buffers: bool = False,
+        min_buffer_size: int = SnowflakeStagePickleDataSet.DEFAULT_MIN_BUFFER_SIZE,
     ):
         self.run_id_column_name = run_id_column_name
         self.dataset_name = dataset_name
         self.snowflake_session: Session = snowflake_session
         self.snowflake_stage = snowflake_stage
         self.run_id = run_id
+        self.serializers = serializers
+        self.out_of_band_buffers = out_of_band_buffers
+        self.min_buffer_size = min_buffer_size
 
     def _transient_ds(self) -> SnowflakeTransientTableDataSet:
         return SnowflakeTransientTableDataSet(
@@ -141,28 +354,57 @@ class SnowflakeRunnerDataSet(AbstractDataSet):
             snowflake_session=self.snowflake_session,
         )
 
-    def _pickle_ds(self) -> SnowflakeStagePickleDataSet:
+    def _stage_ds(self, serializer: Serializer = None) -> SnowflakeStagePickleDataSet:
+        serializer = serializer or self.serializers.fallback
         return SnowflakeStagePickleDataSet(
             dataset_name=self.dataset_name,
             snowflake_stage=self.snowflake_stage,
             run_id=self.run_id,
             snowflake_session=self.snowflake_session,
+            serializer=serializer,
+            # any cloudpickled object, the buffer-backed ones are cloudpickled then too
+            out_of_band_buffers=self.out_of_band_buffers
+            and isinstance(serializer, CloudpickleSerializer),
+            min_buffer_size=self.min_buffer_size,
         )
 
     def _load(self):
         if (tds := self._transient_ds()).table_exists():
             return tds.load()
-        else:
-            return self._pickle_ds().load()
+        return self._load_from_stage()
+
+    @backoff.on_exception(backoff.expo, FileNotFoundError, max_time=60)
+    def _load_from_stage(self):
+        # the format is recorded in the names of the saved files
+        if not (formats := list(self._stage_ds().stored_files())):
+            raise FileNotFoundError(f"No data saved for {self.dataset_name}")
+        if len(formats) > 1:
+            raise DataSetError(
+                f"Data of {self.dataset_name} saved in multiple formats: {formats}"
+            )
+        return self._stage_ds(self.serializers.for_format(formats[0])).load()
 
     def _save(self, data) -> None:
         if isinstance(data, SnowParkDataFrame):
             ds = self._transient_ds()
             logger.info(f"Saving into transient table {ds.table_name} [{self.run_id}]")
-        else:
-            ds = self._pickle_ds()
-            logger.info(f"Saving into stage {ds.target_path} [{self.run_id}]")
-        ds.save(data)
+            ds.save(data)
+            return
+
+        ds = self._stage_ds(self.serializers.for_data(data, self.out_of_band_buffers))
+        logger.info(f"Saving into stage {ds.target_path} [{self.run_id}]")
+        try:
+            ds.save(data)
+        except DataSetError:
+            if ds.serializer is self.serializers.fallback:
+                raise
+            # e.g. DataFrames with non-string column names or mixed-type columns for Parquet
+            logger.warning(
+                f"Could not save {self.dataset_name} in {ds.serializer.format} format, "
+                f"falling back to {self.serializers.fallback.format}",
+                exc_info=True,
+            )
+            self._stage_ds().save(data)
 
     def _describe(self) -> Dict[str, Any]:
         return {
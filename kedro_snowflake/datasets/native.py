@@ -1,8 +1,13 @@
+import atexit
+import hashlib
+import json
 import logging
+import threading
 from contextlib import contextmanager
 from copy import deepcopy
 from pathlib import Path
 from tempfile import TemporaryDirectory
+from time import monotonic
 from typing import Any, Dict, Optional, Union
 
 import snowflake.snowpark as sp
@@ -17,6 +22,78 @@ from omegaconf import DictConfig, OmegaConf
 
 logger = logging.getLogger(__name__)
 
+# sessions idle for longer than that are probed before being reused,
+# as their tokens might have expired on the server side
+SESSION_PROBE_INTERVAL = 60.0
+
+_sessions: Dict[str, sp.Session] = {}
+# monotonic time of the last use of the cached session
+_sessions_last_used: Dict[str, float] = {}
+_sessions_lock = threading.Lock()
+
+
+def _get_cached_session(connection_parameters: Dict[str, Any]) -> sp.Session:
+    """Returns a session shared by all the datasets using the same connection parameters,
+    so that the process logs in to Snowflake once per connection instead of once per load/save.
+    Sessions that got closed or expired are replaced with new ones.
+    The lock guards only the cache, the sessions are probed and created outside of it"""
+    key = hashlib.sha256(
+        json.dumps(connection_parameters, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    with _sessions_lock:
+        session = _sessions.get(key)
+        idle_time = monotonic() - _sessions_last_used.get(key, 0.0)
+    if session is not None and _is_usable(session, idle_time):
+        with _sessions_lock:
+            _sessions_last_used[key] = monotonic()
+        return session
+
+    logger.debug("Creating snowpark session")
+    created = sp.Session.builder.configs(connection_parameters).create()
+    with _sessions_lock:
+        current = _sessions.get(key)
+        if current is None or current is session:
+            _sessions[key] = current = created
+        _sessions_last_used[key] = monotonic()
+    if current is not created:
+        # another thread replaced the session in the meantime
+        _close_session(created)
+    return current
+
+
+def _is_usable(session: sp.Session, idle_time: float) -> bool:
+    """Whether the session can still run queries - the connection may look open,
+    while the session token has already expired on the server side. Only the sessions
+    idle for longer than `SESSION_PROBE_INTERVAL` are probed with a query"""
+    if session._conn.is_closed():
+        return False
+    if idle_time < SESSION_PROBE_INTERVAL:
+        return True
+    try:
+        session.sql("select 1").collect()
+        return True
+    except Exception:  # noqa
+        logger.debug("Cached snowpark session is not usable", exc_info=True)
+        _close_session(session)
+        return False
+
+
+def _close_session(session: sp.Session):
+    try:
+        session.close()
+    except Exception:  # noqa
+        logger.debug("Could not close snowpark session", exc_info=True)
+
+
+@atexit.register
+def _close_cached_sessions():
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+        _sessions_last_used.clear()
+    for session in sessions:
+        _close_session(session)
+
 
 class SnowflakeStageFileDataSet(AbstractDataSet):
     """
@@ -110,8 +187,8 @@ class SnowflakeStageFileDataSet(AbstractDataSet):
             logger.debug("Trying to reuse active snowpark session...")
             session = sp.context.get_active_session()
         except sp.exceptions.SnowparkSessionException:
-            logger.debug("No active snowpark session found. Creating")
-            session = sp.Session.builder.configs(self._connection_parameters).create()
+            logger.debug("No active snowpark session found, using cached one")
+            session = _get_cached_session(self._connection_parameters)
         return session
 
     def _construct_dataset(self, target_path: Path):
@@ -0,0 +1,204 @@
+import sys
+from abc import ABC, abstractmethod
+from pickle import PickleBuffer
+from sys import version_info
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import cloudpickle
+
+
+class Serializer(ABC):
+    """Writes objects of the supported types to a binary stream and reads them back.
+    The format is recorded in the names of the stage files, so it has to be unique
+    and consist of lowercase letters and digits only"""
+
+    format: str
+    # whether the stream should be compressed with zstd (False for already compressed formats)
+    compressed: bool = True
+    # whether loading requires a seekable stream - the data is spooled to a temporary file then
+    seekable: bool = False
+    # whether the serialized objects are backed by large memory buffers - with out-of-band
+    # buffers enabled, such objects are pickled with protocol 5 instead, to be memory-mapped on load
+    buffer_backed: bool = False
+
+    @abstractmethod
+    def accepts(self, data: Any) -> bool:
+        ...
+
+    @abstractmethod
+    def dump(self, data: Any, stream: IO[bytes]) -> None:
+        ...
+
+    @abstractmethod
+    def load(self, stream: IO[bytes]) -> Any:
+        ...
+
+
+class CloudpickleSerializer(Serializer):
+    format = "pkl"
+
+    def __init__(self, protocol: Optional[int] = None):
+        self.protocol = (
+            protocol
+            if protocol is not None
+            else (None if version_info[:2] > (3, 8) else 4)
+        )
+
+    def accepts(self, data: Any) -> bool:
+        return True
+
+    def dump(
+        self,
+        data: Any,
+        stream: IO[bytes],
+        buffer_callback: Optional[Callable[[PickleBuffer], Any]] = None,
+    ) -> None:
+        """With the `buffer_callback`, pickles with protocol 5 - the buffers for which
+        the callback returns a false value are not written to the stream (out-of-band)"""
+        if buffer_callback is None:
+            cloudpickle.dump(data, stream, protocol=self.protocol)
+        else:
+            cloudpickle.dump(data, stream, protocol=5, buffer_callback=buffer_callback)
+
+    def load(self, stream: IO[bytes], buffers: Iterable[Any] = None) -> Any:
+        return cloudpickle.load(stream, buffers=buffers)
+
+
+class ParquetSerializer(Serializer):
+    """pandas DataFrames as Parquet files (through Arrow)"""
+
+    format = "parquet"
+    compressed = False
+    seekable = True
+    buffer_backed = True
+
+    def accepts(self, data: Any) -> bool:
+        pd = sys.modules.get("pandas")
+        # other column names would be converted to strings
+        return (
+            pd is not None
+            and type(data) is pd.DataFrame
+            and data.columns.is_unique
+            and all(isinstance(c, str) for c in data.columns)
+            and all(self._round_trips(values) for values in self._object_values(data))
+        )
+
+    @staticmethod
+    def _object_values(data) -> Iterator[Any]:
+        """Columns and index levels of the object dtype"""
+        for column in data.columns[data.dtypes == object]:
+            yield data[column]
+        for level in range(data.index.nlevels):
+            if (values := data.index.get_level_values(level)).dtype == object:
+                yield values
+
+    @staticmethod
+    def _round_trips(values) -> bool:
+        """Whether the object values come back the same from Arrow - only strings and
+        None do, e.g. lists are loaded as arrays and NaNs as None"""
+        import pandas as pd
+
+        return pd.api.types.infer_dtype(values) in ("string", "empty") and all(
+            v is None for v in values[pd.isna(values)]
+        )
+
+    def dump(self, data: Any, stream: IO[bytes]) -> None:
+        data.to_parquet(stream, engine="pyarrow", compression="zstd")
+
+    def load(self, stream: IO[bytes]) -> Any:
+        import pandas as pd
+
+        return pd.read_parquet(stream, engine="pyarrow")
+
+
+class NumpySerializer(Serializer):
+    """numpy arrays (without Python objects) in the .npy format"""
+
+    format = "npy"
+    buffer_backed = True
+
+    def accepts(self, data: Any) -> bool:
+        np = sys.modules.get("numpy")
+        return np is not None and type(data) is np.ndarray and not data.dtype.hasobject
+
+    def dump(self, data: Any, stream: IO[bytes]) -> None:
+        import numpy as np
+
+        np.lib.format.write_array(stream, data, allow_pickle=False)
+
+    def load(self, stream: IO[bytes]) -> Any:
+        import numpy as np
+
+        return np.lib.format.read_array(stream, allow_pickle=False)
+
+
+class JoblibSerializer(Serializer):
+    """scikit-learn estimators (and pipelines) with joblib"""
+
+    format = "joblib"
+    seekable = True
+
+    def accepts(self, data: Any) -> bool:
+        # no estimators unless scikit-learn was already imported
+        base = sys.modules.get("sklearn.base")
+        return base is not None and isinstance(data, base.BaseEstimator)
+
+    def dump(self, data: Any, stream: IO[bytes]) -> None:
+        import joblib
+
+        joblib.dump(data, stream)
+
+    def load(self, stream: IO[bytes]) -> Any:
+        import joblib
+
+        return joblib.load(stream)
+
+
+class SerializerRegistry:
+    """Serializers checked in order for the object being saved, the fallback one
+    is used for the objects not accepted by any of them"""
+
+    def __init__(self, serializers: List[Serializer], fallback: Serializer):
+        self.serializers = list(serializers)
+        self.fallback = fallback
+
+    def register(self, serializer: Serializer, first: bool = True) -> None:
+        """Adds the serializer, by default taking precedence over the registered ones.
+        A serializer registered earlier for the same format is replaced"""
+        self.serializers = [
+            s for s in self.serializers if s.format != serializer.format
+        ]
+        if first:
+            self.serializers.insert(0, serializer)
+        else:
+            self.serializers.append(serializer)
+
+    @property
+    def by_format(self) -> Dict[str, Serializer]:
+        return {s.format: s for s in [self.fallback] + self.serializers}
+
+    def for_data(self, data: Any, out_of_band_buffers: bool = False) -> Serializer:
+        """Serializer of the object, skipping the buffer-backed ones when the out-of-band
+        buffers are used"""
+        return next(
+            (
+                s
+                for s in self.serializers
+                if not (out_of_band_buffers and s.buffer_backed) and s.accepts(data)
+            ),
+            self.fallback,
+        )
+
+    def for_format(self, format: str) -> Serializer:
+        if format not in self.by_format:
+            raise ValueError(
+                f"No serializer registered for the {format} format, "
+                f"available formats: {', '.join(sorted(self.by_format))}"
+            )
+        return self.by_format[format]
+
+
+SERIALIZERS = SerializerRegistry(
+    [ParquetSerializer(), NumpySerializer(), JoblibSerializer()],
+    fallback=CloudpickleSerializer(),
+)
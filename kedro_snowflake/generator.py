@@ -1,20 +1,44 @@
+import asyncio
+import hashlib
 import json
 import logging
 import os
 import re
 import tempfile
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from functools import cached_property
-from pathlib import Path
-from typing import Any, Dict, List, Optional
+from io import BytesIO
+from multiprocessing import get_context
+from pathlib import Path, PurePosixPath
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
 from kedro.pipeline import Pipeline
+from kedro.pipeline.node import Node
 from snowflake.snowpark.functions import sproc
 from snowflake.snowpark.session import Session
 
-from kedro_snowflake.config import KedroSnowflakeConfig
+from kedro_snowflake.config import (
+    SERVERLESS_WAREHOUSE_SIZES,
+    KedroSnowflakeConfig,
+    PackagingConfig,
+)
+from kedro_snowflake.dag import (
+    TaskGraph,
+    TaskGraphPartitioner,
+    critical_path,
+    transitive_reduction,
+)
+from kedro_snowflake.grouping import Grouping, NodeGrouper
+from kedro_snowflake.monitoring import collect_async
 from kedro_snowflake.pipeline import KedroSnowflakePipeline
 from kedro_snowflake.utils import (
+    ProjectFilesFilter,
+    dynamic_init_class,
     get_module_path,
+    hash_file,
+    is_zip_importable,
     zip_dependencies,
     zstd_folder,
 )
@@ -23,12 +47,25 @@ logger = logging.getLogger(__name__)
 
 PARAMS_PREFIX = "params:"
 
+# stage name -> lock of the deployments to the stage from this process
+_stage_locks: Dict[str, threading.Lock] = {}
+
+
+def _stage_lock(stage: str) -> threading.Lock:
+    return _stage_locks.setdefault(stage.lstrip("@").upper(), threading.Lock())
+
 
 class SnowflakePipelineGenerator:
     SPROC_NAME = "RUN_KEDRO"
+    ARTIFACTS_MANIFEST_NAME = "kedro_snowflake_manifest.json"
+    # where the stored procedures extract the project archives, on the warehouse nodes
+    EXTRACTION_CACHE_DIR = "/tmp/kedro_snowflake"
+    # seconds since the last use after which the archives of the previous deployments are
+    # removed from the cache - the longest possible task run (USER_TASK_TIMEOUT_MS <= 1 day)
+    EXTRACTION_CACHE_GRACE_PERIOD = 24 * 60 * 60
     TASK_TEMPLATE = """
 create or replace task {task_name}
-warehouse = '{warehouse}'
+{compute}
 after {after_tasks}
 as
 {task_body};
@@ -36,6 +73,17 @@ as
     TASK_BODY_TEMPLATE = """
 call {sproc_name}('{environment}', system$get_predecessor_return_value('{root_task_name}'), '{pipeline_name}', ARRAY_CONSTRUCT({nodes_to_run}), '{extra_params}')
 """.strip()  # noqa: E501
+    BARRIER_TASK_BODY = "select 1"
+    RELAY_TASK_BODY_TEMPLATE = """
+call system$set_return_value(system$get_predecessor_return_value('{source_task_name}'))
+""".strip()  # noqa: E501
+    LINK_TASK_BODY_TEMPLATE = """
+call {sproc_name}(system$get_predecessor_return_value('{root_task_name}'), '{next_root_task_name}')
+""".strip()  # noqa: E501
+    RUN_ID_HANDOFF_DIR = "kedro-snowflake-runs"
+    TASK_DEFINITION_PATTERN = re.compile(
+        r"create or replace task (\S+)\ncomment = '([^']*)'"
+    )
 
     def __init__(
         self,
@@ -66,6 +114,10 @@ call {sproc_name}('{environment}', system$get_predecessor_return_value('{root_ta
             and self.config.snowflake.mlflow.experiment_name
             else False
         )
+        self.grouper: NodeGrouper = dynamic_init_class(
+            self.config.snowflake.runtime.grouping.cls,
+            **(self.config.snowflake.runtime.grouping.params or {}),
+        )
 
     def _get_pipeline_name_for_snowflake(self):
         return (self.config.snowflake.runtime.pipeline_name_mapping or {}).get(
@@ -79,15 +131,22 @@ call {sproc_name}('{environment}', system$get_predecessor_return_value('{root_ta
         pipeline_name: str,
         nodes_to_run: List[str],
         extra_params: Optional[str] = None,
+        root_task_name: Optional[str] = None,
+        compute: Optional[str] = None,
+        run_id_task_name: Optional[str] = None,
     ):
+        # run id is returned by the root task (MLflow root if enabled) or forwarded by a relay
         return self.TASK_TEMPLATE.format(
             task_name=task_name,
-            warehouse=self.connection_parameters["warehouse"],
+            compute=compute or self._compute_clause(),
             after_tasks=",".join(after_tasks),
             task_body=self.TASK_BODY_TEMPLATE.format(
-                root_task_name=self._root_task_name
-                if not self.mlflow_enabled
-                else self._mlflow_root_task_name,
+                root_task_name=run_id_task_name
+                or (
+                    (root_task_name or self._root_task_name)
+                    if not self.mlflow_enabled
+                    else self._mlflow_root_task_name
+                ),
                 environment=self.kedro_environment,
                 sproc_name=self.SPROC_NAME,
                 pipeline_name=pipeline_name,
@@ -99,22 +158,76 @@ call {sproc_name}('{environment}', system$get_predecessor_return_value('{root_ta
     def _generate_root_task_sql(self):
         return """
 create or replace task {task_name}
-warehouse = '{warehouse}'
+{compute}
 schedule = '{schedule}'
 as
 call {root_sproc}();
 """.strip().format(
             task_name=self._root_task_name,
-            warehouse=self.connection_parameters["warehouse"],
+            compute=self._compute_clause(),
             root_sproc=self._root_sproc_name,
             schedule=self.config.snowflake.runtime.schedule,
         )
 
-    def _generate_root_task_suspend_sql(self):
+    def _generate_barrier_task_sql(self, task_name: str, after_tasks: List[str]):
+        return self.TASK_TEMPLATE.format(
+            task_name=task_name,
+            compute=self._compute_clause(),
+            after_tasks=",".join(after_tasks),
+            task_body=self.BARRIER_TASK_BODY,
+        )
+
+    def _generate_relay_task_sql(
+        self, task_name: str, after_tasks: List[str], source_task_name: str
+    ):
+        return self.TASK_TEMPLATE.format(
+            task_name=task_name,
+            compute=self._compute_clause(),
+            after_tasks=",".join(after_tasks),
+            task_body=self.RELAY_TASK_BODY_TEMPLATE.format(
+                source_task_name=source_task_name
+            ),
+        )
+
+    def _generate_link_task_sql(
+        self,
+        task_name: str,
+        after_tasks: List[str],
+        root_task_name: str,
+        next_root_task_name: str,
+    ):
+        return self.TASK_TEMPLATE.format(
+            task_name=task_name,
+            compute=self._compute_clause(),
+            after_tasks=",".join(after_tasks),
+            task_body=self.LINK_TASK_BODY_TEMPLATE.format(
+                sproc_name=self._link_sproc_name,
+                root_task_name=root_task_name,
+                next_root_task_name=next_root_task_name,
+            ),
+        )
+
+    def _generate_continuation_root_task_sql(self, task_name: str):
+        # Schedule is required to enable the graph, but the task stays suspended
+        # and is executed by the link task of the preceding graph
+        return """
+create or replace task {task_name}
+{compute}
+schedule = '{schedule}'
+as
+call {continue_sproc}('{task_name}');
+""".strip().format(
+            task_name=task_name,
+            compute=self._compute_clause(),
+            continue_sproc=self._continue_sproc_name,
+            schedule=self.config.snowflake.runtime.schedule,
+        )
+
+    def _generate_root_task_suspend_sql(self, task_name: Optional[str] = None):
         return """
 alter task {task_name} suspend;
         """.strip().format(
-            task_name=self._root_task_name
+            task_name=task_name or self._root_task_name
         )
 
     def _generate_mlflow_drop_task_sql(self):
@@ -127,13 +240,13 @@ drop task if exists {task_name};
     def _generate_mlflow_root_task_sql(self):
         return """
 create or replace task {task_name}
-warehouse = '{warehouse}'
+{compute}
 after {after_task}
 as
 call {root_sproc}();
 """.strip().format(
             task_name=self._mlflow_root_task_name,
-            warehouse=self.connection_parameters["warehouse"],
+            compute=self._compute_clause(),
             root_sproc=self._mlflow_root_sproc_name,
             after_task=self._root_task_name,
         )
@@ -146,39 +259,291 @@ call {root_sproc}();
         self,
         pipeline: Pipeline,
     ) -> List[str]:
-        sql_statements = [
-            self._generate_root_task_sql(),
-            self._generate_root_task_suspend_sql(),
+        return [
+            sql
+            for wave in self._generate_snowflake_tasks_waves(pipeline)
+            for sql in wave
         ]
+
+    def _generate_snowflake_tasks_waves(
+        self,
+        pipeline: Pipeline,
+    ) -> List[List[str]]:
+        """Groups the task statements into waves - statements of a single wave
+        depend only on the statements of the preceding waves, so they can be submitted
+        concurrently. The number of waves grows with the depth of the pipeline,
+        not with the number of its nodes."""
+        waves = defaultdict(list)
+        levels = {}
+        digests = {}
+
+        def add(sql: str, task: Optional[str] = None, after: List[str] = ()):
+            level = 1 + max((levels[t] for t in after), default=-1)
+            if task and sql.startswith("create or replace task"):
+                # digest covers the predecessors, so that their changes re-create the task
+                digests[task] = hashlib.sha256(
+                    "\n".join([sql] + [digests[t] for t in sorted(after)]).encode()
+                ).hexdigest()
+                sql = self._mark_task_definition(sql, digests[task])
+            waves[level].append(sql)
+            if task:
+                levels[task] = level
+
+        add(self._generate_root_task_sql(), self._root_task_name)
+        # children are created once the root is suspended
+        add(
+            self._generate_root_task_suspend_sql(),
+            self._root_task_name,
+            [self._root_task_name],
+        )
         if self.mlflow_enabled:
-            sql_statements.append(self._generate_mlflow_root_task_sql())
+            add(
+                self._generate_mlflow_root_task_sql(),
+                self._mlflow_root_task_name,
+                [self._root_task_name],
+            )
         else:
-            sql_statements.append(self._generate_mlflow_drop_task_sql())
-
-        node_dependencies = (
-            pipeline.node_dependencies
-        )  # <-- this one is not topological
-        for node in pipeline.nodes:  # <-- this one is topological
-            after_tasks = [self._root_task_name] + [
-                f"{self._standardize_node_name(n.name)}"
-                for n in node_dependencies[node]
-            ]
-            if self.mlflow_enabled:
-                after_tasks.append(self._mlflow_root_task_name)
-            sql_statements.append(
-                self._generate_task_sql(
-                    self._standardize_node_name(node.name),
-                    after_tasks,
-                    self.pipeline_name,
-                    [node.name],
-                    self.extra_params,
+            add(self._generate_mlflow_drop_task_sql())
+
+        grouping = self._group_nodes(pipeline)
+        graphs = self._partition_task_graphs(grouping)
+        for index, graph in enumerate(graphs):
+            root_task_name = self._graph_root_task_name(index)
+            if index > 0:
+                add(
+                    self._generate_continuation_root_task_sql(root_task_name),
+                    root_task_name,
+                )
+                add(
+                    self._generate_root_task_suspend_sql(root_task_name),
+                    root_task_name,
+                    [root_task_name],
                 )
-            )
 
-        return sql_statements
+            for task in graph.ordered_task_names():
+                task_name = self._standardize_node_name(task)
+                dependencies = [
+                    self._standardize_node_name(dependency)
+                    for dependency in sorted(graph.dependencies[task])
+                ]
+                if task in graph.barriers:
+                    add(
+                        self._generate_barrier_task_sql(task_name, dependencies),
+                        task_name,
+                        dependencies,
+                    )
+                    continue
 
-    def _generate_task_execute_sql(self):
-        return [
+                # tasks reading the run id from a relay already depend on it
+                if task in graph.run_id_sources:
+                    run_id_task_name = self._standardize_node_name(
+                        graph.run_id_sources[task]
+                    )
+                    after_tasks = dependencies
+                elif self.mlflow_enabled:
+                    run_id_task_name = self._mlflow_root_task_name
+                    after_tasks = [root_task_name] + dependencies + [run_id_task_name]
+                else:
+                    run_id_task_name = root_task_name
+                    after_tasks = [root_task_name] + dependencies
+
+                if task in graph.relays:
+                    add(
+                        self._generate_relay_task_sql(
+                            task_name, after_tasks, run_id_task_name
+                        ),
+                        task_name,
+                        after_tasks,
+                    )
+                elif task == graph.link:
+                    add(
+                        self._generate_link_task_sql(
+                            task_name,
+                            after_tasks,
+                            run_id_task_name,
+                            self._graph_root_task_name(index + 1),
+                        ),
+                        task_name,
+                        after_tasks,
+                    )
+                else:
+                    add(
+                        self._generate_task_sql(
+                            task_name,
+                            after_tasks,
+                            self.pipeline_name,
+                            [n.name for n in grouping.groups[task]],
+                            self.extra_params,
+                            root_task_name=root_task_name,
+                            compute=self._compute_clause(task, grouping.groups[task]),
+                            run_id_task_name=run_id_task_name,
+                        ),
+                        task_name,
+                        after_tasks,
+                    )
+
+        return [waves[level] for level in sorted(waves)]
+
+    def _task_definition_marker(self, digest: str) -> str:
+        return f"kedro-snowflake:{self._get_pipeline_name_for_snowflake()}:{digest}"
+
+    def _mark_task_definition(self, sql: str, digest: str) -> str:
+        """Adds a comment with the hash of the definition to the task,
+        for the incremental deploy to find out whether the task changed"""
+        create, definition = sql.split("\n", 1)
+        return (
+            f"{create}\ncomment = '{self._task_definition_marker(digest[:16])}'\n"
+            f"{definition}"
+        )
+
+    def _group_nodes(self, pipeline: Pipeline) -> Grouping:
+        grouping = self.grouper.group(pipeline)
+        # dependencies implied by the other ones only add to the DDL and scheduling work
+        return Grouping(grouping.groups, transitive_reduction(grouping.dependencies))
+
+    def _historical_task_durations(self, task_names: List[str]) -> Dict[str, float]:
+        """Average duration (in seconds) of the successful runs of the tasks,
+        from the task history of the last 7 days"""
+        names = ",".join(f"'{n.upper()}'" for n in task_names)
+        try:
+            rows = self.snowflake_session.sql(
+                f"""
+select name, avg(datediff('millisecond', query_start_time, completed_time)) / 1000
+from table(information_schema.task_history(
+    scheduled_time_range_start => dateadd('day', -7, current_timestamp()),
+    result_limit => 10000
+))
+where state = 'SUCCEEDED' and name in ({names})
+group by name;""".strip()
+            ).collect()
+        except Exception:  # noqa
+            logger.warning("Could not read task history", exc_info=True)
+            return {}
+        return {row[0]: float(row[1]) for row in rows if row[1] is not None}
+
+    def _critical_path(self, grouping: Grouping) -> List[str]:
+        task_names = {
+            self._standardize_node_name(group).upper(): group
+            for group in grouping.groups
+        }
+        durations = {
+            task_names[name]: duration
+            for name, duration in self._historical_task_durations(
+                list(task_names)
+            ).items()
+            if name in task_names
+        }
+        path, total = critical_path(
+            grouping.dependencies,
+            durations,
+            default_duration=(
+                sum(durations.values()) / len(durations) if durations else 1.0
+            ),
+        )
+        logger.info(
+            f"Critical path of {self.pipeline_name} ({len(path)} tasks, "
+            + (
+                f"approx. {total:.1f}s based on task history of "
+                f"{len(durations)}/{len(task_names)} tasks"
+                if durations
+                else "no task history available"
+            )
+            + f"): {' -> '.join(path)}"
+        )
+        return path
+
+    def _compute_clause(
+        self, task: Optional[str] = None, nodes: Sequence[Node] = ()
+    ) -> str:
+        """Warehouse (or serverless compute) of the task running the nodes"""
+        warehouse = self._task_warehouse(task, nodes)
+        serverless = self.config.snowflake.runtime.serverless
+        if warehouse is None and serverless.is_enabled_for(self.pipeline_name):
+            return (
+                "user_task_managed_initial_warehouse_size = "
+                f"'{self._serverless_task_size(task, nodes)}'"
+            )
+        return f"warehouse = '{warehouse or self.connection_parameters['warehouse']}'"
+
+    def _serverless_task_size(self, task: Optional[str], nodes: Sequence[Node]) -> str:
+        """The largest initial warehouse size mapped to the tags of the nodes,
+        pipeline's size if there is no mapping"""
+        serverless = self.config.snowflake.runtime.serverless
+        sizes = {
+            serverless.tags[t].upper()
+            for node in nodes
+            for t in node.tags
+            if t in serverless.tags
+        }
+        if not sizes:
+            sizes = {
+                serverless.pipelines.get(
+                    self.pipeline_name, serverless.initial_warehouse_size
+                ).upper()
+            }
+        unknown = sizes - set(SERVERLESS_WAREHOUSE_SIZES)
+        if unknown:
+            raise ValueError(
+                f"Unknown serverless warehouse size of {task or self._root_task_name} task: "
+                f"{', '.join(sorted(unknown))}, "
+                f"expected one of: {', '.join(SERVERLESS_WAREHOUSE_SIZES)}"
+            )
+        return max(sizes, key=SERVERLESS_WAREHOUSE_SIZES.index)
+
+    def _task_warehouse(
+        self, task: Optional[str], nodes: Sequence[Node]
+    ) -> Optional[str]:
+        """Warehouse mapped to the nodes by their names or tags"""
+        mapping = self.config.snowflake.runtime.warehouses
+        nodes_by_warehouse = defaultdict(list)
+        for node in nodes:
+            if node.name in mapping.nodes:
+                node_warehouses = {mapping.nodes[node.name]}
+            else:
+                node_warehouses = {
+                    mapping.tags[t] for t in node.tags if t in mapping.tags
+                }
+            for warehouse in node_warehouses:
+                nodes_by_warehouse[warehouse].append(node.name)
+
+        if len(nodes_by_warehouse) > 1:
+            raise ValueError(
+                f"Nodes executed by task {task} are mapped to different warehouses: "
+                + ", ".join(
+                    f"{warehouse} ({', '.join(node_names)})"
+                    for warehouse, node_names in sorted(nodes_by_warehouse.items())
+                )
+            )
+        return next(iter(nodes_by_warehouse), None)
+
+    def _partition_task_graphs(self, grouping: Grouping) -> List[TaskGraph]:
+        graphs = TaskGraphPartitioner(
+            self.config.snowflake.runtime.task_graph_limits,
+            extra_root_children=1 if self.mlflow_enabled else 0,
+        ).partition(grouping)
+        if len(graphs) > 1 and self.mlflow_enabled:
+            raise ValueError(
+                f"Pipeline {self.pipeline_name} exceeds Snowflake task graph limits "
+                f"and has to be split into {len(graphs)} task graphs, "
+                "which is not supported with MLflow tracking enabled"
+            )
+        return graphs
+
+    def _graph_root_task_name(self, index: int) -> str:
+        if index == 0:
+            return self._root_task_name
+        return f"{self._root_task_name}_{index}"
+
+    def _generate_task_execute_sql(self, graphs_count: int = 1):
+        # Graphs following the first one are started by link tasks, not by their schedule
+        continuation_sql = []
+        for index in range(1, graphs_count):
+            root_task_name = self._graph_root_task_name(index)
+            continuation_sql += [
+                f"call SYSTEM$TASK_DEPENDENTS_ENABLE( '{root_task_name}' );",
+                f"alter task {root_task_name} suspend;",
+            ]
+        return continuation_sql + [
             f"call SYSTEM$TASK_DEPENDENTS_ENABLE( '{self._root_task_name}' );",
             f"alter task {self._root_task_name} resume;",
             f"execute task {self._root_task_name};",
@@ -206,6 +571,14 @@ call {root_sproc}();
     def _mlflow_root_sproc_name(self):
         return f"kedro_{self._get_pipeline_name_for_snowflake()}_start_mlflow".upper()
 
+    @property
+    def _link_sproc_name(self):
+        return f"kedro_{self._get_pipeline_name_for_snowflake()}_link".upper()
+
+    @property
+    def _continue_sproc_name(self):
+        return f"kedro_{self._get_pipeline_name_for_snowflake()}_continue".upper()
+
     def generate(self) -> KedroSnowflakePipeline:
         """Generate a SnowflakePipeline object from a Kedro pipeline.
         It can be used to run the pipeline or just to get the SQL statements.
@@ -216,13 +589,41 @@ call {root_sproc}();
         pipeline = self.get_kedro_pipeline()
 
         logger.info(f"Translating {self.pipeline_name} to Snowflake Pipeline")
+        for sql in self._stages_sql():
+            self.snowflake_session.sql(sql).collect()
+        return self._deploy(pipeline)
+
+    async def generate_async(self) -> KedroSnowflakePipeline:
+        """Same as `generate`, but the stages are (re-)created with asynchronous queries
+        (`collect_nowait`). Packaging, uploading the artifacts and registering the stored
+        procedures have no asynchronous API in Snowpark, so they run in the default executor
+        of the event loop. Concurrent deployments to the same stage package their artifacts
+        in parallel, but update the stage manifest and the stored procedures one at a time"""
+        pipeline = self.get_kedro_pipeline()
+
+        logger.info(f"Translating {self.pipeline_name} to Snowflake Pipeline")
+        for sql in self._stages_sql():
+            await collect_async(self.snowflake_session.sql(sql))
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self._deploy, pipeline
+        )
+
+    def _stages_sql(self) -> List[str]:
+        # the temporary data stage is always clean
+        stage = self.config.snowflake.runtime.stage.lstrip("@")
+        temp_data_stage = self.config.snowflake.runtime.temporary_stage.lstrip("@")
+        return [
+            f"create stage if not exists {stage};",
+            f"drop stage if exists {temp_data_stage};",
+            f"create stage {temp_data_stage};",
+        ]
 
+    def _deploy(self, pipeline: Pipeline) -> KedroSnowflakePipeline:
+        """Uploads the artifacts and creates the stored procedures of the pipeline"""
         snowflake_stage_name = self.config.snowflake.runtime.stage
         snowflake_temp_data_stage = self.config.snowflake.runtime.temporary_stage
         session = self.snowflake_session
-        self._drop_and_recreate_stages(snowflake_stage_name, snowflake_temp_data_stage)
 
-        # TODO - groups -> nodes operating on sp.DataFrames could be merged (or use Kedro tags)
         with tempfile.TemporaryDirectory() as tmp_dir_str:
             tmp_dir = Path(tmp_dir_str)
             dependencies_dir = tmp_dir / "dependencies"
@@ -237,58 +638,227 @@ call {root_sproc}();
             # Package this project
             self._package_kedro_project(project_files_dir)
 
-            # Stage the packages - upload to Snowflake
-            logger.info("Uploading dependencies to Snowflake")
-            session.file.put(
-                str(dependencies_dir / "*"),
-                snowflake_stage_name,
-                overwrite=True,
-                auto_compress=False,
-                parallel=8,
+            # Stage the packages - upload only the ones that changed since last deploy
+            logger.info("Uploading dependencies, special dependencies & project files")
+            artifacts = {f.name: f for f in dependencies_dir.glob("*") if f.is_file()}
+            artifacts.update(
+                {
+                    f"project/{f.name}": f
+                    for f in project_files_dir.glob("*")
+                    if f.is_file()
+                }
             )
+            grouping = self._group_nodes(pipeline)
+            graphs = self._partition_task_graphs(grouping)
+            if len(graphs) > 1:
+                logger.info(
+                    f"Pipeline exceeds Snowflake task graph limits, "
+                    f"splitting it into {len(graphs)} chained task graphs"
+                )
 
-            # Stage Kedro and this project
-            logger.info("Uploading project files & special dependencies to Snowflake")
-            session.file.put(
-                str(project_files_dir / "*"),
-                f"{snowflake_stage_name}/project",
-                overwrite=True,
-                auto_compress=False,
-                parallel=8,
-            )
+            # read-modify-write of the stage manifest and re-creation of the shared
+            # procedures (RUN_KEDRO) - one deployment to the stage at a time
+            with _stage_lock(snowflake_stage_name):
+                stage_manifest = self._read_stage_manifest(snowflake_stage_name)
+                manifest = self._upload_artifacts(
+                    snowflake_stage_name, artifacts, stage_manifest
+                )
+                self._deploy_procedures(
+                    snowflake_stage_name,
+                    self._updated_stage_manifest(stage_manifest, manifest)[0],
+                    manifest,
+                    self._procedures_to_deploy(
+                        snowflake_stage_name,
+                        snowflake_temp_data_stage,
+                        self._generate_imports_for_sproc(
+                            dependencies_dir, snowflake_stage_name
+                        ),
+                        manifest,
+                        len(graphs),
+                    ),
+                )
 
-            logger.info("Creating Kedro Snowflake root sproc")
-            root_sproc = self._construct_kedro_snowflake_root_sproc(  # noqa: F841
-                snowflake_stage_name
+            submission_waves = self._generate_snowflake_tasks_waves(pipeline)
+            pipeline_tasks_sql = [sql for wave in submission_waves for sql in wave]
+            if self.config.snowflake.runtime.incremental_deploy:
+                submission_waves = self._incremental_submission_waves(submission_waves)
+            return KedroSnowflakePipeline(
+                session,
+                pipeline_tasks_sql,
+                self._generate_task_execute_sql(len(graphs)),
+                self._root_task_name,
+                [
+                    self._standardize_node_name(task)
+                    for graph in graphs
+                    for task in graph.ordered_task_names()
+                ],
+                [self._graph_root_task_name(i) for i in range(1, len(graphs))],
+                self._critical_path(grouping),
+                submission_waves,
             )
 
-            if self.mlflow_enabled:
-                mlflow_root_sproc = (  # noqa: F841
-                    self._construct_kedro_snowflake_mlflow_root_sproc(
-                        snowflake_stage_name
-                    )
-                )
+    def generate_tasks_sql(self) -> List[str]:
+        """SQL statements creating the tasks of the pipeline, without deploying anything
+        (artifacts, stored procedures) to Snowflake"""
+        return self._generate_snowflake_tasks_sql(self.get_kedro_pipeline())
 
-            logger.info("Creating Kedro Snowflake Sproc")
-            snowflake_sproc = self._construct_kedro_snowflake_sproc(
-                imports=self._generate_imports_for_sproc(
-                    dependencies_dir, snowflake_stage_name
+    def _procedures_to_deploy(
+        self,
+        stage: str,
+        temp_data_stage: str,
+        imports: List[str],
+        artifacts_manifest: Dict[str, str],
+        graphs_count: int,
+    ) -> Dict[str, Tuple[Callable[[], Any], Dict[str, Any]]]:
+        """Stored procedures of the pipeline - name -> (function creating the procedure,
+        inputs of the procedure apart from the stage and the artifacts it's created from)"""
+        incremental = self.config.snowflake.runtime.incremental_deploy
+        # In the incremental mode, RUN_KEDRO looks up hashes of the project archives when it's
+        # called, so that it doesn't have to be re-created after every change of the project
+        project_archives = (
+            None
+            if incremental
+            else {
+                PurePosixPath(path).name: digest
+                for path, digest in artifacts_manifest.items()
+                if path.startswith("project/")
+            }
+        )
+        packages = self.config.snowflake.runtime.dependencies.packages
+        procedures = {
+            self._root_sproc_name: (
+                lambda: self._construct_kedro_snowflake_root_sproc(stage),
+                {},
+            ),
+            self.SPROC_NAME: (
+                lambda: self._construct_kedro_snowflake_sproc(
+                    imports=imports,
+                    packages=packages,
+                    stage_location=stage,
+                    temp_data_stage=temp_data_stage,
+                    project_archives=project_archives,
                 ),
-                packages=self.config.snowflake.runtime.dependencies.packages,
-                stage_location=snowflake_stage_name,
-                temp_data_stage=snowflake_temp_data_stage,
+                {
+                    "imports": imports,
+                    "packages": packages,
+                    "temp_data_stage": temp_data_stage,
+                    "project_name": Path.cwd().name,
+                    "project_archives": project_archives,
+                    "mlflow_task_name": self._mlflow_root_task_name,
+                    "mlflow_enabled": self.mlflow_enabled,
+                    "run_stats": self.config.snowflake.runtime.run_stats.dict(),
+                    "intermediate_data": self.config.snowflake.runtime.intermediate_data.dict(),
+                },
+            ),
+        }
+        if self.mlflow_enabled:
+            procedures[self._mlflow_root_sproc_name] = (
+                lambda: self._construct_kedro_snowflake_mlflow_root_sproc(stage),
+                {"mlflow": self.config.snowflake.mlflow.dict()},
             )
+        if graphs_count > 1:
+            procedures[self._link_sproc_name] = (
+                lambda: self._construct_kedro_snowflake_link_sproc(
+                    stage, temp_data_stage
+                ),
+                {"temp_data_stage": temp_data_stage},
+            )
+            procedures[self._continue_sproc_name] = (
+                lambda: self._construct_kedro_snowflake_continue_sproc(
+                    stage, temp_data_stage
+                ),
+                {"temp_data_stage": temp_data_stage},
+            )
+        return procedures
 
-            logger.debug(snowflake_sproc)
-            pipeline_sql_statements = self._generate_snowflake_tasks_sql(pipeline)
-            return KedroSnowflakePipeline(
-                session,
-                pipeline_sql_statements,
-                self._generate_task_execute_sql(),
-                self._root_task_name,
-                [self._standardize_node_name(n.name) for n in pipeline.nodes],
+    def _deploy_procedures(
+        self,
+        stage: str,
+        stage_manifest: Dict[str, Dict[str, Any]],
+        artifacts_manifest: Dict[str, str],
+        procedures: Dict[str, Tuple[Callable[[], Any], Dict[str, Any]]],
+    ):
+        """Creates the stored procedures, in the incremental mode only the ones whose inputs
+        changed since they were deployed (according to the stage manifest)"""
+        deployed = stage_manifest.get("procedures", {})
+        existing = (
+            {
+                row["name"].upper()
+                for row in self.snowflake_session.sql(
+                    "show procedures in schema"
+                ).collect()
+            }
+            if self.config.snowflake.runtime.incremental_deploy
+            else set()
+        )
+        # Code of the procedures comes from kedro_snowflake, which is one of the artifacts
+        base_inputs = {
+            "stage": stage,
+            "artifacts": {
+                path: digest
+                for path, digest in artifacts_manifest.items()
+                if path != self._project_archive_path
+            },
+        }
+        digests = {}
+        for name, (construct, inputs) in procedures.items():
+            digests[name] = hashlib.sha256(
+                json.dumps({**base_inputs, **inputs}, sort_keys=True).encode()
+            ).hexdigest()
+            if name.upper() in existing and deployed.get(name) == digests[name]:
+                logger.info(f"Stored procedure {name} is up to date, skipping")
+                continue
+            logger.info(f"Creating stored procedure {name}")
+            construct()
+
+        if any(deployed.get(name) != digest for name, digest in digests.items()):
+            self._write_stage_manifest(
+                stage, {**stage_manifest, "procedures": {**deployed, **digests}}
             )
 
+    def _deployed_task_definitions(self) -> Dict[str, str]:
+        """Task name -> definition marker (see _mark_task_definition),
+        of the currently deployed tasks of this pipeline"""
+        marker_prefix = self._task_definition_marker("")
+        return {
+            row["name"].upper(): row["comment"]
+            for row in self.snowflake_session.sql(
+                f"show tasks like 'KEDRO_{self._get_pipeline_name_for_snowflake()}_%' in schema"
+            ).collect()
+            if (row["comment"] or "").startswith(marker_prefix)
+        }
+
+    def _incremental_submission_waves(self, waves: List[List[str]]) -> List[List[str]]:
+        """Skips the statements re-creating unchanged tasks and drops the deployed tasks
+        of this pipeline, which are no longer part of it"""
+        deployed = self._deployed_task_definitions()
+        defined = set()
+        skipped = 0
+        incremental_waves = []
+        for wave in waves:
+            statements = []
+            for sql in wave:
+                if match := self.TASK_DEFINITION_PATTERN.match(sql):
+                    task_name, marker = match.group(1).upper(), match.group(2)
+                    defined.add(task_name)
+                    if deployed.get(task_name) == marker:
+                        skipped += 1
+                        continue
+                statements.append(sql)
+            if statements:
+                incremental_waves.append(statements)
+
+        removed = sorted(set(deployed) - defined)
+        if removed:
+            incremental_waves.append(
+                [f"drop task if exists {task_name};" for task_name in removed]
+            )
+        logger.info(
+            f"Incremental deploy: {skipped} tasks up to date, "
+            f"{len(defined) - skipped} to create, {len(removed)} to drop"
+        )
+        return incremental_waves
+
     def _generate_imports_for_sproc(self, dependencies_dir, snowflake_stage_name):
         imports_for_sproc = [
             f"{snowflake_stage_name}/{f.name}"
@@ -297,41 +867,196 @@ call {root_sproc}();
         ]
         return imports_for_sproc
 
+    @property
+    def _project_archive_path(self) -> str:
+        return f"project/{self.pipeline_name}.tar.zst"
+
     def _package_kedro_project(self, project_files_dir):
-        # TODO - handle ignoring some files (data etc)
-        project_package_name = f"{self.pipeline_name}.tar.zst"
-        zstd_folder(
+        project_package_name = PurePosixPath(self._project_archive_path).name
+        packaging = self.config.snowflake.runtime.packaging
+        files_filter = ProjectFilesFilter(
+            Path.cwd(),
+            include=packaging.project_include,
+            exclude=packaging.project_exclude,
+            respect_gitignore=packaging.respect_gitignore,
+        )
+        archive = zstd_folder(
             Path.cwd(),
             project_files_dir,
             file_name=project_package_name,
-            exclude=[".pyc", "__pycache__"],
+            level=packaging.compression_level,
+            threads=packaging.compression_threads,
+            include_fn=files_filter,
+            deterministic=packaging.deterministic,
+        )
+        logger.info(
+            f"Packaged project into {project_package_name}:{os.linesep}"
+            + files_filter.size_report(archive.stat().st_size)
         )
 
     def _package_dependencies(self, dependencies_dir, project_files_dir):
         # Package dependencies that work with Snowpark's import
+        packaging = self.config.snowflake.runtime.packaging
+        special_packages = self.config.snowflake.runtime.dependencies.imports
+        zip_importable = (
+            [sp for sp in special_packages if is_zip_importable(get_module_path(sp))]
+            if packaging.zipimport
+            else []
+        )
+        if zip_importable:
+            logger.info(f"Packaging {', '.join(zip_importable)} for zipimport")
         zip_dependencies(
             [
                 "toposort",
-            ],
+            ]
+            + zip_importable,
             dependencies_dir,
+            deterministic=packaging.deterministic,
+            compile_bytecode=packaging.compile_bytecode,
         )
         # Special packages that need to be extracted into PYTHONPATH at runtime (imports don't work)
-        special_packages = self.config.snowflake.runtime.dependencies.imports
-        for sp in special_packages:
-            zstd_folder(
-                get_module_path(sp),
-                project_files_dir,
-                file_name=f"{sp}.tar.zst",
-                exclude=[".pyc", "__pycache__"],
+        extracted = [sp for sp in special_packages if sp not in zip_importable]
+        workers, threads = self._packaging_parallelism(packaging, len(extracted))
+        # spawn - forking a process with running threads (e.g. of the Snowflake connector) may deadlock
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=get_context("spawn")
+        ) as executor:
+            futures = [
+                executor.submit(
+                    zstd_folder,
+                    get_module_path(sp),
+                    project_files_dir,
+                    file_name=f"{sp}.tar.zst",
+                    level=packaging.compression_level,
+                    exclude=[".pyc", "__pycache__"],
+                    threads=threads,
+                    deterministic=packaging.deterministic,
+                )
+                for sp in extracted
+            ]
+            for future in futures:
+                future.result()
+
+    @staticmethod
+    def _packaging_parallelism(
+        packaging: PackagingConfig, archives_count: int
+    ) -> Tuple[int, int]:
+        """Number of the packaging processes and of the zstd threads of each of them.
+        With the default compression_threads (-1), the CPU cores are split among the
+        processes instead of each of them starting a thread per core"""
+        cpu_count = os.cpu_count() or 1
+        workers = max(1, min(packaging.max_workers or cpu_count, archives_count))
+        threads = packaging.compression_threads
+        if threads < 0 and workers > 1:
+            threads = max(1, cpu_count // workers)
+        return workers, threads
+
+    def _read_stage_manifest(self, stage: str) -> Dict[str, Dict[str, Any]]:
+        """Returns the stage manifest - artifacts (stage-relative path -> sha256 of the content),
+        limited to the ones still present on the stage, artifacts of the pipelines deployed to
+        the stage (pipeline name -> paths) and stored procedures (name -> hash of their inputs)
+        deployed along with them.
+        """
+        present = {
+            row[0].split("/", 1)[-1]
+            for row in self.snowflake_session.sql(f"LS {stage}").collect()
+        }
+        if self.ARTIFACTS_MANIFEST_NAME not in present:
+            return {}
+
+        try:
+            manifest = json.load(
+                self.snowflake_session.file.get_stream(
+                    f"{stage}/{self.ARTIFACTS_MANIFEST_NAME}"
+                )
+            )
+        except Exception:  # noqa
+            logger.warning(
+                "Could not read artifacts manifest, all artifacts will be uploaded",
+                exc_info=True,
+            )
+            return {}
+        return {
+            "artifacts": {
+                path: digest
+                for path, digest in manifest.get("artifacts", {}).items()
+                if path in present
+            },
+            "pipelines": manifest.get("pipelines", {}),
+            "procedures": manifest.get("procedures", {}),
+        }
+
+    def _updated_stage_manifest(
+        self, stage_manifest: Dict[str, Dict[str, Any]], manifest: Dict[str, str]
+    ) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """Stage manifest with the artifacts of this pipeline replaced by the `manifest` ones
+        and the paths of the artifacts that are no longer used - only the ones deployed
+        previously by this pipeline and not used by the other pipelines on the stage"""
+        pipelines = dict(stage_manifest.get("pipelines", {}))
+        previous = set(pipelines.pop(self.pipeline_name, []))
+        used = set(manifest).union(*pipelines.values())
+        stale = sorted(previous - used)
+        pipelines[self.pipeline_name] = sorted(manifest)
+        artifacts = {
+            path: digest
+            for path, digest in stage_manifest.get("artifacts", {}).items()
+            if path not in stale
+        }
+        return {
+            **stage_manifest,
+            "artifacts": {**artifacts, **manifest},
+            "pipelines": pipelines,
+        }, stale
+
+    def _write_stage_manifest(self, stage: str, manifest: Dict[str, Dict[str, Any]]):
+        with BytesIO(json.dumps(manifest, indent=2, sort_keys=True).encode()) as buffer:
+            setattr(buffer, "name", self.ARTIFACTS_MANIFEST_NAME)
+            self.snowflake_session.file.put_stream(
+                buffer,
+                f"{stage}/{self.ARTIFACTS_MANIFEST_NAME}",
+                auto_compress=False,
+                overwrite=True,
             )
 
-    def _drop_and_recreate_stages(self, *stages):
-        # Enforce clean stage
-        for s in stages:
-            self.snowflake_session.sql(
-                f"drop stage if exists {s.lstrip('@')};"
-            ).collect()
-            self.snowflake_session.sql(f"create stage {s.lstrip('@')};").collect()
+    def _upload_artifacts(
+        self,
+        stage: str,
+        artifacts: Dict[str, Path],
+        stage_manifest: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> Dict[str, str]:
+        """Uploads the artifacts (stage-relative path -> local file) whose content hash
+        differs from the one in the stage manifest, removes the ones that this pipeline
+        no longer deploys (unless other pipelines on the stage use them) and stores
+        the updated manifest on the stage.
+        """
+        session = self.snowflake_session
+        if stage_manifest is None:
+            stage_manifest = self._read_stage_manifest(stage)
+        uploaded = stage_manifest.get("artifacts", {})
+        manifest = {path: hash_file(file) for path, file in artifacts.items()}
+
+        for path, file in artifacts.items():
+            if uploaded.get(path) == manifest[path]:
+                logger.info(f"{path} is up to date, skipping upload")
+                continue
+            logger.info(f"Uploading {path} to Snowflake")
+            target_dir = PurePosixPath(path).parent
+            session.file.put(
+                str(file),
+                stage if target_dir == PurePosixPath(".") else f"{stage}/{target_dir}",
+                overwrite=True,
+                auto_compress=False,
+                parallel=8,
+            )
+
+        updated_manifest, stale = self._updated_stage_manifest(stage_manifest, manifest)
+        for path in stale:
+            if path in uploaded:
+                logger.info(f"Removing stale {path} from Snowflake")
+                session.sql(f"remove {stage}/{path}").collect()
+
+        self._write_stage_manifest(stage, updated_manifest)
+        return manifest
 
     @cached_property
     def snowflake_session(self):
@@ -393,19 +1118,91 @@ call {root_sproc}();
             session=self.snowflake_session,
         )
 
+    def _run_id_handoff_location(self, temp_data_stage: str) -> str:
+        # Run id is handed over between chained task graphs through the temporary stage,
+        # as the root task of the next graph cannot read return values of the previous one
+        return f"{temp_data_stage}/{self.RUN_ID_HANDOFF_DIR}"
+
+    def _construct_kedro_snowflake_link_sproc(
+        self, stage_location: str, temp_data_stage: str
+    ):
+        handoff_location = self._run_id_handoff_location(temp_data_stage)
+
+        def kedro_link_run(
+            session: Session, run_id: str, next_root_task_name: str
+        ) -> str:
+            from io import BytesIO
+
+            with BytesIO(run_id.encode()) as buffer:
+                setattr(buffer, "name", next_root_task_name)
+                session.file.put_stream(
+                    buffer,
+                    f"{handoff_location}/{next_root_task_name}",
+                    auto_compress=False,
+                    overwrite=True,
+                )
+            session.sql(f"execute task {next_root_task_name}").collect()
+            return run_id
+
+        return sproc(
+            func=kedro_link_run,
+            name=self._link_sproc_name,
+            is_permanent=True,
+            replace=True,
+            stage_location=stage_location,
+            packages=["snowflake-snowpark-python"],
+            execute_as="caller",
+            session=self.snowflake_session,
+        )
+
+    def _construct_kedro_snowflake_continue_sproc(
+        self, stage_location: str, temp_data_stage: str
+    ):
+        handoff_location = self._run_id_handoff_location(temp_data_stage)
+
+        def kedro_continue_run(session: Session, root_task_name: str) -> str:
+            run_id = (
+                session.file.get_stream(f"{handoff_location}/{root_task_name}")
+                .read()
+                .decode()
+                .strip()
+            )
+            session.sql(f"call system$set_return_value('{run_id}');").collect()
+            return run_id
+
+        return sproc(
+            func=kedro_continue_run,
+            name=self._continue_sproc_name,
+            is_permanent=True,
+            replace=True,
+            stage_location=stage_location,
+            packages=["snowflake-snowpark-python"],
+            execute_as="caller",
+            session=self.snowflake_session,
+        )
+
     def _construct_kedro_snowflake_sproc(
         self,
         imports: List[str],
         packages: List[str],
         stage_location: str,
         temp_data_stage: str,
+        project_archives: Optional[Dict[str, str]] = None,
     ):
         # create a Snowpark Stored Procedure from Kedro node (node arg)
         # and return it
+        # project_archives maps archive names in {stage_location}/project to their
+        # content hashes, which are used as keys of the extraction cache
 
         project_name = Path.cwd().name
-        mlflow_task_name = self._mlflow_root_task_name
         is_mlflow_enabled = self.mlflow_enabled
+        run_stats = self.config.snowflake.runtime.run_stats
+        run_stats_table = run_stats.table if run_stats.enabled else None
+        intermediate_data = self.config.snowflake.runtime.intermediate_data
+        out_of_band_buffers = intermediate_data.out_of_band_buffers
+        min_buffer_size = intermediate_data.min_buffer_size
+        extraction_cache_dir = self.EXTRACTION_CACHE_DIR
+        extraction_cache_grace_period = self.EXTRACTION_CACHE_GRACE_PERIOD
 
         def kedro_sproc_executor(
             session: Session,
@@ -416,10 +1213,15 @@ call {root_sproc}();
             extra_params_json: str,
         ) -> str:
             import json
+            import os
+            import shutil
             import sys
             import tarfile
+            import tempfile
+            import uuid
+            from concurrent.futures import ThreadPoolExecutor
             from pathlib import Path
-            from time import monotonic
+            from time import monotonic, time
 
             import zstandard as zstd
 
@@ -436,31 +1238,81 @@ call {root_sproc}();
             }
 
             if is_mlflow_enabled:
-                mlflow_config = session.sql(
-                    f"call system$get_predecessor_return_value('{mlflow_task_name}')"
-                ).collect()[0][0]
-                os.environ["SNOWFLAKE_MLFLOW_CONFIG"] = mlflow_config
+                # MLflow config is returned by the MLflow root task, passed as the run id
+                # (the task might read it from a relay task instead of the MLflow root)
+                os.environ["SNOWFLAKE_MLFLOW_CONFIG"] = run_id
 
-            def extract_tar_zstd(input_path, output_path):
-                with zstd.open(input_path, "rb") as archive:
+            def extract_tar_zstd(input_path_or_stream, output_path):
+                with zstd.open(input_path_or_stream, "rb") as archive:
                     tarfile.open(fileobj=archive, mode="r|").extractall(output_path)
 
-            # Extract project and special dependencies
+            # Extract project and special dependencies, unless they were already extracted
+            # on this node by one of the previous calls (cache is keyed by archive hashes)
             extract_start_ts = monotonic()
-            project_file_list = [
-                file[0]
+            archives = project_archives or {
+                # LS reports md5 of the staged file, good enough as a cache key
+                file[0].rsplit("/", 1)[-1]: file[2]
                 for file in session.sql(f"LS {stage_location}/project").collect()
+            }
+            # separate cache per stage, so that deployments of other pipelines don't
+            # evict each other's archives
+            cache_root = (
+                Path(extraction_cache_dir)
+                / uuid.uuid5(uuid.NAMESPACE_URL, stage_location).hex
+            )
+            cache_root.mkdir(parents=True, exist_ok=True)
+            staging_prefix = ".staging-"
+
+            def download_and_extract(archive_name, extracted_dir):
+                # extract into a staging directory, moved into place once complete, so that
+                # failed extractions never leave partial cache entries behind
+                staging_dir = Path(
+                    tempfile.mkdtemp(prefix=staging_prefix, dir=cache_root)
+                )
+                try:
+                    # stream the archive straight into the tar reader, no temporary files
+                    with session.file.get_stream(
+                        f"{stage_location}/project/{archive_name}"
+                    ) as stream:
+                        extract_tar_zstd(stream, staging_dir)
+                    try:
+                        os.replace(staging_dir, extracted_dir)
+                    except OSError:
+                        pass  # extracted concurrently by another call on this node
+                finally:
+                    shutil.rmtree(staging_dir, ignore_errors=True)
+
+            extracted_dirs = [cache_root / h for _, h in sorted(archives.items())]
+            cache_misses = [
+                (archive_name, cache_root / archive_hash)
+                for archive_name, archive_hash in sorted(archives.items())
+                if not (cache_root / archive_hash).is_dir()
             ]
-            for file in project_file_list:
-                session.file.get(f"@{file}", "/tmp")
-
-            for archive in Path("/tmp").glob("*.tar.zst"):
-                extract_tar_zstd(archive, "/tmp")
+            if cache_misses:
+                with ThreadPoolExecutor(max_workers=8) as executor:
+                    list(executor.map(lambda m: download_and_extract(*m), cache_misses))
+            # modification time of the directories marks their last use
+            for extracted_dir in extracted_dirs:
+                os.utime(extracted_dir)
+            # archives of the previous deployments to this stage, unless the calls still
+            # running them could have used them within the grace period
+            for stale_dir in cache_root.iterdir():
+                if (
+                    not stale_dir.name.startswith(staging_prefix)
+                    and stale_dir.name not in archives.values()
+                    and time() - stale_dir.stat().st_mtime
+                    > extraction_cache_grace_period
+                ):
+                    shutil.rmtree(stale_dir, ignore_errors=True)
 
             execution_data["extract_time"] = monotonic() - extract_start_ts
+            execution_data["extract_cache_hit"] = not cache_misses
+            execution_data["extract_cache_misses"] = [name for name, _ in cache_misses]
 
-            # Add kedro to python path
-            sys.path.insert(0, "/tmp/")
+            # Add kedro, special dependencies and the project to python path
+            for extracted_dir in extracted_dirs:
+                if str(extracted_dir) not in sys.path:
+                    sys.path.insert(0, str(extracted_dir))
 
             # Run Kedro project
             kedro_init_start_ts = monotonic()
@@ -473,11 +1325,20 @@ call {root_sproc}();
 
             k_session.session._describe_git = patch
 
-            project_root = Path("/tmp") / project_name
+            project_root = next(
+                (
+                    extracted_dir / project_name
+                    for extracted_dir in extracted_dirs
+                    if (extracted_dir / project_name).is_dir()
+                ),
+                Path("/tmp") / project_name,
+            )
             # return str(project_root)
             os.chdir(project_root)
             bootstrap_project(project_root)
 
+            from kedro.framework.project import pipelines
+
             from kedro_snowflake.runner import SnowflakeRunner
 
             execution_data["kedro_init_time"] = monotonic() - kedro_init_start_ts
@@ -490,13 +1351,37 @@ call {root_sproc}();
                     json.loads(extra_params_json) if extra_params_json else None
                 ),
             ) as kedro_session:
+                runner = SnowflakeRunner(
+                    session,
+                    temp_data_stage,
+                    run_id,
+                    full_pipeline=pipelines.get(pipeline_name or "__default__"),
+                    out_of_band_buffers=out_of_band_buffers,
+                    min_buffer_size=min_buffer_size,
+                )
                 kedro_session.run(
                     pipeline_name,
                     node_names=node_names if node_names else None,
-                    runner=SnowflakeRunner(session, temp_data_stage, run_id),
+                    runner=runner,
                 )
 
             execution_data["kedro_run_time"] = monotonic() - kedro_run_start_ts
+            execution_data["node_run_times"] = runner.node_run_times
+
+            if run_stats_table:
+                from kedro_snowflake.stats import save_run_stats
+
+                try:
+                    save_run_stats(
+                        session,
+                        run_stats_table,
+                        uuid.uuid4().hex,
+                        execution_data,
+                        runner.node_run_times,
+                    )
+                except Exception as e:  # noqa
+                    # statistics must not fail the pipeline
+                    execution_data["run_stats_error"] = str(e)
             return json.dumps(execution_data)
 
         node_sproc = sproc(
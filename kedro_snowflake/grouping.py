@@ -0,0 +1,140 @@
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+from kedro.pipeline import Pipeline
+from kedro.pipeline.node import Node
+from toposort import CircularDependencyError, toposort_flatten
+
+
+class GroupingError(ValueError):
+    pass
+
+
+@dataclass
+class Grouping:
+    # group name -> nodes of the group, in topological order
+    groups: Dict[str, List[Node]]
+    # group name -> names of the groups it depends on
+    dependencies: Dict[str, Set[str]]
+
+    def ordered_group_names(self) -> List[str]:
+        """Group names in topological order (dependencies first)"""
+        return toposort_flatten(self.dependencies, sort=True)
+
+
+class NodeGrouper(ABC):
+    """Decides which Kedro nodes are executed together, in a single Snowflake task"""
+
+    @abstractmethod
+    def group(self, pipeline: Pipeline) -> Grouping:
+        pass
+
+    @staticmethod
+    def _check_collisions(group_of: Dict[Node, str]) -> None:
+        """Ungrouped nodes form groups named after them, so the names of the other
+        groups can't be the same as names of the ungrouped nodes"""
+        groups = {group for node, group in group_of.items() if group != node.name}
+        if colliding := groups & {
+            node.name for node, group in group_of.items() if group == node.name
+        }:
+            raise GroupingError(
+                f"Group names collide with names of ungrouped nodes: {', '.join(sorted(colliding))}"
+            )
+
+    @staticmethod
+    def _build_grouping(pipeline: Pipeline, group_of: Dict[Node, str]) -> Grouping:
+        groups = defaultdict(list)
+        for node in pipeline.nodes:
+            groups[group_of[node]].append(node)
+
+        dependencies = {group: set() for group in groups}
+        for node, parents in pipeline.node_dependencies.items():
+            for parent in parents:
+                if group_of[parent] != group_of[node]:
+                    dependencies[group_of[node]].add(group_of[parent])
+
+        grouping = Grouping(dict(groups), dependencies)
+        try:
+            grouping.ordered_group_names()
+        except CircularDependencyError as e:
+            raise GroupingError(
+                "Grouping of the nodes introduced a cycle between the groups: "
+                f"{', '.join(sorted(e.data))}. Make sure that no node outside of a group "
+                "depends on a node from the group while being a dependency of another "
+                "node from the same group."
+            ) from e
+        return grouping
+
+
+class IdentityNodeGrouper(NodeGrouper):
+    """Every node is executed in a separate task"""
+
+    def group(self, pipeline: Pipeline) -> Grouping:
+        return self._build_grouping(pipeline, {n: n.name for n in pipeline.nodes})
+
+
+class TagNodeGrouper(NodeGrouper):
+    """Nodes tagged with `<tag_prefix><group name>` are executed in a single task,
+    untagged nodes are executed in separate tasks"""
+
+    def __init__(self, tag_prefix: str = "snowflake.group."):
+        self.tag_prefix = tag_prefix
+
+    def group(self, pipeline: Pipeline) -> Grouping:
+        group_of = {}
+        for node in pipeline.nodes:
+            group_tags = [t for t in node.tags if t.startswith(self.tag_prefix)]
+            if len(group_tags) > 1:
+                raise GroupingError(
+                    f"Node {node.name} has multiple grouping tags: {', '.join(group_tags)}"
+                )
+            group_of[node] = (
+                group_tags[0][len(self.tag_prefix) :] if group_tags else node.name
+            )
+        self._check_collisions(group_of)
+        return self._build_grouping(pipeline, group_of)
+
+
+class NamespaceNodeGrouper(NodeGrouper):
+    """Nodes of the same modular pipeline (namespace) are executed in a single task.
+    With `level` set, only the first `level` parts of the namespace are taken into account,
+    e.g. level=1 groups `data_processing.companies` and `data_processing.reviews` together.
+    Nodes without namespace are executed in separate tasks"""
+
+    def __init__(self, level: Optional[int] = None):
+        self.level = level
+
+    def group(self, pipeline: Pipeline) -> Grouping:
+        group_of = {}
+        for node in pipeline.nodes:
+            if node.namespace:
+                group_of[node] = ".".join(node.namespace.split(".")[: self.level])
+            else:
+                group_of[node] = node.name
+        self._check_collisions(group_of)
+        return self._build_grouping(pipeline, group_of)
+
+
+class LinearChainNodeGrouper(NodeGrouper):
+    """Linear chains of nodes (each node being the only child of its parent and having
+    just that one parent) are executed in a single task, named after the first node of the chain.
+    This never decreases the parallelism of the pipeline."""
+
+    def group(self, pipeline: Pipeline) -> Grouping:
+        parents = pipeline.node_dependencies
+        children = defaultdict(set)
+        for node, node_parents in parents.items():
+            for parent in node_parents:
+                children[parent].add(node)
+
+        group_of = {}
+        for node in pipeline.nodes:  # topological order - parents are assigned first
+            node_parents = parents[node]
+            parent = next(iter(node_parents)) if len(node_parents) == 1 else None
+            if parent is not None and len(children[parent]) == 1:
+                group_of[node] = group_of[parent]
+            else:
+                group_of[node] = node.name
+        return self._build_grouping(pipeline, group_of)
@@ -0,0 +1,8 @@
+from kedro_snowflake.local.executor import (
+    KedroNodesRunner,
+    LocalTaskExecutor,
+    parse_task_plan,
+)
+from kedro_snowflake.local.session import LocalSession
+
+__all__ = ["KedroNodesRunner", "LocalSession", "LocalTaskExecutor", "parse_task_plan"]
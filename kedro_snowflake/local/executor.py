@@ -0,0 +1,261 @@
+import re
+import threading
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+
+from kedro.io import DataCatalog
+from kedro.pipeline import Pipeline
+from tabulate import tabulate
+
+from kedro_snowflake.dag import critical_path
+from kedro_snowflake.datasets.internal import SnowflakeStagePickleDataSet
+from kedro_snowflake.runner import SnowflakeRunner
+
+TASK_STATEMENT = re.compile(
+    r"create or replace task (\S+)\n(.*?)\nas\n(.*?);?\s*$", re.DOTALL
+)
+NODES_TO_RUN = re.compile(r"ARRAY_CONSTRUCT\(([^)]*)\)")
+NEXT_ROOT_TASK = re.compile(
+    r"system\$get_predecessor_return_value\('[^']*'\),\s*'([^']*)'\)$"
+)
+
+
+@dataclass
+class PlannedTask:
+    name: str
+    after: List[str] = field(default_factory=list)
+    # Kedro nodes executed by the task, empty for the root, barrier and link tasks
+    node_names: List[str] = field(default_factory=list)
+
+
+def parse_task_plan(statements: Sequence[str]) -> Dict[str, PlannedTask]:
+    """Tasks created by the generated SQL statements (see `KedroSnowflakePipeline`),
+    by their upper-cased names. Root tasks of the chained graphs are made dependent
+    on the link tasks executing them."""
+    tasks = {}
+    next_roots = {}
+    for sql in statements:
+        if not (match := TASK_STATEMENT.match(sql.strip())):
+            continue
+        name, header, body = match.groups()
+        task = PlannedTask(name.upper())
+        for line in header.splitlines():
+            if line.startswith("after "):
+                task.after = [t.strip().upper() for t in line[6:].split(",")]
+        if nodes := NODES_TO_RUN.search(body):
+            task.node_names = re.findall(r"'([^']*)'", nodes.group(1))
+        elif next_root := NEXT_ROOT_TASK.search(body.strip()):
+            next_roots[next_root.group(1).upper()] = task.name
+        tasks[task.name] = task
+
+    for root, link in next_roots.items():
+        if root in tasks:
+            tasks[root].after.append(link)
+    return tasks
+
+
+@dataclass
+class TaskExecution:
+    task_name: str
+    node_names: List[str]
+    state: str
+    # seconds since the start of the run
+    start: float = 0.0
+    end: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+@dataclass
+class LocalRunTimeline:
+    executions: List[TaskExecution]
+    dependencies: Dict[str, Set[str]]
+    wall_time: float
+    max_workers: int
+
+    @property
+    def succeeded(self) -> bool:
+        return all(e.state == "SUCCEEDED" for e in self.executions)
+
+    @property
+    def total_task_time(self) -> float:
+        return sum(e.duration for e in self.executions)
+
+    def critical_path(self):
+        """Chain of dependent tasks limiting the run time when every task gets its own
+        compute, like in Snowflake - returns the tasks and their total duration"""
+        return critical_path(
+            self.dependencies,
+            {e.task_name: e.duration for e in self.executions},
+            default_duration=0.0,
+        )
+
+    def render(self, width: int = 40) -> str:
+        scale = width / max(self.wall_time, 1e-9)
+        rows = [
+            (
+                e.task_name,
+                e.state,
+                e.start,
+                e.duration,
+                "." * int(e.start * scale) + "#" * max(1, int(e.duration * scale)),
+            )
+            for e in sorted(self.executions, key=lambda e: (e.start, e.task_name))
+            if e.node_names or e.state != "SUCCEEDED"
+        ]
+        path, path_time = self.critical_path()
+        lines = [
+            tabulate(
+                rows,
+                headers=["TASK", "STATE", "START [s]", "DURATION [s]", "TIMELINE"],
+                tablefmt="psql",
+                floatfmt=".2f",
+            ),
+            f"Wall time: {self.wall_time:.2f}s with {self.max_workers} local workers, "
+            f"sum of task times: {self.total_task_time:.2f}s",
+            f"Critical path: {' -> '.join(path)} ({path_time:.2f}s)",
+        ]
+        if path_time > 0:
+            lines.append(
+                f"Expected speedup with parallel Snowflake tasks: "
+                f"{self.total_task_time / path_time:.1f}x (excluding the task startup time)"
+            )
+        return "\n".join(lines)
+
+
+class LocalTaskExecutor:
+    """Executes the task plan locally, respecting the dependencies between the tasks.
+    Tasks running nodes are submitted to a thread pool once all their predecessors succeeded,
+    the other tasks (root, barrier, link) complete immediately. Like in Snowflake, a failure
+    stops the run - the tasks which did not start yet are skipped."""
+
+    def __init__(
+        self,
+        tasks: Dict[str, PlannedTask],
+        run_nodes: Callable[[List[str]], Any],
+        max_workers: int = 4,
+        on_transition: Callable[[TaskExecution], Any] = None,
+    ):
+        self.tasks = tasks
+        self.run_nodes = run_nodes
+        self.max_workers = max_workers
+        self.on_transition = on_transition or (lambda e: None)
+
+    def run(self) -> LocalRunTimeline:
+        start_ts = perf_counter()
+        dependencies = {
+            name: {t for t in task.after if t in self.tasks}
+            for name, task in self.tasks.items()
+        }
+        executions = {
+            name: TaskExecution(name, task.node_names, "SCHEDULED")
+            for name, task in self.tasks.items()
+        }
+        done: Set[str] = set()
+        running: Dict[Future, str] = {}
+        failed = False
+
+        def execute(name: str):
+            executions[name].start = perf_counter() - start_ts
+            executions[name].state = "EXECUTING"
+            self.on_transition(executions[name])
+            self.run_nodes(self.tasks[name].node_names)
+
+        def ready() -> List[str]:
+            return sorted(
+                name
+                for name, deps in dependencies.items()
+                if name not in done and name not in running.values() and deps <= done
+            )
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                progressed = not failed
+                while progressed:
+                    progressed = False
+                    for name in ready():
+                        if self.tasks[name].node_names:
+                            running[executor.submit(execute, name)] = name
+                        else:
+                            executions[name].start = executions[name].end = (
+                                perf_counter() - start_ts
+                            )
+                            self._finish(executions[name], "SUCCEEDED")
+                            done.add(name)
+                            progressed = True
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    executions[name].end = perf_counter() - start_ts
+                    if future.exception():
+                        failed = True
+                        self._finish(
+                            executions[name], "FAILED", str(future.exception())
+                        )
+                    else:
+                        self._finish(executions[name], "SUCCEEDED")
+                    done.add(name)
+
+        for execution in executions.values():
+            if execution.state == "SCHEDULED":
+                self._finish(execution, "SKIPPED")
+        return LocalRunTimeline(
+            list(executions.values()),
+            dependencies,
+            perf_counter() - start_ts,
+            self.max_workers,
+        )
+
+    def _finish(self, execution: TaskExecution, state: str, error: str = None):
+        execution.state = state
+        execution.error = error
+        self.on_transition(execution)
+
+
+class KedroNodesRunner:
+    """Runs the nodes of a single task the way the stored procedure does - through
+    the `SnowflakeRunner`, so that the data passed between the tasks goes through the stage
+    of the (local) session. Project hooks are not called."""
+
+    def __init__(
+        self,
+        session,
+        temp_data_stage: str,
+        run_id: str,
+        pipeline: Pipeline,
+        catalog: DataCatalog,
+        out_of_band_buffers: bool = False,
+        min_buffer_size: int = SnowflakeStagePickleDataSet.DEFAULT_MIN_BUFFER_SIZE,
+    ):
+        self.session = session
+        self.temp_data_stage = temp_data_stage
+        self.run_id = run_id
+        self.pipeline = pipeline
+        self.catalog = catalog
+        self.out_of_band_buffers = out_of_band_buffers
+        self.min_buffer_size = min_buffer_size
+        self._lock = threading.Lock()
+
+    def __call__(self, node_names: List[str]):
+        with self._lock:
+            catalog = self.catalog.shallow_copy()
+        SnowflakeRunner(
+            self.session,
+            self.temp_data_stage,
+            self.run_id,
+            full_pipeline=self.pipeline,
+            out_of_band_buffers=self.out_of_band_buffers,
+            min_buffer_size=self.min_buffer_size,
+        ).run(self.pipeline.only_nodes(*node_names), catalog)
@@ -0,0 +1,592 @@
+import datetime as dt
+import gzip
+import hashlib
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+from glob import glob
+from io import BytesIO
+from pathlib import Path
+from typing import IO, Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+from snowflake.snowpark import Row
+from snowflake.snowpark.file_operation import GetResult, PutResult
+
+# Snowflake-only statements, recorded in LocalSession.executed_sql and otherwise ignored
+NO_OP_STATEMENTS = re.compile(
+    r"^\s*(create\s+(or\s+replace\s+)?task|alter\s+task|drop\s+task|execute\s+task|call\s|"
+    r"show\s|use\s|grant\s|alter\s+session)",
+    re.IGNORECASE,
+)
+CREATE_STAGE = re.compile(
+    r"^\s*create\s+(or\s+replace\s+)?(temporary\s+)?stage\s+(if\s+not\s+exists\s+)?(\S+?);?\s*$",
+    re.IGNORECASE,
+)
+DROP_STAGE = re.compile(
+    r"^\s*drop\s+stage\s+(if\s+exists\s+)?(\S+?);?\s*$", re.IGNORECASE
+)
+# stage locations, plain (@stage/path) or quoted ('@stage/path with spaces')
+STAGE_LOCATION = r"(@\S+?|'@(?:[^'\\]|\\.)*')"
+LIST_STAGE = re.compile(
+    rf"^\s*(ls|list)\s+{STAGE_LOCATION}(\s+pattern\s*=\s*'([^']*)')?\s*;?\s*$",
+    re.IGNORECASE,
+)
+REMOVE_FROM_STAGE = re.compile(
+    rf"^\s*(rm|remove)\s+{STAGE_LOCATION}(\s+pattern\s*=\s*'([^']*)')?\s*;?\s*$",
+    re.IGNORECASE,
+)
+TO_TIMESTAMP = re.compile(r"to_timestamp(_ltz|_ntz|_tz)?\('([^']*)'\)", re.IGNORECASE)
+TASK_HISTORY_FUNCTION = "table(information_schema.task_history("
+TASK_HISTORY_DEFAULT_RESULT_LIMIT = 100
+
+TASK_HISTORY_DDL = """
+create table if not exists task_history (
+    name text,
+    run_id integer,
+    state text,
+    scheduled_from text,
+    scheduled_time timestamp,
+    query_start_time timestamp,
+    completed_time timestamp,
+    error_message text,
+    return_value text
+)"""
+
+
+def _rows(cursor: sqlite3.Cursor) -> List[Row]:
+    if cursor.description is None:
+        return []
+    names = [d[0].upper() for d in cursor.description]
+    return [Row(**dict(zip(names, values))) for values in cursor.fetchall()]
+
+
+def _unquote(location: str) -> str:
+    """Stage location without the quotes and backslash escapes of an SQL string"""
+    if location.startswith("'"):
+        return re.sub(r"\\(.)", r"\1", location[1:-1])
+    return location
+
+
+def _split_arguments(arguments: str) -> List[str]:
+    """Splits the arguments of a function call on the top-level commas"""
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in arguments:
+        if char == "'":
+            quoted = not quoted
+        elif not quoted:
+            depth += {"(": 1, ")": -1}.get(char, 0)
+            if char == "," and depth == 0:
+                parts.append(current)
+                current = ""
+                continue
+        current += char
+    return [p.strip() for p in parts + [current] if p.strip()]
+
+
+def _task_history_table(arguments: str) -> str:
+    """Subquery emulating the task_history table function - like in Snowflake, it returns
+    only the `result_limit` (100 by default) most recent rows, before any WHERE clause.
+    Supports the task_name and scheduled_time_range_start (a to_timestamp) arguments"""
+    named = {
+        name.strip().lower(): value.strip()
+        for name, value in (a.split("=>", 1) for a in _split_arguments(arguments))
+    }
+    conditions = []
+    if task_name := named.get("task_name"):
+        conditions.append(f"name = upper({task_name})")
+    if (start := named.get("scheduled_time_range_start")) and TO_TIMESTAMP.fullmatch(
+        start
+    ):
+        conditions.append(f"scheduled_time >= {start}")
+    where = f" where {' and '.join(conditions)}" if conditions else ""
+    limit = int(named.get("result_limit", TASK_HISTORY_DEFAULT_RESULT_LIMIT))
+    return (
+        f"(select * from task_history{where} "
+        f"order by scheduled_time desc limit {limit})"
+    )
+
+
+def _replace_task_history_function(query: str) -> str:
+    """table(information_schema.task_history(<arguments>)) -> task_history subquery"""
+    while (start := query.lower().find(TASK_HISTORY_FUNCTION)) >= 0:
+        depth, end = 0, start
+        for end in range(start, len(query)):
+            depth += {"(": 1, ")": -1}.get(query[end], 0)
+            if depth == 0 and query[end] == ")":
+                break
+        arguments = query[start + len(TASK_HISTORY_FUNCTION) : end].rstrip()[:-1]
+        query = query[:start] + _task_history_table(arguments) + query[end + 1 :]
+    return query
+
+
+def _to_sqlite(query: str) -> str:
+    query = _replace_task_history_function(query)
+    query = TO_TIMESTAMP.sub(
+        lambda m: f"'{dt.datetime.fromisoformat(m.group(2)).replace(tzinfo=None)}'",
+        query,
+    )
+    return query.replace("information_schema.tables", "information_schema_tables")
+
+
+class LocalStage:
+    """Stages of the local session, backed by the subdirectories of the root directory.
+    Stage names are case-insensitive, like the unquoted Snowflake identifiers"""
+
+    def __init__(self, root_dir: Path):
+        self.root_dir = root_dir
+        # (path, mtime, size) -> md5, LS in Snowflake doesn't read the files either
+        self._md5_cache: Dict[Tuple[Path, int, int], str] = {}
+
+    def _md5(self, path: Path) -> str:
+        stat = path.stat()
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        if key not in self._md5_cache:
+            self._md5_cache[key] = hashlib.md5(path.read_bytes()).hexdigest()
+        return self._md5_cache[key]
+
+    def create(self, name: str):
+        self._stage_dir(name).mkdir(parents=True, exist_ok=True)
+
+    def drop(self, name: str):
+        shutil.rmtree(self._stage_dir(name), ignore_errors=True)
+
+    def _stage_dir(self, name: str) -> Path:
+        return self.root_dir / name.lstrip("@").upper()
+
+    def resolve(self, stage_location: str) -> Tuple[str, Path]:
+        """Stage name and the local path of the stage location (@stage/path)"""
+        stage, _, path = stage_location.strip().strip("'\"").partition("/")
+        if not stage.startswith("@"):
+            raise ValueError(f"Not a stage location: {stage_location}")
+        stage_dir = self._stage_dir(stage)
+        stage_dir.mkdir(parents=True, exist_ok=True)
+        local_path = (stage_dir / path.strip("/")).resolve()
+        if stage_dir.resolve() not in (local_path, *local_path.parents):
+            raise ValueError(f"Stage location outside of the stage: {stage_location}")
+        return stage.lstrip("@"), local_path
+
+    def files(
+        self, stage_location: str, pattern: Optional[str] = None
+    ) -> List[Tuple[str, Path]]:
+        """Files under the stage location (stage-prefixed names, as returned by LS, and paths),
+        optionally filtered by the regular expression matching the whole name"""
+        stage, local_path = self.resolve(stage_location)
+        stage_dir = self._stage_dir(stage)
+        if local_path.is_file():
+            candidates = [local_path]
+        else:
+            # prefix match, like LS @stage/prefix
+            parent = local_path if local_path.is_dir() else local_path.parent
+            candidates = [
+                p
+                for p in sorted(parent.rglob("*"))
+                if p.is_file() and str(p).startswith(str(local_path))
+            ]
+        files = [
+            (f"{stage.lower()}/{p.relative_to(stage_dir).as_posix()}", p)
+            for p in candidates
+        ]
+        if pattern:
+            regex = re.compile(pattern)
+            files = [(name, p) for name, p in files if regex.fullmatch(name)]
+        return files
+
+    def list(self, stage_location: str, pattern: Optional[str] = None) -> List[Row]:
+        return [
+            Row(
+                name=name,
+                size=path.stat().st_size,
+                md5=self._md5(path),
+                last_modified=dt.datetime.utcfromtimestamp(
+                    path.stat().st_mtime
+                ).strftime("%a, %d %b %Y %H:%M:%S GMT"),
+            )
+            for name, path in self.files(stage_location, pattern)
+        ]
+
+    def remove(self, stage_location: str, pattern: Optional[str] = None) -> List[Row]:
+        removed = self.files(stage_location, pattern)
+        for _, path in removed:
+            path.unlink()
+        return [Row(name=name, result="removed") for name, _ in removed]
+
+
+class LocalFileOperation:
+    """Local counterpart of `session.file`, see `snowflake.snowpark.FileOperation`"""
+
+    def __init__(self, stage: LocalStage):
+        self._stage = stage
+
+    def put(
+        self,
+        local_file_name: str,
+        stage_location: str,
+        *,
+        parallel: int = 4,
+        auto_compress: bool = True,
+        source_compression: str = "AUTO_DETECT",
+        overwrite: bool = False,
+        **kwargs,
+    ) -> List[PutResult]:
+        sources = [
+            Path(p)
+            for p in sorted(glob(re.sub(r"^file://", "", local_file_name)))
+            if Path(p).is_file()
+        ]
+        results = []
+        for source in sources:
+            with source.open("rb") as stream:
+                result = self.put_stream(
+                    stream,
+                    f"{stage_location.rstrip('/')}/{source.name}",
+                    auto_compress=auto_compress,
+                    overwrite=overwrite,
+                )
+            results.append(result)
+        return results
+
+    def put_stream(
+        self,
+        input_stream: IO[bytes],
+        stage_location: str,
+        *,
+        parallel: int = 4,
+        auto_compress: bool = True,
+        source_compression: str = "AUTO_DETECT",
+        overwrite: bool = False,
+        **kwargs,
+    ) -> PutResult:
+        _, target = self._stage.resolve(
+            stage_location + (".gz" if auto_compress else "")
+        )
+        source_name = Path(stage_location).name
+        if target.exists() and not overwrite:
+            return PutResult(
+                source_name, target.name, 0, 0, "NONE", "NONE", "SKIPPED", ""
+            )
+        data = input_stream.read()
+        target.parent.mkdir(parents=True, exist_ok=True)
+        stored = gzip.compress(data) if auto_compress else data
+        target.write_bytes(stored)
+        return PutResult(
+            source_name,
+            target.name,
+            len(data),
+            len(stored),
+            "NONE",
+            "GZIP" if auto_compress else "NONE",
+            "UPLOADED",
+            "",
+        )
+
+    def get(
+        self,
+        stage_location: str,
+        target_directory: str,
+        *,
+        parallel: int = 10,
+        pattern: Optional[str] = None,
+        **kwargs,
+    ) -> List[GetResult]:
+        target_dir = Path(re.sub(r"^file://", "", target_directory))
+        target_dir.mkdir(parents=True, exist_ok=True)
+        results = []
+        for name, path in self._stage.files(stage_location, pattern):
+            shutil.copyfile(path, target_dir / path.name)
+            results.append(
+                GetResult(
+                    str(target_dir / path.name), path.stat().st_size, "DOWNLOADED", ""
+                )
+            )
+        return results
+
+    def get_stream(
+        self,
+        stage_location: str,
+        *,
+        parallel: int = 10,
+        decompress: bool = False,
+        **kwargs,
+    ) -> IO[bytes]:
+        _, path = self._stage.resolve(stage_location)
+        if not path.is_file():
+            raise FileNotFoundError(
+                f"File does not exist on the stage: {stage_location}"
+            )
+        data = path.read_bytes()
+        return BytesIO(gzip.decompress(data) if decompress else data)
+
+
+class LocalDataFrameWriter:
+    def __init__(self, df: "LocalDataFrame"):
+        self._df = df
+        self._mode = "errorifexists"
+
+    def mode(self, save_mode: str) -> "LocalDataFrameWriter":
+        self._mode = save_mode.lower()
+        return self
+
+    def save_as_table(
+        self, table_name: str, *, mode: Optional[str] = None, **kwargs
+    ) -> None:
+        self._df._session.write_pandas(
+            self._df.to_pandas(),
+            table_name,
+            auto_create_table=True,
+            overwrite=(mode or self._mode) == "overwrite",
+            if_exists_fail=(mode or self._mode) in ("errorifexists", "error"),
+        )
+
+    saveAsTable = save_as_table
+
+
+class LocalDataFrame:
+    """Eagerly evaluated, pandas-backed counterpart of the Snowpark DataFrame -
+    supports only collecting the data and saving it as a table"""
+
+    def __init__(self, session: "LocalSession", data: pd.DataFrame):
+        self._session = session
+        self._data = data
+
+    def to_pandas(self, **kwargs) -> pd.DataFrame:
+        return self._data.copy()
+
+    toPandas = to_pandas
+
+    def collect(self, **kwargs) -> List[Row]:
+        return [
+            Row(**dict(zip(self.columns, values)))
+            for values in self._data.itertuples(index=False, name=None)
+        ]
+
+    def count(self) -> int:
+        return len(self._data)
+
+    def drop(self, *cols: str) -> "LocalDataFrame":
+        columns = {c.upper() for c in cols}
+        return LocalDataFrame(
+            self._session,
+            self._data[[c for c in self._data.columns if c.upper() not in columns]],
+        )
+
+    @property
+    def columns(self) -> List[str]:
+        return [str(c).upper() for c in self._data.columns]
+
+    @property
+    def write(self) -> LocalDataFrameWriter:
+        return LocalDataFrameWriter(self)
+
+
+class _LocalAsyncJob:
+    """Counterpart of the Snowpark `AsyncJob` - local statements are already done
+    when submitted"""
+
+    def __init__(self, rows: List[Row]):
+        self._rows = rows
+
+    def is_done(self) -> bool:
+        return True
+
+    def result(self, result_type: Optional[str] = None) -> List[Row]:
+        return self._rows
+
+
+class _LocalQuery:
+    """Result of `LocalSession.sql` - the statement is executed when the result is collected"""
+
+    def __init__(self, session: "LocalSession", query: str):
+        self._session = session
+        self._query = query
+
+    def collect(self, **kwargs) -> List[Row]:
+        return self._session._execute(self._query)
+
+    def collect_nowait(self, **kwargs) -> "_LocalAsyncJob":
+        return _LocalAsyncJob(self.collect())
+
+    def to_pandas(self, **kwargs) -> pd.DataFrame:
+        rows = self.collect()
+        return pd.DataFrame(
+            [tuple(r) for r in rows], columns=list(rows[0].as_dict()) if rows else None
+        )
+
+    toPandas = to_pandas
+
+
+class _LocalConnection:
+    """Counterpart of the `ServerConnection`, used by the datasets through `session._conn`"""
+
+    def __init__(self, session: "LocalSession"):
+        self._session = session
+        self._closed = False
+
+    def run_query(self, query: str, params: Sequence[Any] = (), **kwargs):
+        rows = self._session._execute(query, params)
+        return {"data": [tuple(r) for r in rows]}
+
+    def is_closed(self) -> bool:
+        return self._closed
+
+    def close(self):
+        self._closed = True
+
+
+class LocalSession:
+    """In-process stand-in for the Snowpark session, for testing and profiling without
+    a Snowflake account:
+    - stages are directories under `root_dir` (PUT/GET/streams, LS and REMOVE with PATTERN),
+    - tables are kept in an SQLite database (`sql`, `table`, `create_dataframe`, `write_pandas`),
+    - task history is emulated by the `task_history` table, filled in with `record_task_run`
+      and queried through `table(information_schema.task_history(...))`, returning at most
+      `result_limit` (100 by default) most recent rows, like in Snowflake,
+    - other Snowflake-only statements (tasks, procedures calls, SHOW, USE) are recorded
+      in `executed_sql` and ignored.
+    Queries are executed by SQLite, so only the SQL supported by both dialects works."""
+
+    def __init__(self, root_dir: Optional[Path] = None):
+        self._temp_dir = None if root_dir else tempfile.TemporaryDirectory()
+        self.root_dir = Path(root_dir or self._temp_dir.name)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self.stage = LocalStage(self.root_dir)
+        self.file = LocalFileOperation(self.stage)
+        self.executed_sql: List[str] = []
+        self._conn = _LocalConnection(self)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(
+            ":memory:",
+            check_same_thread=False,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+        )
+        self._db.execute(TASK_HISTORY_DDL)
+        self._db.execute(
+            "create view information_schema_tables as "
+            "select name as table_name from sqlite_master where type = 'table'"
+        )
+        self._next_run_id = 1
+
+    def sql(self, query: str) -> _LocalQuery:
+        return _LocalQuery(self, query)
+
+    def _execute(self, query: str, params: Sequence[Any] = ()) -> List[Row]:
+        with self._lock:
+            self.executed_sql.append(query)
+            if NO_OP_STATEMENTS.match(query):
+                return []
+            if m := CREATE_STAGE.match(query):
+                self.stage.create(m.group(4))
+                return [
+                    Row(status=f"Stage area {m.group(4).upper()} successfully created.")
+                ]
+            if m := DROP_STAGE.match(query):
+                self.stage.drop(m.group(2))
+                return [Row(status=f"{m.group(2).upper()} successfully dropped.")]
+            if m := LIST_STAGE.match(query):
+                return self.stage.list(_unquote(m.group(2)), m.group(4))
+            if m := REMOVE_FROM_STAGE.match(query):
+                return self.stage.remove(_unquote(m.group(2)), m.group(4))
+            cursor = self._db.execute(_to_sqlite(query).strip().rstrip(";"), params)
+            rows = _rows(cursor)
+            self._db.commit()
+            return rows
+
+    def table(self, name: str) -> LocalDataFrame:
+        with self._lock:
+            return LocalDataFrame(
+                self, pd.read_sql_query(f"select * from {name}", self._db)
+            )
+
+    def create_dataframe(self, data: Iterable, schema: Any = None) -> LocalDataFrame:
+        if isinstance(data, pd.DataFrame):
+            return LocalDataFrame(self, data)
+        names = getattr(schema, "names", schema)
+        return LocalDataFrame(self, pd.DataFrame(list(data), columns=names))
+
+    createDataFrame = create_dataframe
+
+    def write_pandas(
+        self,
+        df: pd.DataFrame,
+        table_name: str,
+        *,
+        auto_create_table: bool = False,
+        overwrite: bool = False,
+        if_exists_fail: bool = False,
+        **kwargs,
+    ) -> LocalDataFrame:
+        with self._lock:
+            exists = bool(
+                self._db.execute(
+                    "select 1 from sqlite_master where type = 'table' and upper(name) = ?",
+                    (table_name.upper(),),
+                ).fetchall()
+            )
+            if exists and if_exists_fail:
+                raise ValueError(f"Table {table_name} already exists")
+            if not exists and not auto_create_table:
+                raise ValueError(f"Table {table_name} does not exist")
+            df = df.rename(columns=lambda c: str(c).upper())
+            df.to_sql(
+                table_name.upper(),
+                self._db,
+                if_exists="replace" if overwrite else "append",
+                index=False,
+            )
+            self._db.commit()
+        return self.table(table_name)
+
+    def record_task_run(
+        self,
+        name: str,
+        state: str,
+        run_id: Optional[int] = None,
+        scheduled_from: str = "SCHEDULE",
+        scheduled_time: Optional[dt.datetime] = None,
+        query_start_time: Optional[dt.datetime] = None,
+        completed_time: Optional[dt.datetime] = None,
+        error_message: Optional[str] = None,
+        return_value: Optional[str] = None,
+    ) -> int:
+        """Adds (or, for the same task and run id, updates) the task history entry.
+        Returns the run id, a new one is assigned when not given"""
+        with self._lock:
+            if run_id is None:
+                run_id = self._next_run_id
+            self._next_run_id = max(self._next_run_id, run_id + 1)
+            name = name.upper()
+            self._db.execute(
+                "delete from task_history where name = ? and run_id = ?",
+                (name, run_id),
+            )
+            self._db.execute(
+                "insert into task_history values (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    name,
+                    run_id,
+                    state.upper(),
+                    scheduled_from,
+                    scheduled_time or dt.datetime.now(),
+                    query_start_time,
+                    completed_time,
+                    error_message,
+                    return_value,
+                ),
+            )
+            self._db.commit()
+        return run_id
+
+    def close(self):
+        self._conn.close()
+        with self._lock:
+            self._db.close()
+        if self._temp_dir:
+            self._temp_dir.cleanup()
+
+    def __enter__(self) -> "LocalSession":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,273 @@
+import asyncio
+import datetime as dt
+from dataclasses import dataclass
+from time import monotonic, sleep
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+)
+
+from snowflake.snowpark import DataFrame, Row, Session
+
+SUCCEEDED = "SUCCEEDED"
+FAILED_STATES = ("FAILED", "CANCELLED")
+TERMINAL_STATES = (SUCCEEDED, "SKIPPED") + FAILED_STATES
+# rows returned by the task history table function (the default is just 100)
+TASK_HISTORY_RESULT_LIMIT = 10000
+
+
+async def collect_async(
+    dataframe: DataFrame,
+    min_poll_interval: float = 0.05,
+    max_poll_interval: float = 1.0,
+) -> List[Row]:
+    """Submits the query with `collect_nowait` and awaits its results, checking
+    whether the query is done with a growing interval, without blocking the event loop"""
+    job = dataframe.collect_nowait()
+    interval = min_poll_interval
+    while not job.is_done():
+        await asyncio.sleep(interval)
+        interval = min(interval * 2, max_poll_interval)
+    return job.result()
+
+
+@dataclass
+class TaskStateEvent:
+    task_name: str
+    run_id: int
+    state: str
+    previous_state: Optional[str]
+    scheduled_time: Optional[dt.datetime] = None
+    query_start_time: Optional[dt.datetime] = None
+    completed_time: Optional[dt.datetime] = None
+    error_message: Optional[str] = None
+
+    def __str__(self):
+        transition = (
+            f"{self.previous_state} -> {self.state}"
+            if self.previous_state
+            else self.state
+        )
+        message = f"{dt.datetime.now():%H:%M:%S} {self.task_name}: {transition}"
+        if self.error_message:
+            message += f" ({self.error_message})"
+        return message
+
+
+class PipelineMonitor:
+    """Follows the latest run of the pipeline started with EXECUTE TASK and yields
+    the state transitions of its tasks.
+    Only the rows of the task history that could have changed since the previous poll are
+    fetched (tasks still running and the ones completed since then). The poll interval grows
+    while nothing happens, up to `max_poll_interval`, and drops back after every transition."""
+
+    def __init__(
+        self,
+        session: Session,
+        root_task_name: str,
+        task_names: Sequence[str],
+        continuation_root_task_names: Sequence[str] = (),
+        min_poll_interval: float = 2.0,
+        max_poll_interval: float = 30.0,
+        backoff_factor: float = 1.5,
+    ):
+        self.session = session
+        self.root_task_name = root_task_name.upper()
+        self.continuation_root_task_names = [
+            t.upper() for t in continuation_root_task_names
+        ]
+        self.task_names = {t.upper() for t in task_names} | {self.root_task_name}
+        self.task_names |= set(self.continuation_root_task_names)
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.backoff_factor = backoff_factor
+
+        self.run_ids: List[int] = []
+        self.states: Dict[str, str] = {}
+        self._completed_watermark: Optional[dt.datetime] = None
+        # scheduled time of the first run of the pipeline (the root task)
+        self._run_scheduled_time: Optional[dt.datetime] = None
+
+    @property
+    def failed(self) -> bool:
+        return any(state in FAILED_STATES for state in self.states.values())
+
+    @property
+    def finished(self) -> bool:
+        return self.failed or all(
+            self.states.get(t) in TERMINAL_STATES for t in self.task_names
+        )
+
+    @property
+    def succeeded(self) -> bool:
+        return all(self.states.get(t) == SUCCEEDED for t in self.task_names)
+
+    def events(self, timeout_seconds: float = 600) -> Iterator[TaskStateEvent]:
+        """Yields the task state transitions until the run finishes or the timeout passes"""
+        deadline = monotonic() + timeout_seconds
+        interval = None
+        while True:
+            events = self.poll()
+            yield from events
+            interval = self._next_interval(interval, events, deadline)
+            if interval is None:
+                return
+            sleep(interval)
+
+    async def events_async(
+        self, timeout_seconds: float = 600
+    ) -> AsyncIterator[TaskStateEvent]:
+        """Same as `events`, but the queries are submitted asynchronously (`poll_async`)
+        and the event loop is not blocked between the polls"""
+        deadline = monotonic() + timeout_seconds
+        interval = None
+        while True:
+            events = await self.poll_async()
+            for event in events:
+                yield event
+            interval = self._next_interval(interval, events, deadline)
+            if interval is None:
+                return
+            await asyncio.sleep(interval)
+
+    def wait(
+        self,
+        timeout_seconds: float = 600,
+        callback: Callable[[TaskStateEvent], Any] = None,
+    ) -> bool:
+        """Blocks until the run finishes, calling the callback for every transition.
+        Returns True only if all the tasks succeeded within the timeout"""
+        for event in self.events(timeout_seconds):
+            if callback:
+                callback(event)
+        return self.finished and self.succeeded
+
+    async def wait_async(
+        self,
+        timeout_seconds: float = 600,
+        callback: Callable[[TaskStateEvent], Any] = None,
+    ) -> bool:
+        async for event in self.events_async(timeout_seconds):
+            if callback:
+                callback(event)
+        return self.finished and self.succeeded
+
+    def _next_interval(
+        self, interval: Optional[float], events: List[TaskStateEvent], deadline: float
+    ) -> Optional[float]:
+        """Delay before the next poll or None if the monitoring should stop"""
+        remaining = deadline - monotonic()
+        if self.finished or remaining <= 0:
+            return None
+        if events or interval is None:
+            interval = self.min_poll_interval
+        else:
+            interval = min(interval * self.backoff_factor, self.max_poll_interval)
+        return min(interval, remaining)
+
+    def poll(self) -> List[TaskStateEvent]:
+        """Fetches the changed task history rows and returns the new transitions"""
+        while root_task_name := self._next_root_to_discover():
+            if not self._record_run(
+                self.session.sql(self._discover_run_sql(root_task_name)).collect()
+            ):
+                break
+        if not self.run_ids:
+            return []
+        return self._process_rows(self.session.sql(self._changed_rows_sql()).collect())
+
+    async def poll_async(self) -> List[TaskStateEvent]:
+        """Same as `poll`, but submits the queries with `collect_nowait`"""
+        while root_task_name := self._next_root_to_discover():
+            if not self._record_run(
+                await collect_async(
+                    self.session.sql(self._discover_run_sql(root_task_name))
+                )
+            ):
+                break
+        if not self.run_ids:
+            return []
+        return self._process_rows(
+            await collect_async(self.session.sql(self._changed_rows_sql()))
+        )
+
+    def _next_root_to_discover(self) -> Optional[str]:
+        # chained graphs are executed (with their own run ids) by the preceding graphs
+        roots = [self.root_task_name] + self.continuation_root_task_names
+        return roots[len(self.run_ids)] if len(self.run_ids) < len(roots) else None
+
+    def _process_rows(self, rows) -> List[TaskStateEvent]:
+        events = []
+        for row in rows:
+            name = row["NAME"].upper()
+            state = row["STATE"].upper()
+            if self.states.get(name) == state:
+                continue
+            events.append(
+                TaskStateEvent(
+                    name,
+                    row["RUN_ID"],
+                    state,
+                    self.states.get(name),
+                    row["SCHEDULED_TIME"],
+                    row["QUERY_START_TIME"],
+                    row["COMPLETED_TIME"],
+                    row["ERROR_MESSAGE"],
+                )
+            )
+            self.states[name] = state
+            if row["COMPLETED_TIME"] and (
+                self._completed_watermark is None
+                or row["COMPLETED_TIME"] > self._completed_watermark
+            ):
+                self._completed_watermark = row["COMPLETED_TIME"]
+        return events
+
+    def _task_history(self, task_name: Optional[str] = None) -> str:
+        """Task history table function limited to the rows of the pipeline run - the function
+        returns only `result_limit` rows (100 by default), applied before the WHERE clause"""
+        arguments = [f"task_name => '{task_name}'"] if task_name else []
+        if self._run_scheduled_time:
+            # continuation runs and all the child tasks are scheduled after the first run
+            arguments.append(
+                "scheduled_time_range_start => "
+                f"to_timestamp_ltz('{self._run_scheduled_time.isoformat()}')"
+            )
+        arguments.append(f"result_limit => {TASK_HISTORY_RESULT_LIMIT}")
+        return "table(information_schema.task_history(\n    {}\n))".format(
+            ",\n    ".join(arguments)
+        )
+
+    def _discover_run_sql(self, root_task_name: str) -> str:
+        return f"""
+select run_id, scheduled_time
+from {self._task_history(root_task_name)}
+where scheduled_from = 'EXECUTE TASK' and name = '{root_task_name}'
+order by scheduled_time desc
+limit 1;""".strip()
+
+    def _record_run(self, rows) -> bool:
+        if rows:
+            self.run_ids.append(rows[0]["RUN_ID"])
+            if self._run_scheduled_time is None:
+                self._run_scheduled_time = rows[0]["SCHEDULED_TIME"]
+        return bool(rows)
+
+    def _changed_rows_sql(self) -> str:
+        changed = (
+            f" or completed_time >= to_timestamp_ltz('{self._completed_watermark.isoformat()}')"
+            if self._completed_watermark
+            else " or completed_time is not null"
+        )
+        return f"""
+select name, run_id, state, scheduled_time, query_start_time, completed_time, error_message
+from {self._task_history()}
+where run_id in ({",".join(str(r) for r in self.run_ids)})
+and (completed_time is null{changed})
+order by scheduled_time;""".strip()
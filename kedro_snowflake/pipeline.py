@@ -1,14 +1,21 @@
+import asyncio
 import datetime as dt
 import logging
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from time import monotonic, sleep
+from time import monotonic
 from typing import Any, Callable, List
 
-from snowflake.snowpark import Session
+from snowflake.snowpark import AsyncJob, Session
 from tabulate import tabulate
 
+from kedro_snowflake.monitoring import (
+    PipelineMonitor,
+    TaskStateEvent,
+    collect_async,
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,6 +26,12 @@ class KedroSnowflakePipeline:
     execute_sql: List[str]
     root_task_name: str
     pipeline_task_names: List[str]
+    # root tasks of the chained task graphs, for pipelines exceeding Snowflake limits
+    continuation_root_task_names: List[str] = field(default_factory=list)
+    # longest chain of dependent node groups, weighted by their historical durations
+    critical_path: List[str] = field(default_factory=list)
+    # pipeline_tasks_sql grouped into waves of statements independent of each other
+    submission_waves: List[List[str]] = field(default_factory=list)
 
     def run(
         self,
@@ -26,84 +39,134 @@ class KedroSnowflakePipeline:
         timeout_seconds: int = 600,
         echo_fn: Callable[[str], Any] = None,
         on_start_callback: Callable = None,
+        max_workers: int = 16,
+        on_event: Callable[[TaskStateEvent], Any] = None,
+    ) -> bool:
+        logger.info("Executing pipeline SQL")
+        waves = self.submission_waves or [[sql] for sql in self.pipeline_tasks_sql]
+        for wave in waves:
+            for i in range(0, len(wave), max_workers):
+                # asynchronous jobs, result() re-raises the first failure before
+                # the next statements are submitted
+                jobs = [self._submit_sql(sql) for sql in wave[i : i + max_workers]]
+                for job in jobs:
+                    job.result()
+        for sql in self.execute_sql:
+            self._execute_sql(sql)
+
+        if on_start_callback:
+            on_start_callback()
+
+        if wait_for_completion:
+            return self._wait_for_completion(echo_fn, timeout_seconds, on_event)
+        else:
+            return True
+
+    def _execute_sql(self, sql: str):
+        logger.debug(sql + os.linesep + os.linesep)
+        self.session.sql(sql).collect()
+
+    def _submit_sql(self, sql: str) -> AsyncJob:
+        logger.debug(sql + os.linesep + os.linesep)
+        return self.session.sql(sql).collect_nowait()
+
+    async def _execute_sql_async(self, sql: str):
+        logger.debug(sql + os.linesep + os.linesep)
+        await collect_async(self.session.sql(sql))
+
+    def monitor(self, **kwargs) -> PipelineMonitor:
+        """Monitor of the latest run of the pipeline, see `PipelineMonitor` for the options"""
+        return PipelineMonitor(
+            self.session,
+            self.root_task_name,
+            self.pipeline_task_names,
+            self.continuation_root_task_names,
+            **kwargs,
+        )
+
+    async def run_async(
+        self,
+        wait_for_completion: bool = False,
+        timeout_seconds: int = 600,
+        echo_fn: Callable[[str], Any] = None,
+        on_start_callback: Callable = None,
+        max_workers: int = 16,
+        on_event: Callable[[TaskStateEvent], Any] = None,
     ) -> bool:
+        """Same as `run`, but submits the SQL statements asynchronously (`collect_nowait`),
+        up to `max_workers` at once, and monitors the run without blocking the event loop"""
         logger.info("Executing pipeline SQL")
-        for sql in self.pipeline_tasks_sql + self.execute_sql:
-            logger.debug(sql + os.linesep + os.linesep)
-            self.session.sql(sql).collect()
+        waves = self.submission_waves or [[sql] for sql in self.pipeline_tasks_sql]
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def execute(sql: str):
+            async with semaphore:
+                await self._execute_sql_async(sql)
+
+        for wave in waves:
+            # gather re-raises the first failure before the next wave is submitted
+            await asyncio.gather(*(execute(sql) for sql in wave))
+        for sql in self.execute_sql:
+            await self._execute_sql_async(sql)
 
         if on_start_callback:
             on_start_callback()
 
         if wait_for_completion:
-            return self._wait_for_completion(echo_fn, timeout_seconds)
+            return await self.wait_async(timeout_seconds, echo_fn, on_event)
         else:
             return True
 
-    def _wait_for_completion(self, echo_fn, timeout_seconds):
+    async def wait_async(
+        self,
+        timeout_seconds: int = 600,
+        echo_fn: Callable[[str], Any] = None,
+        on_event: Callable[[TaskStateEvent], Any] = None,
+    ) -> bool:
+        """Waits for the latest run of the pipeline without blocking the event loop"""
         echo = echo_fn or (lambda s: None)
         start_ts = monotonic()
-        latest_task = self.session.sql(
-            f"""
-select name, run_id, scheduled_time, completed_time
-from table(information_schema.task_history())
-where scheduled_from = 'EXECUTE TASK' and name = '{self.root_task_name}'
-order by scheduled_time desc
-limit 1;""".strip()
-        ).to_pandas()
-        run_id = latest_task["RUN_ID"].values[0]
-        finished = False
-
-        def get_current_state():
-            state = self.session.sql(
-                f"""
-select name, run_id, scheduled_time, completed_time, state
-from table(information_schema.task_history())
-where run_id = {run_id}
-order by scheduled_time;
-                            """.strip()
-            ).to_pandas()
-            return (
-                state,
-                tabulate(
-                    state,
-                    headers="keys",
-                    tablefmt="psql",
-                    showindex=False,
-                ),
-            )
+        monitor = self.monitor()
+        success = await monitor.wait_async(
+            timeout_seconds, callback=self._event_handler(echo, on_event)
+        )
+        return self._summarize(monitor, success, echo, timeout_seconds, start_ts)
 
-        while not finished and (monotonic() - start_ts) < timeout_seconds:
-            state, state_printable = get_current_state()
-            echo(state_printable + os.linesep + f"Last update: {dt.datetime.now()}")
-            task_names = set(state["NAME"].str.upper())
-            finished = (
-                all(state["COMPLETED_TIME"].notnull())
-                and all(
-                    t.upper() in task_names
-                    for t in (self.pipeline_task_names + [self.root_task_name])
-                )
-            ) or any(state["STATE"].str.upper() == "FAILED")
-            if finished:
-                break
-            sleep(11)
-        else:
+    def _wait_for_completion(self, echo_fn, timeout_seconds, on_event=None):
+        echo = echo_fn or (lambda s: None)
+        start_ts = monotonic()
+        monitor = self.monitor()
+        success = monitor.wait(
+            timeout_seconds, callback=self._event_handler(echo, on_event)
+        )
+        return self._summarize(monitor, success, echo, timeout_seconds, start_ts)
+
+    @staticmethod
+    def _event_handler(echo, on_event):
+        def handle(event: TaskStateEvent):
+            echo(str(event))
+            if on_event:
+                on_event(event)
+
+        return handle
+
+    @staticmethod
+    def _summarize(monitor, success, echo, timeout_seconds, start_ts) -> bool:
+        if not monitor.finished:
             echo(f"Pipeline timed out after {timeout_seconds}s")
             return False
 
-        if finished:
-            state, state_printable = get_current_state()
-            success = all(state["STATE"].str.upper() == "SUCCEEDED")
-            echo(
-                state_printable
-                + os.linesep
-                + f"Pipeline finished at {dt.datetime.now()} (in approx. {monotonic()-start_ts}s). "
-                f"Status: {'SUCCEEDED' if success else 'FAILED'}"
+        echo(
+            tabulate(
+                sorted(monitor.states.items()),
+                headers=["NAME", "STATE"],
+                tablefmt="psql",
             )
-
-            return success
-        else:
-            return False
+            + os.linesep
+            + f"Pipeline finished at {dt.datetime.now()} (in approx. {monotonic()-start_ts:.0f}s). "
+            f"Status: {'SUCCEEDED' if success else 'FAILED'}"
+        )
+        return success
 
     def save(self, path: Path):
         path.write_text("\n\n".join(self.pipeline_tasks_sql + self.execute_sql))
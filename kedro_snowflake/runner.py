@@ -1,15 +1,42 @@
-from typing import Any, Dict
+from time import monotonic
+from typing import Any, Dict, Optional, Set
 
-from kedro.io import AbstractDataSet, DataCatalog
+from kedro.framework.hooks import _create_hook_manager, hook_impl
+from kedro.io import AbstractDataSet, DataCatalog, MemoryDataSet
 from kedro.pipeline import Pipeline
 from kedro.runner import SequentialRunner
 from pluggy import PluginManager
 from snowflake.snowpark import Session
 
-from kedro_snowflake.datasets.internal import SnowflakeRunnerDataSet
+from kedro_snowflake.datasets.internal import (
+    SnowflakeRunnerDataSet,
+    SnowflakeStagePickleDataSet,
+)
+
+
+class _NodeTimer:
+    """Hooks measuring the run time of every node (including loading and saving its data)"""
+
+    def __init__(self):
+        self.run_times: Dict[str, float] = {}
+        self._start_ts: Dict[str, float] = {}
+
+    @hook_impl
+    def before_node_run(self, node):
+        self._start_ts[node.name] = monotonic()
+
+    @hook_impl
+    def after_node_run(self, node):
+        self.run_times[node.name] = monotonic() - self._start_ts.pop(node.name)
 
 
 class SnowflakeRunner(SequentialRunner):
+    """Runs (a part of) the pipeline inside of the Snowflake task.
+    When the `full_pipeline` is provided, intermediate datasets produced and consumed only by
+    the executed nodes stay in memory instead of being persisted in Snowflake.
+    With `out_of_band_buffers`, the persisted objects are pickled with protocol 5
+    (see `SnowflakeStagePickleDataSet`)"""
+
     def __init__(
         self,
         snowflake_session: Session,
@@ -17,22 +44,47 @@ class SnowflakeRunner(SequentialRunner):
         run_id: str,
         run_id_column_name: str = "kedro_snowflake_run_id",
         is_async: bool = False,
+        full_pipeline: Optional[Pipeline] = None,
+        out_of_band_buffers: bool = False,
+        min_buffer_size: int = SnowflakeStagePickleDataSet.DEFAULT_MIN_BUFFER_SIZE,
     ):
         super().__init__(is_async)
+        self.out_of_band_buffers = out_of_band_buffers
+        self.min_buffer_size = min_buffer_size
         self.run_id_column_name = run_id_column_name
         self.run_id = run_id
         self.snowflake_stage = snowflake_stage
         self.snowflake_session = snowflake_session
+        self.full_pipeline = full_pipeline
+        self._in_memory_data_sets: Set[str] = set()
+        # node name -> run time in seconds, filled in by the last run
+        self.node_run_times: Dict[str, float] = {}
 
     def create_default_data_set(self, ds_name: str) -> AbstractDataSet:
+        if ds_name in self._in_memory_data_sets:
+            # Snowpark DataFrames cannot be copied and the data never leaves this process
+            return MemoryDataSet(copy_mode="assign")
         return SnowflakeRunnerDataSet(
             ds_name,
             self.snowflake_stage,
             self.run_id,
             self.snowflake_session,
             self.run_id_column_name,
+            out_of_band_buffers=self.out_of_band_buffers,
+            min_buffer_size=self.min_buffer_size,
         )
 
+    def _task_local_data_sets(self, pipeline: Pipeline) -> Set[str]:
+        if self.full_pipeline is None:
+            return set()
+        executed_nodes = set(pipeline.nodes)
+        local = set()
+        for ds_name in pipeline.all_outputs():
+            consumers = self.full_pipeline.only_nodes_with_inputs(ds_name).nodes
+            if consumers and executed_nodes.issuperset(consumers):
+                local.add(ds_name)
+        return local
+
     def run(
         self,
         pipeline: Pipeline,
@@ -40,9 +92,20 @@ class SnowflakeRunner(SequentialRunner):
         hook_manager: PluginManager = None,
         session_id: str = None,
     ) -> Dict[str, Any]:
+        self._in_memory_data_sets = self._task_local_data_sets(pipeline) - set(
+            catalog.list()
+        )
+
         unsatisfied = pipeline.inputs() - set(catalog.list())
         for ds_name in unsatisfied:
             catalog = catalog.shallow_copy()
             catalog.add(ds_name, self.create_default_data_set(ds_name))
 
-        return super().run(pipeline, catalog, hook_manager, session_id)
+        hook_manager = hook_manager or _create_hook_manager()
+        timer = _NodeTimer()
+        hook_manager.register(timer)
+        try:
+            return super().run(pipeline, catalog, hook_manager, session_id)
+        finally:
+            hook_manager.unregister(timer)
+            self.node_run_times = timer.run_times
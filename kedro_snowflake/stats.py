@@ -0,0 +1,112 @@
+import datetime as dt
+from typing import Any, Dict, List
+
+from snowflake.snowpark import Row, Session
+from snowflake.snowpark.types import (
+    DoubleType,
+    IntegerType,
+    StringType,
+    StructField,
+    StructType,
+    TimestampType,
+)
+
+RUN_STATS_SCHEMA = StructType(
+    [
+        StructField("RUN_ID", StringType()),
+        StructField("PIPELINE_NAME", StringType()),
+        # single call of the stored procedure, executing one or more nodes
+        StructField("INVOCATION_ID", StringType()),
+        StructField("NODE_NAME", StringType()),
+        StructField("TASK_NODES_COUNT", IntegerType()),
+        StructField("EXTRACT_TIME", DoubleType()),
+        StructField("KEDRO_INIT_TIME", DoubleType()),
+        StructField("KEDRO_RUN_TIME", DoubleType()),
+        StructField("NODE_RUN_TIME", DoubleType()),
+        StructField("RECORDED_AT", TimestampType()),
+    ]
+)
+
+
+def save_run_stats(
+    session: Session,
+    table: str,
+    invocation_id: str,
+    execution_data: Dict[str, Any],
+    node_run_times: Dict[str, float],
+):
+    """Appends timings of the nodes executed by a single task to the stats table
+    (created on the first save)"""
+    recorded_at = dt.datetime.utcnow()
+    rows = [
+        (
+            execution_data["run_id"],
+            execution_data["pipeline_name"],
+            invocation_id,
+            node_name,
+            len(node_run_times),
+            execution_data.get("extract_time"),
+            execution_data.get("kedro_init_time"),
+            execution_data.get("kedro_run_time"),
+            node_run_time,
+            recorded_at,
+        )
+        for node_name, node_run_time in node_run_times.items()
+    ]
+    if rows:
+        session.create_dataframe(rows, schema=RUN_STATS_SCHEMA).write.mode(
+            "append"
+        ).save_as_table(table)
+
+
+def _last_runs_filter(table: str, pipeline_name: str, last_runs: int) -> str:
+    return f"""
+pipeline_name = '{pipeline_name}' and run_id in (
+    select run_id from {table}
+    where pipeline_name = '{pipeline_name}'
+    group by run_id
+    order by max(recorded_at) desc
+    limit {last_runs}
+)""".strip()
+
+
+def runs_breakdown(
+    session: Session, table: str, pipeline_name: str, last_runs: int = 10
+) -> List[Row]:
+    """Startup (archive extraction, Kedro initialization) and run times summed over the tasks
+    of the last runs of the pipeline"""
+    return session.sql(
+        f"""
+select run_id, min(recorded_at) as started_at, count(*) as tasks,
+    sum(extract_time) as extract_time, sum(kedro_init_time) as kedro_init_time,
+    sum(kedro_run_time) as kedro_run_time
+from (
+    select run_id, invocation_id, min(recorded_at) as recorded_at,
+        any_value(extract_time) as extract_time,
+        any_value(kedro_init_time) as kedro_init_time,
+        any_value(kedro_run_time) as kedro_run_time
+    from {table}
+    where {_last_runs_filter(table, pipeline_name, last_runs)}
+    group by run_id, invocation_id
+)
+group by run_id
+order by started_at desc;""".strip()
+    ).collect()
+
+
+def slowest_nodes(
+    session: Session, table: str, pipeline_name: str, last_runs: int = 10, top: int = 10
+) -> List[Row]:
+    """Nodes with the longest average run time across the last runs of the pipeline,
+    along with the average startup time of the tasks executing them"""
+    return session.sql(
+        f"""
+select node_name, count(*) as runs,
+    avg(extract_time) as avg_extract_time, avg(kedro_init_time) as avg_kedro_init_time,
+    avg(node_run_time) as avg_node_run_time, max(node_run_time) as max_node_run_time
+from {table}
+where {_last_runs_filter(table, pipeline_name, last_runs)}
+group by node_name
+order by avg_node_run_time desc
+limit {top};""".strip()
+    ).collect()
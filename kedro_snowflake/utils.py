@@ -1,11 +1,17 @@
+import hashlib
 import importlib
 import os
+import py_compile
+import re
 import shutil
+import stat
 import tarfile
+import tempfile
 import zipfile
+from collections import defaultdict
 from functools import cached_property
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 from uuid import uuid4
 
 import zstandard as zstd
@@ -16,6 +22,7 @@ from kedro.config import (
 )
 from kedro.framework.session import KedroSession
 from omegaconf import DictConfig, OmegaConf
+from tabulate import tabulate
 
 from kedro_snowflake.config import (
     KEDRO_SNOWFLAKE_CONFIG_KEY,
@@ -23,17 +30,111 @@ from kedro_snowflake.config import (
     KedroSnowflakeConfig,
 )
 
+# 1980-01-01 - the earliest timestamp that can be stored in a zip archive
+DETERMINISTIC_MTIME = 315532800
 
-def compress_folder_to_zip(path, zip_path, exclude=None):
+
+def _normalized_mode(mode: int, is_dir: bool) -> int:
+    return 0o755 if is_dir or mode & stat.S_IXUSR else 0o644
+
+
+def _write_to_zip_deterministically(zip_file: zipfile.ZipFile, path, arcname: str):
+    mode = os.stat(path).st_mode
+    is_dir = stat.S_ISDIR(mode)
+    info = zipfile.ZipInfo(
+        arcname.rstrip("/") + ("/" if is_dir else ""), date_time=(1980, 1, 1, 0, 0, 0)
+    )
+    info.create_system = 3  # unix, so that the permissions below are honoured
+    info.external_attr = (
+        (stat.S_IFDIR if is_dir else stat.S_IFREG) | _normalized_mode(mode, is_dir)
+    ) << 16
+    if is_dir:
+        info.external_attr |= 0x10  # MS-DOS directory flag
+        zip_file.writestr(info, b"")
+    else:
+        with open(path, "rb") as f:
+            zip_file.writestr(info, f.read(), compress_type=zip_file.compression)
+
+
+def _compile_to_unchecked_pyc(
+    source_path, arcname: str, output_dir: str
+) -> Optional[str]:
+    """Compiles the source into bytecode, returns path to the .pyc file or None
+    if the source cannot be compiled. Unchecked hash-based .pyc (PEP 552) is used,
+    as zipimport would reject timestamp-based ones after timestamps normalization."""
+    pyc_path = os.path.join(output_dir, uuid4().hex + ".pyc")
+    try:
+        py_compile.compile(
+            source_path,
+            cfile=pyc_path,
+            dfile=arcname,
+            doraise=True,
+            invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+        )
+    except py_compile.PyCompileError:
+        return None
+    return pyc_path
+
+
+def compress_folder_to_zip(
+    path,
+    zip_path,
+    exclude=None,
+    deterministic=False,
+    include_root=False,
+    compile_bytecode=False,
+):
+    """Compress a folder into zip archive.
+    In `deterministic` mode the entries are sorted and their timestamps / permissions normalized,
+    so that the same content always produces byte-identical archive.
+    With `include_root` the entries are prefixed with the folder name, so that the archive
+    can be put on sys.path (zipimport). `compile_bytecode` adds .pyc files, compiled by the current
+    interpreter, next to the sources - zipimport uses them only if the Python versions match.
+    """
     exclude = exclude or []
-    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED) as zip_file:
+    base = os.path.dirname(os.path.normpath(path)) if include_root else path
+    write = (
+        _write_to_zip_deterministically
+        if deterministic
+        else (lambda zip_file, *args: zip_file.write(*args))
+    )
+    with zipfile.ZipFile(
+        zip_path, "w", compression=zipfile.ZIP_STORED
+    ) as zip_file, tempfile.TemporaryDirectory() as bytecode_dir:
         for root, dirs, files in os.walk(path):
+            if deterministic:
+                dirs.sort()
+                files.sort()
             for file in files:
                 if not any(file.endswith(pattern) for pattern in exclude):
                     file_path = os.path.join(root, file)
-                    zip_file.write(file_path, arcname=os.path.relpath(file_path, path))
+                    arcname = os.path.relpath(file_path, base)
+                    write(zip_file, file_path, arcname)
+                    if (
+                        compile_bytecode
+                        and file.endswith(".py")
+                        and (
+                            pyc_path := _compile_to_unchecked_pyc(
+                                file_path, arcname, bytecode_dir
+                            )
+                        )
+                    ):
+                        write(zip_file, pyc_path, arcname + "c")
         # add the top-level folder to the archive
-        zip_file.write(path, arcname=os.path.basename(path))
+        write(zip_file, path, os.path.basename(os.path.normpath(path)))
+
+
+def is_zip_importable(path: Path) -> bool:
+    """Checks whether a module / package can be imported directly from a zip archive,
+    i.e. it's pure-Python and doesn't contain any data files (nor extension modules),
+    which are usually read from the filesystem."""
+    if path.is_file():
+        return path.suffix == ".py"
+    return all(
+        f.suffix in (".py", ".pyi", ".pyc") or f.name == "py.typed"
+        for f in path.rglob("*")
+        if f.is_file()
+    )
 
 
 def zstd_folder(
@@ -42,19 +143,44 @@ def zstd_folder(
     file_name: Optional[str] = None,
     level=5,
     exclude=None,
+    threads: int = 0,
+    include_fn: Optional[Callable[[str, bool], bool]] = None,
+    deterministic: bool = False,
 ) -> Path:
-    """Compress a folder using zstandard and return the path to the archive."""
+    """Compress a folder using zstandard and return the path to the archive.
+    `threads` is the number of zstd worker threads (0 - single-threaded, -1 - one per CPU core).
+    `include_fn` receives the path relative to the compressed folder and a flag whether it's
+    a directory, and decides whether it should be added to the archive.
+    In `deterministic` mode the same content always produces byte-identical archive:
+    timestamps, ownership and permissions are normalized and the multi-threaded zstd frame
+    is always used, as its output doesn't depend on the number of threads.
+    """
     tar_path = output_dir / (file_name or (uuid4().hex + ".tar.zst"))
-    with zstd.open(tar_path, "wb", cctx=zstd.ZstdCompressor(level=level)) as archive:
-        with tarfile.open(fileobj=archive, mode="w") as tar:
+    if deterministic and threads == 0:
+        threads = 1
+    cctx = zstd.ZstdCompressor(level=level, threads=threads, write_checksum=True)
+    with zstd.open(tar_path, "wb", cctx=cctx) as archive:
+        # tarfile adds the directory entries in sorted order
+        with tarfile.open(fileobj=archive, mode="w", format=tarfile.PAX_FORMAT) as tar:
 
             def filter_fn(tarinfo):
                 if any(
                     [tarinfo.name.endswith(excluded) for excluded in (exclude or [])]
                 ):
                     return None
-                else:
-                    return tarinfo
+                relative_path = tarinfo.name.partition("/")[2]
+                if (
+                    include_fn
+                    and relative_path
+                    and not include_fn(relative_path, tarinfo.isdir())
+                ):
+                    return None
+                if deterministic:
+                    tarinfo.mtime = DETERMINISTIC_MTIME
+                    tarinfo.uid = tarinfo.gid = 0
+                    tarinfo.uname = tarinfo.gname = ""
+                    tarinfo.mode = _normalized_mode(tarinfo.mode, tarinfo.isdir())
+                return tarinfo
 
             tar.add(
                 folder_to_compress, arcname=folder_to_compress.name, filter=filter_fn
@@ -62,7 +188,169 @@ def zstd_folder(
     return tar_path
 
 
-def zip_dependencies(dependencies: List[str], output_dir: Path):
+def _compile_ignore_pattern(pattern: str) -> Optional[Tuple[re.Pattern, bool, bool]]:
+    """Translates a single .gitignore-style pattern into a regex matching paths relative
+    to the directory the pattern comes from. Returns (regex, negated, directory_only)
+    or None for blank lines and comments.
+    """
+    pattern = pattern.rstrip()
+    if not pattern or pattern.startswith("#"):
+        return None
+    negated = pattern.startswith("!")
+    pattern = pattern[1:] if negated else pattern
+    directory_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+
+    regex, i = "", 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex, i = regex + "(?:.*/)?", i + 3
+        elif pattern.startswith("**", i):
+            regex, i = regex + ".*", i + 2
+        elif pattern[i] == "*":
+            regex, i = regex + "[^/]*", i + 1
+        elif pattern[i] == "?":
+            regex, i = regex + "[^/]", i + 1
+        elif pattern[i] == "[" and (end := pattern.find("]", i + 1)) > i:
+            regex, i = (
+                regex + "[" + pattern[i + 1 : end].replace("!", "^", 1) + "]",
+                end + 1,
+            )
+        else:
+            regex, i = regex + re.escape(pattern[i]), i + 1
+    prefix = "^" if anchored else "^(?:.*/)?"
+    return re.compile(prefix + regex + "$"), negated, directory_only
+
+
+class ProjectFilesFilter:
+    """Decides which files of the Kedro project go into the project archive.
+    Paths ignored by .gitignore files (root and nested ones) or matching any of the `exclude`
+    patterns are skipped, unless they match one of the `include` patterns.
+    Patterns use the .gitignore syntax and are relative to the project root.
+    Sizes of the accepted files are collected for the `size_report`.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        include: Iterable[str] = (),
+        exclude: Iterable[str] = (),
+        respect_gitignore: bool = True,
+    ):
+        self.root = root
+        self.respect_gitignore = respect_gitignore
+        self.include = [r for p in include if (r := _compile_ignore_pattern(p))]
+        self.exclude = [r for p in exclude if (r := _compile_ignore_pattern(p))]
+        self.include_prefixes = [
+            re.split(r"[*?\[]", p.strip("/"))[0] if "/" in p.rstrip("/") else ""
+            for p in include
+            if _compile_ignore_pattern(p)
+        ]
+        self._gitignore_rules: List[Tuple[str, Tuple[re.Pattern, bool, bool]]] = []
+        self._excluded_dirs = set()
+        self.sizes: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        self._load_gitignore("")
+
+    def _load_gitignore(self, relative_dir: str):
+        gitignore = self.root / relative_dir / ".gitignore"
+        if self.respect_gitignore and gitignore.is_file():
+            base = f"{relative_dir}/" if relative_dir else ""
+            self._gitignore_rules.extend(
+                (base, rule)
+                for line in gitignore.read_text().splitlines()
+                if (rule := _compile_ignore_pattern(line))
+            )
+
+    @staticmethod
+    def _matches(rules, path: str, is_dir: bool) -> Optional[bool]:
+        result = None
+        for regex, negated, directory_only in rules:
+            if (is_dir or not directory_only) and regex.match(path):
+                result = not negated
+        return result
+
+    def _is_excluded(self, path: str, is_dir: bool) -> bool:
+        if path.split("/")[0] == ".git" or self._matches(self.exclude, path, is_dir):
+            return True
+        ignored = False
+        for base, (regex, negated, directory_only) in self._gitignore_rules:
+            if (
+                path.startswith(base)
+                and (is_dir or not directory_only)
+                and regex.match(path[len(base) :])
+            ):
+                ignored = not negated
+        return ignored
+
+    def _may_contain_included(self, directory: str) -> bool:
+        return any(
+            not prefix
+            or prefix.startswith(f"{directory}/")
+            or f"{directory}/".startswith(prefix)
+            for prefix in self.include_prefixes
+        )
+
+    def __call__(self, path: str, is_dir: bool) -> bool:
+        parent = path.rpartition("/")[0]
+        excluded = parent in self._excluded_dirs or self._is_excluded(path, is_dir)
+        if excluded and self._matches(self.include, path, is_dir):
+            excluded = False
+
+        if is_dir:
+            if excluded:
+                if not self._may_contain_included(path):
+                    return False
+                self._excluded_dirs.add(path)
+            else:
+                self._load_gitignore(path)
+            return True
+
+        if not excluded:
+            top_level = path.split("/")[0] + ("/" if "/" in path else "")
+            self.sizes[top_level][0] += 1
+            self.sizes[top_level][1] += (self.root / path).lstat().st_size
+        return not excluded
+
+    def size_report(self, archive_size: Optional[int] = None) -> str:
+        rows = [
+            (path, files, format_size(size))
+            for path, (files, size) in sorted(
+                self.sizes.items(), key=lambda item: item[1][1], reverse=True
+            )
+        ]
+        rows.append(
+            (
+                "TOTAL",
+                sum(files for files, _ in self.sizes.values()),
+                format_size(sum(size for _, size in self.sizes.values())),
+            )
+        )
+        if archive_size is not None:
+            rows.append(("ARCHIVE (compressed)", "", format_size(archive_size)))
+        return tabulate(
+            rows,
+            headers=("Path", "Files", "Size"),
+            tablefmt="psql",
+            colalign=("left", "right", "right"),
+        )
+
+
+def format_size(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024 or unit == "GB":
+            break
+        size /= 1024
+    return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+
+
+def zip_dependencies(
+    dependencies: List[str],
+    output_dir: Path,
+    deterministic: bool = False,
+    compile_bytecode: bool = False,
+):
     assert output_dir.is_dir(), f"{output_dir} is not a directory"
 
     results = {dependency: get_module_path(dependency) for dependency in dependencies}
@@ -71,12 +359,35 @@ def zip_dependencies(dependencies: List[str], output_dir: Path):
     for dependency, path in results.items():
         if path.is_dir():
             compress_folder_to_zip(
-                path, output_dir / f"{dependency}.zip", [".pyc", "__pycache__"]
+                path,
+                output_dir / f"{dependency}.zip",
+                [".pyc", "__pycache__"],
+                deterministic=deterministic,
+                include_root=True,
+                compile_bytecode=compile_bytecode,
             )
         else:
             shutil.copyfile(path, output_dir / path.name)
 
 
+def hash_file(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """Return the sha256 hex digest of the file content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def dynamic_load_class(load_class: str):
+    module_name, class_name = load_class.rsplit(".", 1)
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def dynamic_init_class(load_class: str, *args, **kwargs):
+    return dynamic_load_class(load_class)(*args, **kwargs)
+
+
 def get_module_path(module_name) -> Path:
     module = importlib.import_module(module_name)
     try:
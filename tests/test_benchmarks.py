@@ -0,0 +1,33 @@
+import json
+
+from benchmarks.run import compare, main
+
+
+def test_compare_detects_regressions():
+    baseline = {"generator_s": 1.0, "tiny_s": 0.01, "save_mb_s": 100.0, "gone_s": 1.0}
+    results = {"generator_s": 1.5, "tiny_s": 0.03, "save_mb_s": 60.0}
+    regressions = compare(results, baseline, threshold=0.3, min_delta_s=0.05)
+    assert [r.split(":")[0] for r in regressions] == ["generator_s", "save_mb_s"]
+    assert compare(results, results, threshold=0.3) == []
+
+
+def test_benchmarks_run_offline(tmp_path):
+    args = [
+        "--output",
+        str(tmp_path / "results.json"),
+        "--baseline",
+        str(tmp_path / "baseline.json"),
+        "--repeats",
+        "1",
+        "--pipeline-sizes",
+        "50",
+        "--packages",
+        "toposort",
+        "--dataset-size-mb",
+        "1",
+    ]
+    assert main(args + ["--update-baseline"]) == 0
+    results = json.loads((tmp_path / "results.json").read_text())
+    assert "generator_tasks_sql_50_nodes_s" in results
+    assert "pickle_dataset_load_numpy_1mb_mb_s" in results
+    assert main(args + ["--threshold", "1000", "--min-delta-s", "10"]) == 0
@@ -5,6 +5,8 @@ from uuid import uuid4
 
 import yaml
 from click.testing import CliRunner
+from kedro.pipeline import node, pipeline
+from snowflake.snowpark import Row
 
 from kedro_snowflake import cli
 from kedro_snowflake.config import KedroSnowflakeConfig
@@ -146,3 +148,41 @@ def test_can_run_pipeline(
             and output_path.lstat().st_size > 100
             and output_path.read_text()
         ), f"{output_path.absolute()} is not a valid file"
+
+
+@patch("kedro_snowflake.cli.Session")
+def test_can_show_run_stats(snowpark_session, patched_kedro_package, cli_context):
+    sql = snowpark_session.builder.configs().create().sql
+    sql().collect.side_effect = [
+        [Row(RUN_ID="run-1", TASKS=3, EXTRACT_TIME=1.5, KEDRO_RUN_TIME=20.0)],
+        [Row(NODE_NAME="train_model", RUNS=1, AVG_NODE_RUN_TIME=12.0)],
+    ]
+    runner = CliRunner()
+    with patch.dict(os.environ, {"SNOWFLAKE_PASSWORD": "test_password"}, clear=False):
+        result = runner.invoke(cli.stats, ["--top", "5"], obj=cli_context)
+    assert result.exit_code == 0, result.output
+    assert "run-1" in result.output and "train_model" in result.output
+    assert "limit 5;" in sql.call_args.args[0]
+
+
+def test_can_run_pipeline_locally(
+    patched_kedro_package, cli_context, tmp_path: Path, dummy_pipeline
+):
+    output_path = tmp_path / "pipeline.sql"
+    local_pipeline = pipeline([node(lambda: 42, None, "input_data", name="start")]) + (
+        dummy_pipeline
+    )
+    runner = CliRunner()
+    with patch.dict(
+        "kedro.framework.project.pipelines", {"__default__": local_pipeline}
+    ), patch("snowflake.snowpark.session.Session") as snowpark_session:
+        result = runner.invoke(
+            cli.run,
+            ["--local", "--local-workers", "2", "-o", str(output_path)],
+            obj=cli_context,
+        )
+    assert result.exit_code == 0, result.output
+    assert "KEDRO_DEFAULT_NODE3: SUCCEEDED" in result.output
+    assert "Expected speedup" in result.output
+    assert "ARRAY_CONSTRUCT('node3')" in output_path.read_text()
+    snowpark_session.builder.configs.assert_not_called()
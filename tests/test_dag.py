@@ -0,0 +1,193 @@
+import random
+import re
+
+import pytest
+from kedro.pipeline import node, pipeline
+
+from kedro_snowflake.config import TaskGraphLimitsConfig
+from kedro_snowflake.dag import (
+    TaskGraphPartitioner,
+    critical_path,
+    transitive_reduction,
+)
+from kedro_snowflake.generator import SnowflakePipelineGenerator
+from kedro_snowflake.grouping import Grouping, IdentityNodeGrouper
+from tests.utils import identity
+
+
+def _random_grouping(size: int, max_dependencies: int, seed: int = 42) -> Grouping:
+    rnd = random.Random(seed)
+    names = [f"n{i:04d}" for i in range(size)]
+    return Grouping(
+        {n: [] for n in names},
+        {
+            n: set(rnd.sample(names[:i], min(i, rnd.randint(0, max_dependencies))))
+            for i, n in enumerate(names)
+        },
+    )
+
+
+def _reachable(dependencies, task):
+    seen, stack = set(), list(dependencies[task])
+    while stack:
+        t = stack.pop()
+        if t not in seen:
+            seen.add(t)
+            stack.extend(dependencies[t])
+    return seen
+
+
+@pytest.mark.parametrize(
+    "limits,size,max_dependencies",
+    [
+        (TaskGraphLimitsConfig(), 250, 3),
+        (TaskGraphLimitsConfig(), 90, 89),
+        (TaskGraphLimitsConfig(max_tasks_per_graph=40), 300, 40),
+        (
+            TaskGraphLimitsConfig(
+                max_tasks_per_graph=30, max_predecessors=4, max_child_tasks=5
+            ),
+            120,
+            12,
+        ),
+    ],
+)
+def test_partitioned_graphs_are_within_limits(limits, size, max_dependencies):
+    grouping = _random_grouping(size, max_dependencies)
+    graphs = TaskGraphPartitioner(limits).partition(grouping)
+
+    graph_of = {}
+    for index, graph in enumerate(graphs):
+        assert (graph.link is None) == (index == len(graphs) - 1)
+        assert graph.tasks_count <= limits.max_tasks_per_graph
+        root_children = [
+            t
+            for t in graph.dependencies
+            if t not in graph.barriers and t not in graph.run_id_sources
+        ]
+        for task, relay in graph.run_id_sources.items():
+            assert relay in graph.relays and relay in graph.dependencies[task]
+        assert len(root_children) <= limits.max_child_tasks
+        for task, predecessors in graph.dependencies.items():
+            children = [c for c, deps in graph.dependencies.items() if task in deps]
+            assert len(children) <= limits.max_child_tasks
+            assert len(predecessors) + (task in root_children) <= (
+                limits.max_predecessors
+            )
+        graph_of.update({g: index for g in graph.groups})
+
+    assert sorted(graph_of) == sorted(grouping.groups)
+    for group, dependencies in grouping.dependencies.items():
+        graph = graphs[graph_of[group]]
+        for dependency in dependencies:
+            assert graph_of[dependency] < graph_of[group] or dependency in _reachable(
+                graph.dependencies, group
+            )
+
+
+def test_small_pipelines_are_not_split(dummy_pipeline):
+    graphs = TaskGraphPartitioner(TaskGraphLimitsConfig()).partition(
+        IdentityNodeGrouper().group(dummy_pipeline)
+    )
+    assert len(graphs) == 1
+    assert graphs[0].barriers == set() and graphs[0].link is None
+    assert graphs[0].ordered_task_names() == ["node1", "node2", "node3"]
+
+
+def test_generator_chains_task_graphs(
+    patched_snowflake_pipeline_generator: SnowflakePipelineGenerator,
+):
+    g = patched_snowflake_pipeline_generator
+    g.config.snowflake.runtime.task_graph_limits = TaskGraphLimitsConfig(
+        max_tasks_per_graph=4, max_predecessors=3, max_child_tasks=3
+    )
+    wide_pipeline = pipeline(
+        [node(identity, "input_data", f"out{i}", name=f"n{i}") for i in range(5)]
+    )
+    g.mlflow_enabled = False
+    sql = g._generate_snowflake_tasks_sql(wide_pipeline)
+    link_tasks = [s for s in sql if "KEDRO_TEST_PIPELINE_LINK(" in s]
+    assert len(link_tasks) == 2
+    assert "'KEDRO_TEST_PIPELINE_START_TASK_1'" in link_tasks[0]
+    assert "'KEDRO_TEST_PIPELINE_START_TASK_2'" in link_tasks[1]
+    assert any("call KEDRO_TEST_PIPELINE_CONTINUE(" in s for s in sql)
+
+    g.mlflow_enabled = True
+    with pytest.raises(ValueError):
+        g._generate_snowflake_tasks_sql(wide_pipeline)
+
+
+def test_wide_pipelines_fan_out_through_relays():
+    grouping = _random_grouping(250, 0)
+    graphs = TaskGraphPartitioner(TaskGraphLimitsConfig()).partition(grouping)
+
+    assert len(graphs) == 1
+    graph = graphs[0]
+    assert len(graph.relays) == 3
+    assert set(graph.run_id_sources) == set(grouping.groups)
+    # all the node tasks can start at once
+    assert all(graph.dependencies[g] == {graph.run_id_sources[g]} for g in graph.groups)
+
+
+@pytest.mark.parametrize("mlflow_enabled", [False, True])
+def test_generator_forwards_run_id_through_relays(
+    mlflow_enabled, patched_snowflake_pipeline_generator: SnowflakePipelineGenerator
+):
+    g = patched_snowflake_pipeline_generator
+    g.mlflow_enabled = mlflow_enabled
+    g.config.snowflake.runtime.task_graph_limits = TaskGraphLimitsConfig(
+        max_child_tasks=3
+    )
+    wide_pipeline = pipeline(
+        [node(identity, "input_data", f"out{i}", name=f"n{i}") for i in range(5)]
+    )
+    sql = g._generate_snowflake_tasks_sql(wide_pipeline)
+
+    assert not any("KEDRO_TEST_PIPELINE_LINK(" in s for s in sql)
+    relays = [s for s in sql if "call system$set_return_value(" in s]
+    source = g._mlflow_root_task_name if mlflow_enabled else g._root_task_name
+    assert len(relays) == 2
+    assert all(f"get_predecessor_return_value('{source}')" in s for s in relays)
+    for i in range(5):
+        task = next(s for s in sql if f"ARRAY_CONSTRUCT('n{i}')" in s)
+        relay = re.search(r"\nafter (\w+)\n", task).group(1)
+        assert "__relay_0_" in relay
+        assert f"get_predecessor_return_value('{relay}')" in task
+
+
+def test_transitive_reduction():
+    dependencies = {"a": set(), "b": {"a"}, "c": {"a", "b"}, "d": {"a", "b", "c"}}
+    assert transitive_reduction(dependencies) == {
+        "a": set(),
+        "b": {"a"},
+        "c": {"b"},
+        "d": {"c"},
+    }
+
+
+@pytest.mark.parametrize(
+    "durations,expected_path,expected_total",
+    [
+        ({}, ["a", "b", "d"], 3.0),
+        ({"c": 10.0}, ["a", "c", "d"], 12.0),
+    ],
+)
+def test_critical_path(durations, expected_path, expected_total):
+    dependencies = {"a": set(), "b": {"a"}, "c": {"a"}, "d": {"b", "c"}}
+    assert critical_path(dependencies, durations) == (expected_path, expected_total)
+
+
+def test_generator_skips_transitive_dependencies(
+    patched_snowflake_pipeline_generator: SnowflakePipelineGenerator,
+):
+    p = pipeline(
+        [
+            node(identity, "input_data", "a", name="first"),
+            node(identity, "a", "b", name="second"),
+            node(lambda a, b: a, ["a", "b"], "output_data", name="third"),
+        ]
+    )
+    sql = patched_snowflake_pipeline_generator._generate_snowflake_tasks_sql(p)
+    third = next(s for s in sql if "ARRAY_CONSTRUCT('third')" in s)
+    assert "kedro_test_pipeline_second" in third
+    assert "kedro_test_pipeline_first" not in third
@@ -1,14 +1,31 @@
+import json
+import mmap
 from unittest.mock import MagicMock, Mock, patch
 from uuid import uuid4
 
+import numpy as np
 import pandas as pd
 import pytest
+import zstandard as zstd
 from kedro.io import DataSetError
 from omegaconf import DictConfig
 from snowflake.snowpark import DataFrame as SnowParkDataFrame
+from snowflake.snowpark.exceptions import SnowparkSessionException
 
-from kedro_snowflake.datasets.internal import SnowflakeRunnerDataSet
-from kedro_snowflake.datasets.native import SnowflakeStageFileDataSet
+from kedro_snowflake.datasets.internal import (
+    SnowflakeRunnerDataSet,
+    SnowflakeStagePickleDataSet,
+)
+from kedro_snowflake.datasets.native import (
+    SESSION_PROBE_INTERVAL,
+    SnowflakeStageFileDataSet,
+)
+from kedro_snowflake.datasets.serializers import (
+    SERIALIZERS,
+    Serializer,
+    SerializerRegistry,
+)
+from kedro_snowflake.local import LocalSession
 
 
 @pytest.mark.parametrize(
@@ -110,3 +127,249 @@ def test_runner_dataset_auto_switch_based_on_data_type(data_to_save):
             data.withColumn().write.save_as_table.assert_called_once()
         else:
             session.file.put_stream.assert_called_once()
+
+
+def test_stage_datasets_share_cached_session():
+    sessions = [MagicMock(), MagicMock()]
+    connection_parameters = {"account": uuid4().hex, "database": "db", "schema": "s"}
+    with patch(
+        "snowflake.snowpark.context.get_active_session",
+        side_effect=SnowparkSessionException("No session"),
+    ), patch("snowflake.snowpark.Session.builder") as builder:
+        builder.configs.return_value.create.side_effect = sessions
+        for session in sessions:
+            session._conn.is_closed.return_value = False
+        datasets = [
+            SnowflakeStageFileDataSet(
+                "@TEST_STAGE",
+                f"file_{i}.txt",
+                "text.TextDataSet",
+                credentials=dict(connection_parameters),
+            )
+            for i in range(10)
+        ]
+        assert all(ds._snowflake_session is sessions[0] for ds in datasets)
+
+        sessions[0]._conn.is_closed.return_value = True
+        assert all(ds._snowflake_session is sessions[1] for ds in datasets)
+        assert builder.configs.return_value.create.call_count == 2
+
+
+def test_stage_datasets_replace_expired_cached_session():
+    sessions = [MagicMock(), MagicMock()]
+    connection_parameters = {"account": uuid4().hex, "database": "db", "schema": "s"}
+    clock = [1000.0]
+    with patch(
+        "snowflake.snowpark.context.get_active_session",
+        side_effect=SnowparkSessionException("No session"),
+    ), patch("snowflake.snowpark.Session.builder") as builder, patch(
+        "kedro_snowflake.datasets.native.monotonic", side_effect=lambda: clock[0]
+    ):
+        builder.configs.return_value.create.side_effect = sessions
+        for session in sessions:
+            session._conn.is_closed.return_value = False
+        ds = SnowflakeStageFileDataSet(
+            "@TEST_STAGE",
+            "file.txt",
+            "text.TextDataSet",
+            credentials=dict(connection_parameters),
+        )
+        assert ds._snowflake_session is sessions[0]
+        clock[0] += SESSION_PROBE_INTERVAL / 2
+        assert ds._snowflake_session is sessions[0]
+        # recently used sessions are not probed
+        sessions[0].sql.assert_not_called()
+
+        clock[0] += SESSION_PROBE_INTERVAL + 1
+        assert ds._snowflake_session is sessions[0]
+        sessions[0].sql.assert_called_once_with("select 1")
+
+        # the connection looks open, but the session token has expired
+        sessions[0].sql.return_value.collect.side_effect = SnowparkSessionException(
+            "Authentication token has expired"
+        )
+        clock[0] += SESSION_PROBE_INTERVAL + 1
+        assert ds._snowflake_session is sessions[1]
+        sessions[0].close.assert_called_once()
+        assert builder.configs.return_value.create.call_count == 2
+
+
+def test_stage_pickle_dataset_streams_data_in_parts(tmp_path):
+    data = np.random.default_rng(42).random(200_000)  # ~1.6 MB, hardly compressible
+    with LocalSession(tmp_path) as session:
+        ds = SnowflakeStagePickleDataSet(
+            "array", "@TEMP_STAGE", "run-1", session, part_size=64 * 1024
+        )
+        ds.save(data)
+        parts = session.sql("LS @TEMP_STAGE").collect()
+        assert len(parts) > 4
+        # parts grow by at most a single block of the compressor output
+        assert all(
+            part[1] < 64 * 1024 + zstd.COMPRESSION_RECOMMENDED_OUTPUT_SIZE
+            for part in parts
+        )
+        np.testing.assert_array_equal(ds.load(), data)
+
+        ds.save("small")
+        assert len(session.sql("LS @TEMP_STAGE").collect()) == 1
+        assert ds.load() == "small"
+
+
+@pytest.mark.parametrize("out_of_band_buffers", [False, True])
+def test_stage_pickle_dataset_supports_json_run_ids(out_of_band_buffers, tmp_path):
+    # with MLflow enabled, the run id is the MLflow config
+    run_id = json.dumps(
+        {"mlflow_run_id": "abc", "run_name": "it's a \\ {test}", "experiment": "e 1"}
+    )
+    data = np.arange(1_000_000)
+    with LocalSession(tmp_path) as session:
+        ds = SnowflakeStagePickleDataSet(
+            "array",
+            "@TEMP_STAGE",
+            run_id,
+            session,
+            out_of_band_buffers=out_of_band_buffers,
+        )
+        ds.save(data)
+        ds.save(data)
+        np.testing.assert_array_equal(ds.load(), data)
+        assert len(ds.stored_files()["pkl"]) == 1 + out_of_band_buffers
+        assert any(
+            sql.startswith("REMOVE '@TEMP_STAGE/kedro-snowflake-storage/{")
+            for sql in session.executed_sql
+        )
+
+
+@pytest.mark.parametrize(
+    "data,expected_format",
+    [
+        (pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]}), "parquet"),
+        (np.arange(12, dtype="float32").reshape(3, 4), "npy"),
+        (np.array(["a", None], dtype=object), "pkl"),
+        ({"a": 1}, "pkl"),
+        (pd.DataFrame({"a": ["x", None], "b": [1.5, np.nan]}), "parquet"),
+        (pd.DataFrame({1: [1, 2], 2: [3, 4]}), "pkl"),
+        # would not round-trip through Arrow
+        (pd.DataFrame({"a": [[1, 2], [3]], "b": [{"x": 1}, {"y": "z"}]}), "pkl"),
+        (pd.DataFrame({"a": ["x", np.nan]}), "pkl"),
+        (pd.DataFrame({"a": [1, 2]}, index=[("x", 1), ("y", 2)]), "pkl"),
+        # not supported by Arrow, falls back to cloudpickle
+        (pd.DataFrame({"a": [1, "x"]}), "pkl"),
+    ],
+)
+def test_runner_dataset_stores_data_in_format_of_its_type(
+    data, expected_format, tmp_path
+):
+    with LocalSession(tmp_path) as session:
+        ds = SnowflakeRunnerDataSet("ds.v1", "@TEMP_STAGE", "run-1", session, "run_id")
+        ds.save(pd.DataFrame({"other": [1.0]}))
+        ds.save(data)
+        staged = [r[0] for r in session.sql("LS @TEMP_STAGE").collect()]
+        assert staged == [
+            f"temp_stage/kedro-snowflake-storage/run-1/ds.v1.{expected_format}.part00000"
+        ]
+        loaded = ds.load()
+
+    if isinstance(data, pd.DataFrame):
+        pd.testing.assert_frame_equal(loaded, data)
+        # exact round trip, e.g. lists not loaded as arrays or NaNs as None
+        pd.testing.assert_frame_equal(
+            loaded.astype(object).apply(lambda c: c.map(type)),
+            data.astype(object).apply(lambda c: c.map(type)),
+        )
+    elif isinstance(data, np.ndarray):
+        np.testing.assert_array_equal(loaded, data)
+        assert loaded.dtype == data.dtype
+    else:
+        assert loaded == data
+
+
+def test_runner_dataset_uses_registered_serializers(tmp_path):
+    class TextSerializer(Serializer):
+        format = "txt"
+        compressed = False
+
+        def accepts(self, data):
+            return isinstance(data, str)
+
+        def dump(self, data, stream):
+            stream.write(data.encode())
+
+        def load(self, stream):
+            return stream.read().decode()
+
+    registry = SerializerRegistry(list(SERIALIZERS.serializers), SERIALIZERS.fallback)
+    registry.register(TextSerializer())
+    with LocalSession(tmp_path) as session:
+        ds = SnowflakeRunnerDataSet(
+            "text", "@TEMP_STAGE", "run-1", session, "run_id", serializers=registry
+        )
+        ds.save("some text")
+        assert (
+            session.file.get_stream(
+                "@TEMP_STAGE/kedro-snowflake-storage/run-1/text.txt.part00000"
+            ).read()
+            == b"some text"
+        )
+        assert ds.load() == "some text"
+
+        other = SnowflakeRunnerDataSet(
+            "text", "@TEMP_STAGE", "run-1", session, "run_id"
+        )
+        with pytest.raises(DataSetError, match="No serializer registered for the txt"):
+            other.load()
+
+
+def test_stage_pickle_dataset_memory_maps_out_of_band_buffers(tmp_path):
+    rng = np.random.default_rng(42)
+    data = {
+        "array": rng.random(100_000),
+        "df": pd.DataFrame({"a": rng.random(50_000), "b": np.arange(50_000)}),
+        "small": np.arange(10),
+    }
+    with LocalSession(tmp_path / "stages") as session:
+        ds = SnowflakeStagePickleDataSet(
+            "data",
+            "@TEMP_STAGE",
+            "run-1",
+            session,
+            out_of_band_buffers=True,
+            min_buffer_size=100_000,
+        )
+        ds.save(data)
+        files = [
+            r[0].rsplit("/", 1)[-1] for r in session.sql("LS @TEMP_STAGE").collect()
+        ]
+        assert files == [
+            "data.pkl.buffer00000",
+            "data.pkl.buffer00001",
+            "data.pkl.buffer00002",
+            "data.pkl.part00000",
+        ]
+        loaded = ds.load()
+
+        np.testing.assert_array_equal(loaded["array"], data["array"])
+        np.testing.assert_array_equal(loaded["small"], data["small"])
+        pd.testing.assert_frame_equal(loaded["df"], data["df"])
+        base = loaded["array"]
+        while isinstance(base, np.ndarray):
+            base = base.base
+        assert isinstance(base.obj, mmap.mmap)
+        # copy-on-write mapping, the stored data stays intact
+        loaded["array"][:] = 0
+        np.testing.assert_array_equal(ds.load()["array"], data["array"])
+
+        ds.out_of_band_buffers = False
+        ds.save(data)
+        assert len(session.sql("LS @TEMP_STAGE").collect()) == 1
+        np.testing.assert_array_equal(ds.load()["array"], data["array"])
+
+    with pytest.raises(ValueError, match="only by the cloudpickle serializer"):
+        SnowflakeStagePickleDataSet(
+            "data",
+            "@TEMP_STAGE",
+            "run-1",
+            MagicMock(),
+            serializer=SERIALIZERS.for_format("npy"),
+            out_of_band_buffers=True,
+        )
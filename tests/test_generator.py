@@ -1,12 +1,29 @@
+import asyncio
 import json
-from unittest.mock import patch
-from uuid import UUID
+import os
+import re
+import time
+from io import BytesIO
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+from uuid import UUID, uuid4
 
+import pytest
+import zstandard as zstd
+from kedro.pipeline import node, pipeline
 from snowflake.snowpark import Session
 
+from kedro_snowflake.config import (
+    PackagingConfig,
+    ServerlessConfig,
+    WarehouseMappingConfig,
+)
 from kedro_snowflake.generator import SnowflakePipelineGenerator
+from kedro_snowflake.grouping import LinearChainNodeGrouper
+from kedro_snowflake.local import LocalSession
 from kedro_snowflake.pipeline import KedroSnowflakePipeline
-from tests.utils import get_arg_type
+from kedro_snowflake.utils import hash_file, zstd_folder
+from tests.utils import get_arg_type, identity
 
 
 def test_can_generate_pipeline(
@@ -35,6 +52,77 @@ def test_generate_calls_sproc(
     ), "Stored procedure number of calls doesn't match"
 
 
+def test_generate_async_submits_stage_statements_without_blocking(
+    patched_snowflake_pipeline_generator: SnowflakePipelineGenerator,
+):
+    g = patched_snowflake_pipeline_generator
+    session = g.snowflake_session
+    ks_pipeline = asyncio.run(g.generate_async())
+
+    assert isinstance(ks_pipeline, KedroSnowflakePipeline)
+    stage_statements = [
+        c.args[0] for c in session.sql.call_args_list if " stage " in c.args[0]
+    ]
+    assert stage_statements == g._stages_sql()
+    assert session.sql.return_value.collect_nowait.call_count >= len(stage_statements)
+    assert session.sproc.register.call_count == 2
+
+
+def test_concurrent_deployments_keep_each_others_manifest_entries(
+    patched_snowflake_pipeline_generator: SnowflakePipelineGenerator,
+    dummy_pipeline,
+    tmp_path: Path,
+):
+    names = [f"pipeline_{i}" for i in range(4)]
+    generators = [
+        SnowflakePipelineGenerator(
+            name,
+            "test_env",
+            patched_snowflake_pipeline_generator.config,
+            patched_snowflake_pipeline_generator.connection_parameters,
+            {},
+            None,
+            None,
+        )
+        for name in names
+    ]
+
+    def package_project(self, project_files_dir):
+        (project_files_dir / f"{self.pipeline_name}.tar.zst").write_text(
+            self.pipeline_name
+        )
+
+    def slow_put(*args, **kwargs):
+        time.sleep(0.05)  # lets the other deployments interleave
+        return put(*args, **kwargs)
+
+    with LocalSession(tmp_path / "snowflake") as session, patch.dict(
+        "kedro.framework.project.pipelines", {n: dummy_pipeline for n in names}
+    ), patch.object(SnowflakePipelineGenerator, "_package_dependencies"), patch.object(
+        SnowflakePipelineGenerator, "_package_kedro_project", package_project
+    ), patch(
+        "kedro_snowflake.generator.sproc"
+    ):
+        put = session.file.put
+        session.file.put = slow_put
+        for g in generators:
+            g.__dict__["snowflake_session"] = session
+
+        async def deploy_all():
+            return await asyncio.gather(*(g.generate_async() for g in generators))
+
+        assert all(
+            isinstance(p, KedroSnowflakePipeline) for p in asyncio.run(deploy_all())
+        )
+        manifest = generators[0]._read_stage_manifest(
+            patched_snowflake_pipeline_generator.config.snowflake.runtime.stage
+        )
+        assert sorted(manifest["pipelines"]) == names
+        assert sorted(manifest["artifacts"]) == sorted(
+            f"project/{n}.tar.zst" for n in names
+        )
+
+
 def test_kedro_run_sproc_is_valid(
     patched_snowflake_pipeline_generator: SnowflakePipelineGenerator,
 ):
@@ -59,6 +147,113 @@ def test_kedro_run_sproc_is_valid(
         # check if first argument of `fn` is of type Session
 
 
+@pytest.mark.parametrize(
+    "packaging,archives_count,expected",
+    [
+        (PackagingConfig(), 8, (8, 1)),
+        (PackagingConfig(), 3, (3, 2)),
+        (PackagingConfig(), 1, (1, -1)),
+        (PackagingConfig(max_workers=2), 8, (2, 4)),
+        (PackagingConfig(compression_threads=3), 4, (4, 3)),
+        (PackagingConfig(compression_threads=0), 4, (4, 0)),
+    ],
+)
+def test_parallel_packaging_does_not_oversubscribe_cpu(
+    packaging, archives_count, expected
+):
+    with patch("kedro_snowflake.generator.os.cpu_count", return_value=8):
+        assert (
+            SnowflakePipelineGenerator._packaging_parallelism(packaging, archives_count)
+            == expected
+        )
+
+
+def test_kedro_run_sproc_reuses_extracted_archives(
+    patched_snowflake_pipeline_generator: SnowflakePipelineGenerator,
+    tmp_path: Path,
+):
+    g = patched_snowflake_pipeline_generator
+    g.EXTRACTION_CACHE_DIR = str(tmp_path / "cache")
+    (source := tmp_path / "dummy_dependency").mkdir()
+    (source / "__init__.py").write_text("")
+    archive = zstd_folder(source, tmp_path, "dummy_dependency.tar.zst")
+    session = g.snowflake_session
+    session.file.get_stream.side_effect = lambda _: archive.open("rb")
+
+    g._construct_kedro_snowflake_sproc(
+        imports=[],
+        packages=[],
+        stage_location="@TEST_STAGE",
+        temp_data_stage="@TEST_TEMP_STAGE",
+        project_archives={archive.name: uuid4().hex},
+    )
+    with patch("kedro.framework.session"), patch(
+        "kedro.framework.startup.bootstrap_project"
+    ), patch("os.chdir"):
+        fn = session.method_calls[0].args[0]
+        results = [
+            json.loads(fn(session, "env", "run-id-123", "default", ["node1"], ""))
+            for _ in range(2)
+        ]
+
+    assert [r["extract_cache_hit"] for r in results] == [False, True]
+    assert results[0]["extract_cache_misses"] == [archive.name]
+    session.file.get_stream.assert_called_once_with(
+        f"@TEST_STAGE/project/{archive.name}"
+    )
+
+
+def test_kedro_run_sproc_cleans_up_extraction_cache(
+    patched_snowflake_pipeline_generator: SnowflakePipelineGenerator,
+    tmp_path: Path,
+):
+    g = patched_snowflake_pipeline_generator
+    g.EXTRACTION_CACHE_DIR = str(tmp_path / "cache")
+    (source := tmp_path / "dummy_dependency").mkdir()
+    (source / "__init__.py").write_text("")
+    archive = zstd_folder(source, tmp_path, "dummy_dependency.tar.zst")
+    session = g.snowflake_session
+
+    def run(archive_hash):
+        session.method_calls.clear()
+        g._construct_kedro_snowflake_sproc(
+            imports=[],
+            packages=[],
+            stage_location="@TEST_STAGE",
+            temp_data_stage="@TEST_TEMP_STAGE",
+            project_archives={archive.name: archive_hash},
+        )
+        with patch("kedro.framework.session"), patch(
+            "kedro.framework.startup.bootstrap_project"
+        ), patch("os.chdir"):
+            fn = session.method_calls[0].args[0]
+            return fn(session, "env", "run-id-123", "default", ["node1"], "")
+
+    (other_stage_dir := tmp_path / "cache" / "other_stage" / "old_hash").mkdir(
+        parents=True
+    )
+    session.file.get_stream.side_effect = lambda _: BytesIO(b"truncated archive")
+    with pytest.raises(zstd.ZstdError):
+        run("broken_hash")
+    (cache_root,) = [
+        d for d in (tmp_path / "cache").iterdir() if d.name != "other_stage"
+    ]
+    assert list(cache_root.iterdir()) == []
+
+    session.file.get_stream.side_effect = lambda _: archive.open("rb")
+    run("old_hash")
+    run("new_hash")
+    # might still be used by the calls running the previous deployment
+    assert sorted(d.name for d in cache_root.iterdir()) == ["new_hash", "old_hash"]
+
+    last_used = time.time() - g.EXTRACTION_CACHE_GRACE_PERIOD - 1
+    os.utime(cache_root / "old_hash", (last_used, last_used))
+    run("new_hash")
+    assert [d.name for d in cache_root.iterdir()] == ["new_hash"]
+    assert (cache_root / "new_hash" / "dummy_dependency" / "__init__.py").is_file()
+    assert other_stage_dir.is_dir()
+
+
 def test_kedro_start_run_sproc_is_valid(
     patched_snowflake_pipeline_generator: SnowflakePipelineGenerator,
 ):
@@ -72,3 +267,230 @@ def test_kedro_start_run_sproc_is_valid(
     assert isinstance(result, str) and isinstance(
         UUID(result), UUID
     ), "Result is not a valid UUID"  # UUID will throw, when invalid
+
+
+def test_upload_skips_unchanged_and_removes_stale_artifacts(
+    patched_snowflake_pipeline_generator: SnowflakePipelineGenerator,
+    tmp_path: Path,
+):
+    g = patched_snowflake_pipeline_generator
+    unchanged = tmp_path / "unchanged.zip"
+    unchanged.write_text("unchanged")
+    changed = tmp_path / "changed.tar.zst"
+    changed.write_text("changed")
+
+    session = g.snowflake_session
+    session.sql.return_value.collect.return_value = [
+        (f"test_stage/{path}",)
+        for path in (
+            g.ARTIFACTS_MANIFEST_NAME,
+            "unchanged.zip",
+            "project/changed.tar.zst",
+            "project/stale.tar.zst",
+        )
+    ]
+    session.file.get_stream.return_value = BytesIO(
+        json.dumps(
+            {
+                "artifacts": {
+                    "unchanged.zip": hash_file(unchanged),
+                    "project/changed.tar.zst": "outdated-hash",
+                    "project/stale.tar.zst": "stale-hash",
+                },
+                "pipelines": {
+                    g.pipeline_name: [
+                        "unchanged.zip",
+                        "project/changed.tar.zst",
+                        "project/stale.tar.zst",
+                    ]
+                },
+            }
+        ).encode()
+    )
+
+    manifest = g._upload_artifacts(
+        "@TEST_STAGE",
+        {"unchanged.zip": unchanged, "project/changed.tar.zst": changed},
+    )
+
+    assert manifest == {
+        "unchanged.zip": hash_file(unchanged),
+        "project/changed.tar.zst": hash_file(changed),
+    }
+    session.file.put.assert_called_once_with(
+        str(changed),
+        "@TEST_STAGE/project",
+        overwrite=True,
+        auto_compress=False,
+        parallel=8,
+    )
+    session.sql.assert_any_call("remove @TEST_STAGE/project/stale.tar.zst")
+    session.file.put_stream.assert_called_once()
+
+
+def test_upload_keeps_artifacts_of_other_pipelines(
+    patched_snowflake_pipeline_generator: SnowflakePipelineGenerator,
+    tmp_path: Path,
+):
+    g = patched_snowflake_pipeline_generator
+    (shared := tmp_path / "shared.zip").write_text("shared")
+    archives = {name: tmp_path / f"{name}.tar.zst" for name in ("a", "b")}
+    for name, archive in archives.items():
+        archive.write_text(name)
+
+    def deploy(pipeline_name, *paths):
+        g.pipeline_name = pipeline_name
+        artifacts = {f"project/{pipeline_name}.tar.zst": archives[pipeline_name]}
+        g._upload_artifacts("@TEST_STAGE", {**artifacts, **{p: shared for p in paths}})
+        return {r[0] for r in session.sql("LS @TEST_STAGE").collect()}
+
+    with LocalSession(tmp_path / "snowflake") as session:
+        g.__dict__["snowflake_session"] = session
+        deploy("a", "shared.zip")
+        assert {"test_stage/project/a.tar.zst", "test_stage/project/b.tar.zst"} <= (
+            deploy("b", "shared.zip")
+        )
+        # still used by the other pipeline
+        assert "test_stage/shared.zip" in deploy("a")
+        stored = deploy("b")
+        assert "test_stage/shared.zip" not in stored
+        assert {"test_stage/project/a.tar.zst", "test_stage/project/b.tar.zst"} <= (
+            stored
+        )
+        assert g._read_stage_manifest("@TEST_STAGE")["pipelines"] == {
+            "a": ["project/a.tar.zst"],
+            "b": ["project/b.tar.zst"],
+        }
+
+
+def test_tasks_use_warehouses_mapped_to_nodes(
+    patched_snowflake_pipeline_generator: SnowflakePipelineGenerator,
+):
+    g = patched_snowflake_pipeline_generator
+    g.config.snowflake.runtime.warehouses = WarehouseMappingConfig(
+        tags={"heavy": "XL_WH", "light": "XS_WH"}, nodes={"node3": "M_WH"}
+    )
+    p = pipeline(
+        [
+            node(identity, "input_data", "i2", name="node1", tags=["heavy"]),
+            node(identity, "i2", "i3", name="node2"),
+            node(identity, "i3", "output_data", name="node3", tags=["light"]),
+        ]
+    )
+    warehouses = {
+        re.search(r"ARRAY_CONSTRUCT\('(\w+)'\)", sql)
+        .group(1): re.search(r"warehouse = '(\w+)'", sql)
+        .group(1)
+        for sql in g._generate_snowflake_tasks_sql(p)
+        if "ARRAY_CONSTRUCT" in sql
+    }
+    assert warehouses == {
+        "node1": "XL_WH",
+        "node2": g.connection_parameters["warehouse"],
+        "node3": "M_WH",
+    }
+
+    g.grouper = LinearChainNodeGrouper()
+    with pytest.raises(ValueError, match="different warehouses"):
+        g._generate_snowflake_tasks_sql(p)
+
+
+def test_serverless_tasks_use_initial_warehouse_size_of_tags(
+    patched_snowflake_pipeline_generator: SnowflakePipelineGenerator,
+):
+    g = patched_snowflake_pipeline_generator
+    g.config.snowflake.runtime.serverless = ServerlessConfig(
+        pipelines={g.pipeline_name: "small"}, tags={"heavy": "LARGE", "mid": "MEDIUM"}
+    )
+    g.config.snowflake.runtime.warehouses = WarehouseMappingConfig(
+        nodes={"node3": "M_WH"}
+    )
+    p = pipeline(
+        [
+            node(identity, "input_data", "i2", name="node1", tags=["heavy", "mid"]),
+            node(identity, "i2", "i3", name="node2"),
+            node(identity, "i3", "output_data", name="node3", tags=["heavy"]),
+        ]
+    )
+    sql = g._generate_snowflake_tasks_sql(p)
+    assert "user_task_managed_initial_warehouse_size = 'SMALL'" in sql[0]
+    compute = {
+        re.search(r"ARRAY_CONSTRUCT\('(\w+)'\)", s)
+        .group(1): re.search(r"^(?:warehouse|user_task_managed_.*) = '(\w+)'", s, re.M)
+        .group(0)
+        for s in sql
+        if "ARRAY_CONSTRUCT" in s
+    }
+    assert compute == {
+        "node1": "user_task_managed_initial_warehouse_size = 'LARGE'",
+        "node2": "user_task_managed_initial_warehouse_size = 'SMALL'",
+        "node3": "warehouse = 'M_WH'",
+    }
+
+
+def test_incremental_deploy_recreates_only_changed_tasks(
+    patched_snowflake_pipeline_generator: SnowflakePipelineGenerator, dummy_pipeline
+):
+    g = patched_snowflake_pipeline_generator
+    waves = g._generate_snowflake_tasks_waves(dummy_pipeline)
+    markers = {
+        m.group(1).upper(): m.group(2)
+        for wave in waves
+        for sql in wave
+        if (m := g.TASK_DEFINITION_PATTERN.match(sql))
+    }
+    node3_task = g._standardize_node_name("node3").upper()
+    stale_task = g._standardize_node_name("removed").upper()
+    deployed = [
+        {"name": name, "comment": marker}
+        for name, marker in markers.items()
+        if name != node3_task
+    ] + [
+        {"name": node3_task, "comment": g._task_definition_marker("outdated")},
+        {"name": stale_task, "comment": g._task_definition_marker("stale")},
+        {"name": f"{stale_task}_OTHER", "comment": "created manually"},
+    ]
+    g.snowflake_session.sql.return_value.collect.return_value = deployed
+
+    incremental = g._incremental_submission_waves(waves)
+
+    statements = [sql for wave in incremental for sql in wave]
+    created = [
+        m.group(1).upper()
+        for sql in statements
+        if (m := g.TASK_DEFINITION_PATTERN.match(sql))
+    ]
+    assert created == [node3_task]
+    assert g._generate_root_task_suspend_sql() in statements
+    assert incremental[-1] == [f"drop task if exists {stale_task};"]
+
+
+def test_incremental_deploy_skips_unchanged_procedures(
+    patched_snowflake_pipeline_generator: SnowflakePipelineGenerator,
+):
+    g = patched_snowflake_pipeline_generator
+    g.config.snowflake.runtime.incremental_deploy = True
+    procedures = {
+        "UNCHANGED": (MagicMock(), {"packages": ["pandas"]}),
+        "CHANGED": (MagicMock(), {"packages": ["pandas"]}),
+    }
+    with patch.object(g, "_write_stage_manifest") as write_stage_manifest:
+        g._deploy_procedures("@STAGE", {}, {"a.zip": "digest"}, procedures)
+    digests = write_stage_manifest.call_args.args[1]["procedures"]
+    assert all(construct.call_count == 1 for construct, _ in procedures.values())
+
+    procedures["CHANGED"][1]["packages"].append("numpy")
+    g.snowflake_session.sql.return_value.collect.return_value = [
+        {"name": "UNCHANGED"},
+        {"name": "CHANGED"},
+    ]
+    with patch.object(g, "_write_stage_manifest") as write_stage_manifest:
+        g._deploy_procedures(
+            "@STAGE", {"procedures": digests}, {"a.zip": "digest"}, procedures
+        )
+    assert procedures["UNCHANGED"][0].call_count == 1
+    assert procedures["CHANGED"][0].call_count == 2
+    assert (
+        write_stage_manifest.call_args.args[1]["procedures"]["UNCHANGED"]
+        == digests["UNCHANGED"]
+    )
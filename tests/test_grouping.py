@@ -0,0 +1,128 @@
+import pytest
+from kedro.pipeline import Pipeline, node, pipeline
+
+from kedro_snowflake.generator import SnowflakePipelineGenerator
+from kedro_snowflake.grouping import (
+    GroupingError,
+    IdentityNodeGrouper,
+    LinearChainNodeGrouper,
+    NamespaceNodeGrouper,
+    TagNodeGrouper,
+)
+from tests.utils import identity
+
+
+def _group_node_names(grouping):
+    return {group: [n.name for n in nodes] for group, nodes in grouping.groups.items()}
+
+
+@pytest.fixture()
+def diamond_pipeline() -> Pipeline:
+    return pipeline(
+        [
+            node(identity, "input_data", "a", name="start", tags=["g.prep"]),
+            node(identity, "a", "b", name="left", tags=["g.prep"]),
+            node(identity, "a", "c", name="right"),
+            node(lambda b, c: b, ["b", "c"], "d", name="join"),
+            node(identity, "d", "output_data", name="end"),
+        ]
+    )
+
+
+def test_identity_grouper_keeps_every_node_separate(dummy_pipeline):
+    grouping = IdentityNodeGrouper().group(dummy_pipeline)
+    assert _group_node_names(grouping) == {
+        "node1": ["node1"],
+        "node2": ["node2"],
+        "node3": ["node3"],
+    }
+    assert grouping.dependencies == {
+        "node1": set(),
+        "node2": {"node1"},
+        "node3": {"node2"},
+    }
+    assert grouping.ordered_group_names() == ["node1", "node2", "node3"]
+
+
+def test_tag_grouper(diamond_pipeline):
+    grouping = TagNodeGrouper(tag_prefix="g.").group(diamond_pipeline)
+    assert _group_node_names(grouping) == {
+        "prep": ["start", "left"],
+        "right": ["right"],
+        "join": ["join"],
+        "end": ["end"],
+    }
+    assert grouping.dependencies["right"] == {"prep"}
+    assert grouping.dependencies["join"] == {"prep", "right"}
+
+
+def test_tag_grouper_rejects_cycles(diamond_pipeline):
+    cyclic = pipeline(
+        [
+            n.tag(["g.cycle"]) if n.name in ("start", "join") else n
+            for n in diamond_pipeline.nodes
+        ]
+    )
+    with pytest.raises(GroupingError):
+        TagNodeGrouper(tag_prefix="g.").group(cyclic)
+
+
+def test_namespace_grouper():
+    p = pipeline(
+        [
+            pipeline(
+                [node(identity, "input_data", "x", name="n1")],
+                namespace="prep.companies",
+                inputs="input_data",
+            ),
+            pipeline(
+                [node(identity, "x", "y", name="n2")],
+                namespace="prep.reviews",
+                inputs={"x": "prep.companies.x"},
+            ),
+            node(identity, "prep.reviews.y", "output_data", name="n3"),
+        ]
+    )
+    grouping = NamespaceNodeGrouper(level=1).group(p)
+    assert _group_node_names(grouping) == {
+        "prep": ["prep.companies.n1", "prep.reviews.n2"],
+        "n3": ["n3"],
+    }
+
+
+def test_namespace_grouper_rejects_group_names_of_ungrouped_nodes():
+    p = pipeline(
+        [
+            pipeline(
+                [node(identity, "input_data", "x", name="n1")],
+                namespace="prep",
+                inputs="input_data",
+            ),
+            node(identity, "prep.x", "output_data", name="prep"),
+        ]
+    )
+    with pytest.raises(GroupingError, match="collide with names of ungrouped nodes"):
+        NamespaceNodeGrouper().group(p)
+
+
+def test_linear_chain_grouper(diamond_pipeline, dummy_pipeline):
+    assert _group_node_names(LinearChainNodeGrouper().group(dummy_pipeline)) == {
+        "node1": ["node1", "node2", "node3"]
+    }
+    assert _group_node_names(LinearChainNodeGrouper().group(diamond_pipeline)) == {
+        "start": ["start"],
+        "left": ["left"],
+        "right": ["right"],
+        "join": ["join", "end"],
+    }
+
+
+def test_generator_creates_task_per_group(
+    patched_snowflake_pipeline_generator: SnowflakePipelineGenerator, dummy_pipeline
+):
+    g = patched_snowflake_pipeline_generator
+    g.grouper = LinearChainNodeGrouper()
+    sql = g._generate_snowflake_tasks_sql(dummy_pipeline)
+    tasks = [s for s in sql if "ARRAY_CONSTRUCT" in s]
+    assert len(tasks) == 1
+    assert "ARRAY_CONSTRUCT('node1','node2','node3')" in tasks[0]
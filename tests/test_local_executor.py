@@ -0,0 +1,129 @@
+import threading
+from time import sleep
+
+import pytest
+from kedro.io import DataCatalog, MemoryDataSet
+from kedro.pipeline import node, pipeline
+
+from kedro_snowflake.config import TaskGraphLimitsConfig
+from kedro_snowflake.generator import SnowflakePipelineGenerator
+from kedro_snowflake.local import (
+    KedroNodesRunner,
+    LocalSession,
+    LocalTaskExecutor,
+    parse_task_plan,
+)
+from kedro_snowflake.local.executor import PlannedTask
+from tests.utils import identity
+
+
+def test_parse_task_plan(
+    patched_snowflake_pipeline_generator: SnowflakePipelineGenerator, dummy_pipeline
+):
+    g = patched_snowflake_pipeline_generator
+    tasks = parse_task_plan(g._generate_snowflake_tasks_sql(dummy_pipeline))
+    root = g._root_task_name.upper()
+    assert {name: task.node_names for name, task in tasks.items()} == {
+        root: [],
+        "KEDRO_TEST_PIPELINE_NODE1": ["node1"],
+        "KEDRO_TEST_PIPELINE_NODE2": ["node2"],
+        "KEDRO_TEST_PIPELINE_NODE3": ["node3"],
+    }
+    assert tasks["KEDRO_TEST_PIPELINE_NODE3"].after == [
+        root,
+        "KEDRO_TEST_PIPELINE_NODE2",
+    ]
+
+
+def test_parse_chained_task_graphs(
+    patched_snowflake_pipeline_generator: SnowflakePipelineGenerator,
+):
+    g = patched_snowflake_pipeline_generator
+    g.config.snowflake.runtime.task_graph_limits = TaskGraphLimitsConfig(
+        max_tasks_per_graph=4, max_predecessors=3, max_child_tasks=3
+    )
+    wide_pipeline = pipeline(
+        [node(identity, "input_data", f"out{i}", name=f"n{i}") for i in range(5)]
+    )
+    tasks = parse_task_plan(g._generate_snowflake_tasks_sql(wide_pipeline))
+    continuation_root = g._graph_root_task_name(1).upper()
+    assert [t for t in tasks[continuation_root].after if "LINK" in t]
+    assert sorted(n for t in tasks.values() for n in t.node_names) == [
+        f"n{i}" for i in range(5)
+    ]
+
+
+def _diamond_plan():
+    return {
+        "ROOT": PlannedTask("ROOT"),
+        "A": PlannedTask("A", ["ROOT"], ["a"]),
+        "B": PlannedTask("B", ["ROOT", "A"], ["b"]),
+        "C": PlannedTask("C", ["ROOT", "A"], ["c"]),
+        "D": PlannedTask("D", ["ROOT", "B", "C"], ["d"]),
+    }
+
+
+def test_executor_runs_independent_tasks_in_parallel():
+    barrier = threading.Barrier(2, timeout=5)
+    order = []
+
+    def run_nodes(node_names):
+        if node_names[0] in ("b", "c"):
+            barrier.wait()  # b and c have to run at the same time
+        sleep(0.01)
+        order.append(node_names[0])
+
+    timeline = LocalTaskExecutor(_diamond_plan(), run_nodes, max_workers=2).run()
+    assert timeline.succeeded
+    assert order[0] == "a" and order[-1] == "d"
+    path, total = timeline.critical_path()
+    assert path[0] == "ROOT" and path[-1] == "D" and len(path) == 4
+    assert total < timeline.total_task_time
+    assert "Expected speedup" in timeline.render()
+
+
+def test_executor_skips_tasks_after_failure():
+    def run_nodes(node_names):
+        if node_names == ["b"]:
+            raise ValueError("boom")
+
+    timeline = LocalTaskExecutor(_diamond_plan(), run_nodes, max_workers=1).run()
+    states = {e.task_name: e.state for e in timeline.executions}
+    assert states == {
+        "ROOT": "SUCCEEDED",
+        "A": "SUCCEEDED",
+        "B": "FAILED",
+        "C": "SUCCEEDED",
+        "D": "SKIPPED",
+    }
+    assert not timeline.succeeded
+
+
+@pytest.mark.parametrize("max_workers", [1, 3])
+def test_kedro_nodes_runner_passes_data_through_local_stage(
+    patched_snowflake_pipeline_generator: SnowflakePipelineGenerator,
+    dummy_pipeline,
+    tmp_path,
+    max_workers,
+):
+    output = MemoryDataSet()
+    catalog = DataCatalog({"input_data": MemoryDataSet(42), "output_data": output})
+    tasks = parse_task_plan(
+        patched_snowflake_pipeline_generator._generate_snowflake_tasks_sql(
+            dummy_pipeline
+        )
+    )
+    with LocalSession(tmp_path) as session:
+        timeline = LocalTaskExecutor(
+            tasks,
+            KedroNodesRunner(session, "@TEMP_STAGE", "run-1", dummy_pipeline, catalog),
+            max_workers=max_workers,
+        ).run()
+        staged = [r[0] for r in session.sql("LS @TEMP_STAGE").collect()]
+
+    assert timeline.succeeded
+    assert output.load() == 42
+    assert staged == [
+        "temp_stage/kedro-snowflake-storage/run-1/i2.pkl.part00000",
+        "temp_stage/kedro-snowflake-storage/run-1/i3.pkl.part00000",
+    ]
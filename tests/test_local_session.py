@@ -0,0 +1,180 @@
+import datetime as dt
+from io import BytesIO
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from kedro_snowflake.datasets.internal import (
+    SnowflakeRunnerDataSet,
+    SnowflakeStagePickleDataSet,
+    SnowflakeTransientTableDataSet,
+)
+from kedro_snowflake.local import LocalSession
+from kedro_snowflake.monitoring import PipelineMonitor
+from kedro_snowflake.pipeline import KedroSnowflakePipeline
+from kedro_snowflake.stats import save_run_stats
+
+
+@pytest.fixture()
+def local_session(tmp_path):
+    with LocalSession(tmp_path / "snowflake") as session:
+        yield session
+
+
+def test_stage_files(local_session: LocalSession, tmp_path):
+    (tmp_path / "a.txt").write_text("a")
+    (tmp_path / "b.txt").write_text("bb")
+    session = local_session
+    session.sql("create stage if not exists KEDRO_STAGE;").collect()
+
+    results = session.file.put(
+        str(tmp_path / "*.txt"), "@kedro_stage/dir", auto_compress=False
+    )
+    assert [r.status for r in results] == ["UPLOADED", "UPLOADED"]
+    session.file.put_stream(BytesIO(b"ccc"), "@KEDRO_STAGE/dir/sub/c.bin")
+    assert (
+        session.file.get_stream("@KEDRO_STAGE/dir/sub/c.bin.gz", decompress=True).read()
+        == b"ccc"
+    )
+
+    listed = session.sql("LS @KEDRO_STAGE/dir").collect()
+    assert [(r[0], r[1]) for r in listed] == [
+        ("kedro_stage/dir/a.txt", 1),
+        ("kedro_stage/dir/b.txt", 2),
+        (
+            "kedro_stage/dir/sub/c.bin.gz",
+            len(session.file.get_stream("@KEDRO_STAGE/dir/sub/c.bin.gz").read()),
+        ),
+    ]
+    assert [
+        r[0] for r in session.sql("ls @KEDRO_STAGE pattern = '.*\\.txt'").collect()
+    ] == [
+        "kedro_stage/dir/a.txt",
+        "kedro_stage/dir/b.txt",
+    ]
+
+    downloaded = session.file.get("@KEDRO_STAGE/dir/b", str(tmp_path / "out"))
+    assert [r.status for r in downloaded] == ["DOWNLOADED"]
+    assert (tmp_path / "out" / "b.txt").read_text() == "bb"
+
+    session.sql("remove @KEDRO_STAGE/dir pattern = '.*a\\.txt'").collect()
+    assert len(session.sql("LS @KEDRO_STAGE").collect()) == 2
+    with pytest.raises(ValueError):
+        session.file.get_stream("@KEDRO_STAGE/../escape")
+
+
+def test_datasets_on_local_session(local_session: LocalSession):
+    df = pd.DataFrame({"a": [1, 2, 3]})
+    pickle_ds = SnowflakeStagePickleDataSet("df", "@TEMP_STAGE", "run-1", local_session)
+    pickle_ds.save(df)
+    pd.testing.assert_frame_equal(pickle_ds.load(), df)
+
+    runner_ds = SnowflakeRunnerDataSet(
+        "data", "@TEMP_STAGE", "run-1", local_session, "run_id"
+    )
+    runner_ds.save({"x": 1})
+    assert runner_ds.load() == {"x": 1}
+
+    transient_ds = SnowflakeTransientTableDataSet(
+        "table", "@TEMP_STAGE", "run-1", "run_id", local_session
+    )
+    assert not transient_ds.table_exists()
+    local_session.write_pandas(df, "kedro_tmp_table", auto_create_table=True)
+    assert transient_ds.table_exists()
+    assert transient_ds.load().count() == 3
+
+
+def test_table_store_and_run_stats(local_session: LocalSession):
+    execution_data = {
+        "run_id": "run-1",
+        "pipeline_name": "__default__",
+        "extract_time": 1.0,
+        "kedro_init_time": 2.0,
+        "kedro_run_time": 3.0,
+    }
+    save_run_stats(
+        local_session, "RUN_STATS", "i1", execution_data, {"a": 1.0, "b": 2.0}
+    )
+    save_run_stats(local_session, "RUN_STATS", "i2", execution_data, {"c": 0.5})
+
+    rows = local_session.sql(
+        "select node_name, task_nodes_count from run_stats order by node_run_time desc"
+    ).collect()
+    assert [tuple(r) for r in rows] == [("b", 2), ("a", 2), ("c", 1)]
+    assert local_session.table("run_stats").to_pandas().shape == (3, 10)
+
+
+def test_task_history_emulation(local_session: LocalSession):
+    session = local_session
+    pipeline = KedroSnowflakePipeline(
+        session,
+        ["create or replace task ROOT"],
+        ["execute task ROOT"],
+        "ROOT",
+        ["TASK_A"],
+    )
+    assert pipeline.run()
+    assert session.executed_sql == ["create or replace task ROOT", "execute task ROOT"]
+
+    start = dt.datetime(2023, 1, 1, 12)
+    run_id = session.record_task_run(
+        "root",
+        "SUCCEEDED",
+        scheduled_from="EXECUTE TASK",
+        scheduled_time=start,
+        completed_time=start + dt.timedelta(seconds=1),
+    )
+    session.record_task_run("task_a", "EXECUTING", run_id, scheduled_time=start)
+
+    monitor = PipelineMonitor(session, "ROOT", ["TASK_A"])
+    assert [(e.task_name, e.state) for e in monitor.poll()] == [
+        ("ROOT", "SUCCEEDED"),
+        ("TASK_A", "EXECUTING"),
+    ]
+    session.record_task_run(
+        "task_a",
+        "SUCCEEDED",
+        run_id,
+        scheduled_time=start,
+        completed_time=start + dt.timedelta(seconds=5),
+    )
+    with patch("kedro_snowflake.monitoring.sleep"):
+        assert monitor.wait()
+    assert monitor.run_ids == [run_id]
+
+
+def test_monitor_follows_runs_beyond_default_task_history_limit(
+    local_session: LocalSession,
+):
+    session = local_session
+    start = dt.datetime(2023, 1, 1, 12)
+    task_names = [f"task_{i:03d}" for i in range(500)]
+    for i in range(200):  # the previous runs of other pipelines
+        session.record_task_run(
+            f"other_{i}", "SUCCEEDED", scheduled_time=start - dt.timedelta(hours=1)
+        )
+    run_id = session.record_task_run(
+        "root", "SUCCEEDED", scheduled_from="EXECUTE TASK", scheduled_time=start
+    )
+    for i, name in enumerate(task_names):
+        session.record_task_run(
+            name,
+            "SUCCEEDED",
+            run_id,
+            scheduled_time=start + dt.timedelta(seconds=i),
+            completed_time=start + dt.timedelta(seconds=i + 1),
+        )
+    # like in Snowflake, the table function returns 100 rows unless told otherwise
+    assert (
+        len(
+            session.sql(
+                "select * from table(information_schema.task_history())"
+            ).collect()
+        )
+        == 100
+    )
+
+    monitor = PipelineMonitor(session, "root", task_names)
+    assert len(monitor.poll()) == 501
+    assert monitor.finished and monitor.succeeded
@@ -0,0 +1,140 @@
+import asyncio
+import datetime as dt
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from kedro_snowflake.generator import SnowflakePipelineGenerator
+from kedro_snowflake.monitoring import PipelineMonitor
+from kedro_snowflake.pipeline import KedroSnowflakePipeline
+
+
+def test_task_statements_are_grouped_into_waves_by_depth(
+    patched_snowflake_pipeline_generator: SnowflakePipelineGenerator,
+    dummy_pipeline,
+):
+    g = patched_snowflake_pipeline_generator
+    waves = g._generate_snowflake_tasks_waves(dummy_pipeline)
+    assert [len(wave) for wave in waves] == [2, 1, 1, 1, 1]
+    assert waves[0][0].startswith(f"create or replace task {g._root_task_name}")
+    assert waves[1] == [g._generate_root_task_suspend_sql()]
+    assert all(
+        f"ARRAY_CONSTRUCT('{node_name}')" in wave[0]
+        for node_name, wave in zip(("node1", "node2", "node3"), waves[2:])
+    )
+
+
+def test_run_submits_waves_in_order():
+    waves = [["root"], [f"task_{i}" for i in range(20)], ["last"]]
+    session = MagicMock()
+    pipeline = KedroSnowflakePipeline(
+        session,
+        [sql for wave in waves for sql in wave],
+        ["execute"],
+        "root",
+        [],
+        submission_waves=waves,
+    )
+    assert pipeline.run(max_workers=4)
+
+    executed = [c.args[0] for c in session.sql.call_args_list]
+    assert executed[0] == "root"
+    assert sorted(executed[1:21]) == sorted(waves[1])
+    assert executed[21:] == ["last", "execute"]
+    # the task statements are submitted as asynchronous jobs
+    assert session.sql.return_value.collect_nowait.call_count == 22
+
+
+def _task_history_session(polls):
+    """Session returning the consecutive `polls` (lists of changed rows) from task history"""
+    session = MagicMock()
+    queries = []
+    polls = iter(polls)
+
+    def sql(query):
+        queries.append(query)
+        result = MagicMock()
+        if "task_history" not in query:
+            result.collect.return_value = []
+        elif "limit 1" in query:
+            result.collect.return_value = [
+                {"RUN_ID": 7, "SCHEDULED_TIME": dt.datetime(2023, 1, 1, 11)}
+            ]
+        else:
+            result.collect.return_value = [
+                {
+                    "NAME": name,
+                    "RUN_ID": 7,
+                    "STATE": state,
+                    "SCHEDULED_TIME": None,
+                    "QUERY_START_TIME": None,
+                    "COMPLETED_TIME": completed,
+                    "ERROR_MESSAGE": None,
+                }
+                for name, state, completed in next(polls)
+            ]
+        job = result.collect_nowait.return_value
+        job.is_done.return_value = True
+        job.result.return_value = result.collect.return_value
+        return result
+
+    session.sql.side_effect = sql
+    return session, queries
+
+
+def test_monitor_yields_transitions_and_backs_off():
+    t0 = dt.datetime(2023, 1, 1, 12)
+    session, queries = _task_history_session(
+        [
+            [("ROOT", "EXECUTING", None), ("TASK_A", "SCHEDULED", None)],
+            [("ROOT", "EXECUTING", None), ("TASK_A", "SCHEDULED", None)],
+            [("ROOT", "EXECUTING", None), ("TASK_A", "SCHEDULED", None)],
+            [("ROOT", "SUCCEEDED", t0), ("TASK_A", "EXECUTING", None)],
+            [("TASK_A", "SUCCEEDED", t0)],
+        ]
+    )
+    monitor = PipelineMonitor(
+        session, "root", ["task_a"], min_poll_interval=2, max_poll_interval=4
+    )
+    events = []
+    with patch("kedro_snowflake.monitoring.sleep") as sleep:
+        assert monitor.wait(callback=events.append)
+
+    assert [(e.task_name, e.previous_state, e.state) for e in events] == [
+        ("ROOT", None, "EXECUTING"),
+        ("TASK_A", None, "SCHEDULED"),
+        ("ROOT", "EXECUTING", "SUCCEEDED"),
+        ("TASK_A", "SCHEDULED", "EXECUTING"),
+        ("TASK_A", "EXECUTING", "SUCCEEDED"),
+    ]
+    assert [c.args[0] for c in sleep.call_args_list] == [2, 3, 4, 2]
+    assert "completed_time >= to_timestamp_ltz('2023-01-01T12:00:00')" in queries[-1]
+
+
+def test_monitor_stops_on_failure():
+    session, _ = _task_history_session(
+        [[("ROOT", "SUCCEEDED", dt.datetime.now()), ("TASK_A", "FAILED", None)]]
+    )
+    monitor = PipelineMonitor(session, "root", ["task_a", "task_b"])
+    with patch("kedro_snowflake.monitoring.sleep"):
+        assert not monitor.wait()
+    assert monitor.finished and monitor.failed
+
+
+def test_run_async_drives_many_pipelines_concurrently():
+    def make_pipeline():
+        session, _ = _task_history_session(
+            [
+                [("ROOT", "EXECUTING", None)],
+                [("ROOT", "SUCCEEDED", dt.datetime.now())],
+            ]
+        )
+        return KedroSnowflakePipeline(session, ["create"], ["execute"], "root", [])
+
+    async def run_all(pipelines):
+        return await asyncio.gather(
+            *(p.run_async(wait_for_completion=True) for p in pipelines)
+        )
+
+    pipelines = [make_pipeline() for _ in range(3)]
+    with patch("kedro_snowflake.monitoring.asyncio.sleep", new=AsyncMock()) as sleep:
+        assert asyncio.run(run_all(pipelines)) == [True] * 3
+    assert sleep.await_count == 3
@@ -0,0 +1,103 @@
+import mmap
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pandas as pd
+import pytest
+from kedro.io import DataCatalog, MemoryDataSet
+from kedro.pipeline import node, pipeline
+
+from kedro_snowflake.local import LocalSession
+from kedro_snowflake.runner import SnowflakeRunner
+
+
+@pytest.mark.parametrize(
+    "full_pipeline,expected_persisted",
+    [(False, {"i2", "i3"}), (True, {"i3"})],
+)
+def test_runner_keeps_task_local_datasets_in_memory(
+    full_pipeline, expected_persisted, dummy_pipeline
+):
+    persisted = {}
+
+    def runner_dataset(ds_name, *_, **__):
+        persisted[ds_name] = MemoryDataSet()
+        return persisted[ds_name]
+
+    runner = SnowflakeRunner(
+        MagicMock(),
+        "@TEST_STAGE",
+        "run_id",
+        full_pipeline=dummy_pipeline if full_pipeline else None,
+    )
+    catalog = DataCatalog({"input_data": MemoryDataSet(42)})
+    with patch(
+        "kedro_snowflake.runner.SnowflakeRunnerDataSet", side_effect=runner_dataset
+    ):
+        runner.run(dummy_pipeline.only_nodes("node1", "node2"), catalog)
+
+    assert set(persisted.keys()) == expected_persisted
+    assert persisted["i3"].load() == 42
+    assert set(runner.node_run_times) == {"node1", "node2"}
+
+
+@pytest.mark.parametrize("out_of_band_buffers", [False, True])
+def test_runner_persists_intermediate_data_with_out_of_band_buffers(
+    out_of_band_buffers, tmp_path
+):
+    array = np.random.default_rng(42).random(100_000)
+    df = pd.DataFrame({"a": array})
+    loaded = {}
+
+    def consume(array, df, params):
+        loaded.update(array=array, df=df, params=params)
+        return 1
+
+    p = pipeline(
+        [
+            node(
+                lambda: (array, df, {"x": array}),
+                None,
+                ["arr", "df", "params"],
+                name="produce",
+            ),
+            node(consume, ["arr", "df", "params"], "output", name="consume"),
+        ]
+    )
+    with LocalSession(tmp_path) as session:
+        for node_name in ("produce", "consume"):
+            SnowflakeRunner(
+                session,
+                "@TEMP_STAGE",
+                "run-1",
+                full_pipeline=p,
+                out_of_band_buffers=out_of_band_buffers,
+                min_buffer_size=100_000,
+            ).run(p.only_nodes(node_name), DataCatalog({"output": MemoryDataSet()}))
+        staged = sorted(
+            r[0].rsplit("/", 1)[-1] for r in session.sql("LS @TEMP_STAGE").collect()
+        )
+
+    if out_of_band_buffers:
+        # numpy arrays and DataFrames are pickled too, to map their buffers on load
+        assert staged == [
+            "arr.pkl.buffer00000",
+            "arr.pkl.part00000",
+            "df.pkl.buffer00000",
+            "df.pkl.part00000",
+            "params.pkl.buffer00000",
+            "params.pkl.part00000",
+        ]
+        base = loaded["array"]
+        while isinstance(base, np.ndarray):
+            base = base.base
+        assert isinstance(base.obj, mmap.mmap)
+    else:
+        assert staged == [
+            "arr.npy.part00000",
+            "df.parquet.part00000",
+            "params.pkl.part00000",
+        ]
+    np.testing.assert_array_equal(loaded["array"], array)
+    np.testing.assert_array_equal(loaded["params"]["x"], array)
+    pd.testing.assert_frame_equal(loaded["df"], df)
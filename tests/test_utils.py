@@ -1,14 +1,28 @@
+import importlib
+import os
+import sys
+import tarfile
 import zipfile
 from pathlib import Path
 from tempfile import TemporaryDirectory
 from unittest.mock import patch
+from uuid import uuid4
 
 import pytest
+import zstandard as zstd
 from kedro.config import OmegaConfigLoader
 from kedro.framework.context import KedroContext
 
 from kedro_snowflake.config import KedroSnowflakeConfig
-from kedro_snowflake.utils import KedroContextManager, compress_folder_to_zip
+from kedro_snowflake.utils import (
+    KedroContextManager,
+    ProjectFilesFilter,
+    compress_folder_to_zip,
+    hash_file,
+    is_zip_importable,
+    zip_dependencies,
+    zstd_folder,
+)
 
 
 @pytest.mark.parametrize("exclude", [None, [".pyc"]])
@@ -23,6 +37,123 @@ def test_can_zip_folder(exclude):
             assert (Path(extract) / "test.pyc").exists() == (exclude is None)
 
 
+@pytest.mark.parametrize("threads", [0, 2, -1])
+def test_can_zstd_folder(threads, tmp_path: Path):
+    (source := tmp_path / "source").mkdir()
+    (source / "test.txt").write_text("test")
+    (source / "test.pyc").write_text("test2")
+    archive = zstd_folder(
+        source, tmp_path, "test.tar.zst", exclude=[".pyc"], threads=threads
+    )
+    with zstd.open(archive, "rb") as stream:
+        tarfile.open(fileobj=stream, mode="r|").extractall(tmp_path / "extract")
+    assert (tmp_path / "extract" / "source" / "test.txt").read_text() == "test"
+    assert not (tmp_path / "extract" / "source" / "test.pyc").exists()
+
+
+def test_project_archive_honours_gitignore_and_patterns(tmp_path: Path):
+    (project := tmp_path / "project").mkdir()
+    files = {
+        ".gitignore": "data/**\n!data/**/\n!data/**/.gitkeep\nconf/local/**\n",
+        ".git/HEAD": "ref",
+        ".venv/lib/module.py": "",
+        "conf/base/catalog.yml": "",
+        "conf/local/credentials.yml": "",
+        "data/01_raw/.gitkeep": "",
+        "data/01_raw/big.csv": "a,b,c",
+        "notebooks/eda.ipynb": "{}",
+        "pyproject.toml": "",
+        "src/package/.gitignore": "secret.txt",
+        "src/package/__init__.py": "",
+        "src/package/__pycache__/__init__.cpython-38.pyc": "",
+        "src/package/secret.txt": "",
+    }
+    for path, content in files.items():
+        (project / path).parent.mkdir(parents=True, exist_ok=True)
+        (project / path).write_text(content)
+
+    files_filter = ProjectFilesFilter(
+        project,
+        include=["conf/**"],
+        exclude=["*.pyc", "__pycache__/", ".venv/", "notebooks/"],
+    )
+    archive = zstd_folder(project, tmp_path, "project.tar.zst", include_fn=files_filter)
+    with zstd.open(archive, "rb") as stream:
+        archived = {
+            member.name.partition("/")[2]
+            for member in tarfile.open(fileobj=stream, mode="r|")
+            if member.isfile()
+        }
+
+    assert archived == {
+        ".gitignore",
+        "conf/base/catalog.yml",
+        "conf/local/credentials.yml",
+        "data/01_raw/.gitkeep",
+        "pyproject.toml",
+        "src/package/.gitignore",
+        "src/package/__init__.py",
+    }
+    assert "TOTAL" in files_filter.size_report(archive.stat().st_size)
+
+
+@pytest.mark.parametrize("archive_name", ["test.tar.zst", "test.zip"])
+def test_deterministic_archives_are_byte_identical(archive_name, tmp_path: Path):
+    hashes = []
+    for i, files_order in enumerate((("a.txt", "b.txt"), ("b.txt", "a.txt"))):
+        (source := tmp_path / f"source_{i}" / "package").mkdir(parents=True)
+        for file_name in files_order:
+            (source / file_name).write_text(file_name)
+            os.utime(source / file_name, (1000 * i, 1000 * i))
+        (target := tmp_path / f"target_{i}").mkdir()
+        if archive_name.endswith(".zip"):
+            compress_folder_to_zip(source, target / archive_name, deterministic=True)
+        else:
+            zstd_folder(source, target, archive_name, deterministic=True)
+        hashes.append(hash_file(target / archive_name))
+    assert hashes[0] == hashes[1]
+
+
+@pytest.mark.parametrize("compile_bytecode", [False, True])
+def test_zip_dependencies_are_zip_importable(compile_bytecode, tmp_path: Path):
+    package_name = f"zip_importable_{uuid4().hex}"
+    (package := tmp_path / "source" / package_name).mkdir(parents=True)
+    (package / "__init__.py").write_text("VALUE = 42")
+    assert is_zip_importable(package)
+
+    (target := tmp_path / "target").mkdir()
+    sys.path.insert(0, str(package.parent))
+    try:
+        zip_dependencies(
+            [package_name],
+            target,
+            deterministic=True,
+            compile_bytecode=compile_bytecode,
+        )
+    finally:
+        sys.path.remove(str(package.parent))
+        del sys.modules[package_name]
+
+    archive = target / f"{package_name}.zip"
+    with zipfile.ZipFile(archive) as zip_file:
+        assert (
+            f"{package_name}/__init__.pyc" in zip_file.namelist()
+        ) == compile_bytecode
+    sys.path.insert(0, str(archive))
+    try:
+        module = importlib.import_module(package_name)
+        assert module.VALUE == 42 and str(archive) in module.__file__
+    finally:
+        sys.path.remove(str(archive))
+        del sys.modules[package_name]
+
+
+def test_packages_with_data_files_are_not_zip_importable(tmp_path: Path):
+    (tmp_path / "__init__.py").write_text("")
+    (tmp_path / "template.yml").write_text("")
+    assert not is_zip_importable(tmp_path)
+
+
 def test_can_create_context_manager(patched_kedro_package):
     with KedroContextManager("tests", "local") as mgr:
         assert mgr is not None and isinstance(